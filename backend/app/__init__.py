@@ -6,6 +6,23 @@ from config import Config
 from app.routes import register_blueprints
 from app.seed import seed_db
 from app.db_bootstrap import ensure_database_exists
+from app.db_upgrade import upgrade_schema
+from app.utils.cart_store import cart_store
+from app.utils.cart_sweeper import sweep_carts
+from app.utils.checkout_queue import checkout_queue
+from app.utils.courier_locations import courier_locations
+from app.utils.delivery import plan_routes
+from app.utils.idempotency import purge_expired_keys
+from app.utils.image_pipeline import image_pipeline, resume_stalled_images
+from app.utils.live_events import event_hub
+from app.utils.order_archive import archive_closed_orders
+from app.utils.outbox import dispatch_outbox, purge_outbox
+from app.utils.password_hashing import password_hasher
+from app.utils.payment_gateway import payment_gateway, retry_stalled_payments
+from app.utils.principal_cache import principal_cache
+from app.utils.scheduler import PeriodicJob
+from app.utils.token_revocation import refresh_revocations, token_revocations
+from app.commands import register_commands
 
 
 def create_app():
@@ -16,14 +33,41 @@ def create_app():
 
     # Create DB if missing (MySQL only)
     ensure_database_exists(app.config["SQLALCHEMY_DATABASE_URI"])
+    for bind_url in app.config["SQLALCHEMY_BINDS"].values():
+        ensure_database_exists(bind_url)
 
     db.init_app(app)
     jwt.init_app(app)
 
     register_blueprints(app)
+    register_commands(app)
 
     with app.app_context():
         db.create_all()
+        upgrade_schema()  # columns / indexes create_all() skips on existing tables
         seed_db()
 
+    cart_store.init_app(app)
+    checkout_queue.init_app(app)
+    payment_gateway.init_app(app)
+    event_hub.init_app(app)
+    courier_locations.init_app(app)
+    principal_cache.init_app(app)
+    password_hasher.init_app(app)
+    token_revocations.init_app(app)
+    image_pipeline.init_app(app)
+
+    # background jobs
+    app.extensions["jobs"] = [
+        PeriodicJob(app, "cart-sweeper", app.config["CART_SWEEP_INTERVAL"], sweep_carts).start(),
+        PeriodicJob(app, "idempotency-purge", app.config["IDEMPOTENCY_PURGE_INTERVAL"], purge_expired_keys).start(),
+        PeriodicJob(app, "order-archiver", app.config["ORDER_ARCHIVE_INTERVAL"], archive_closed_orders).start(),
+        PeriodicJob(app, "outbox-dispatcher", app.config["OUTBOX_DISPATCH_INTERVAL"], dispatch_outbox).start(),
+        PeriodicJob(app, "outbox-purge", app.config["OUTBOX_PURGE_INTERVAL"], purge_outbox).start(),
+        PeriodicJob(app, "route-planner", app.config["DELIVERY_PLAN_INTERVAL"], plan_routes).start(),
+        PeriodicJob(app, "token-revocations", app.config["REVOCATION_REFRESH_INTERVAL"], refresh_revocations).start(),
+        PeriodicJob(app, "image-resume", app.config["IMAGE_RESUME_INTERVAL"], resume_stalled_images).start(),
+        PeriodicJob(app, "psp-retry", app.config["PSP_RETRY_INTERVAL"], retry_stalled_payments).start(),
+    ]
+
     return app
@@ -0,0 +1,113 @@
+import os
+
+import click
+
+from .db_upgrade import upgrade_schema
+from .extensions import db
+from .models.reconciliation import ReconciliationRun
+from .utils.cart_sweeper import sweep_carts
+from .utils.checkout_queue import checkout_queue
+from .utils.delivery import plan_routes
+from .utils.order_archive import archive_closed_orders
+from .utils.outbox import dispatch_outbox
+from .utils.outbox_sinks import run_http_stub
+from .utils.fake_psp import FakePSP, make_server
+from .utils.reconciliation import run_reconciliation
+from .utils.sales_rollup import rebuild_rollups, default_backfill_range
+
+
+def register_commands(app):
+    @app.cli.command("upgrade-db")
+    def upgrade_db_command():
+        """Add columns / indexes missing from tables made by an older version (also runs at startup)."""
+        changes = upgrade_schema()
+        for change in changes:
+            click.echo(change)
+        click.echo(f"changes={len(changes)}")
+
+    @app.cli.command("sweep-carts")
+    @click.option("--max-batches", type=int, default=None, help="Batches per step (default CART_SWEEP_MAX_BATCHES)")
+    def sweep_carts_command(max_batches):
+        """Abandon idle carts and archive closed ones."""
+        result = sweep_carts(max_batches=max_batches)
+        click.echo(f"archived={result['archived']} abandoned={result['abandoned']}")
+
+    @app.cli.command("checkout-workers")
+    def checkout_workers_command():
+        """Process queued async checkouts until interrupted."""
+        if app.config["CHECKOUT_WORKERS"] <= 0:
+            raise click.UsageError("Set CHECKOUT_WORKERS > 0 to run checkout workers")
+        click.echo(f"checkout workers: {app.config['CHECKOUT_WORKERS']}")
+        checkout_queue.run_forever()
+
+    @app.cli.command("archive-orders")
+    @click.option("--max-batches", type=int, default=None, help="Default ORDER_ARCHIVE_MAX_BATCHES")
+    def archive_orders_command(max_batches):
+        """Move old delivered / canceled orders to the archive tables."""
+        click.echo(f"archived={archive_closed_orders(max_batches=max_batches)}")
+
+    @app.cli.command("rebuild-sales-rollups")
+    @click.option("--from", "date_from", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Default: one year ago")
+    @click.option("--to", "date_to", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Exclusive, default: tomorrow")
+    @click.option("--chunk-size", type=int, default=1000, help="Orders read per query")
+    def rebuild_sales_rollups_command(date_from, date_to, chunk_size):
+        """Backfill sales_daily_product / sales_daily_category from order history."""
+        default_from, default_to = default_backfill_range()
+        date_from = date_from.date() if date_from else default_from
+        date_to = date_to.date() if date_to else default_to
+        n = rebuild_rollups(date_from, date_to, chunk_size=chunk_size, echo=click.echo)
+        click.echo(f"rebuilt {date_from}..{date_to} from {n} orders")
+
+    @app.cli.command("plan-routes")
+    def plan_routes_command():
+        """Re-plan open delivery routes from unassigned pending / processing orders."""
+        result = plan_routes()
+        click.echo(f"routes={result['routes']} orders={result['orders']} unresolved={result['unresolved']}")
+
+    @app.cli.command("dispatch-outbox")
+    def dispatch_outbox_command():
+        """Deliver pending outbox events to every configured sink once."""
+        for sink, n in dispatch_outbox().items():
+            click.echo(f"{sink}: delivered={n}")
+
+    @app.cli.command("outbox-stub")
+    @click.option("--host", default="127.0.0.1")
+    @click.option("--port", type=int, default=8765)
+    def outbox_stub_command(host, port):
+        """Local HTTP consumer for the http outbox sink (prints received events)."""
+        run_http_stub(host, port, echo=click.echo)
+
+    @app.cli.command("reconcile-payments")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--provider", type=click.Choice(["paypal", "card"]), required=True)
+    @click.option("--from", "date_from", type=click.DateTime(), required=True, help="Payments created from (inclusive)")
+    @click.option("--to", "date_to", type=click.DateTime(), required=True, help="Payments created before (exclusive)")
+    def reconcile_payments_command(path, provider, date_from, date_to):
+        """Reconcile a PSP settlement CSV against payments."""
+        run = ReconciliationRun(
+            provider=provider,
+            filename=os.path.basename(path),
+            date_from=date_from,
+            date_to=date_to,
+        )
+        db.session.add(run)
+        db.session.commit()
+        run = run_reconciliation(run.id, path)
+        click.echo(
+            f"run={run.id} status={run.status.value} rows={run.rows_read} matched={run.matched} "
+            f"mismatched={run.mismatched} missing={run.missing} orphans={run.orphans} invalid={run.invalid}"
+        )
+
+    @app.cli.command("fake-psp")
+    @click.option("--host", default="127.0.0.1")
+    @click.option("--port", type=int, default=8766)
+    @click.option("--latency-ms", type=float, default=0, help="Added to every call")
+    @click.option("--failure-rate", type=float, default=0, help="Share of calls answered 503")
+    def fake_psp_command(host, port, latency_ms, failure_rate):
+        """Local fake PayPal / card provider (point PSP_*_URL here)."""
+        server = make_server(host, port, FakePSP(latency_ms=latency_ms, failure_rate=failure_rate))
+        click.echo(f"fake PSP listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
@@ -0,0 +1,98 @@
+from sqlalchemy import inspect, text
+
+from .extensions import db
+
+# db.create_all() creates missing tables but never touches tables that
+# already exist, so columns and indexes added to existing models do not
+# reach databases created by an older version. upgrade_schema() closes
+# that gap; it runs after create_all() at startup (and as `flask upgrade-db`)
+# and is idempotent:
+#   1. COLUMN_UPGRADES: ALTER TABLE ... ADD COLUMN for listed columns a
+#      table lacks, then an optional backfill
+#   2. every index declared on the models that an existing table lacks
+
+# (table, column, DEFAULT for existing rows or None, backfill SQL or None),
+# oldest first; the column definition itself comes from the model
+COLUMN_UPGRADES = [
+    # PSP authorize / capture retries
+    ("payments", "provider_attempts", "0", None),
+    ("payments", "next_attempt_at", None, None),
+    # couriers own their assigned orders
+    ("orders", "delivery_user_id", None, None),
+    ("orders", "assigned_at", None, None),
+    # delivery slot booked at checkout
+    ("orders", "delivery_slot_id", None, None),
+    # stamped into tokens as "ver"; existing users start at 1 like new ones
+    ("users", "token_version", "1", None),
+    # background renditions; older images have none and count as ready
+    # (ADD COLUMN ... NOT NULL needs a constant default, hence the backfill)
+    ("product_images", "status", "'ready'", None),
+    ("product_images", "renditions", None, None),
+    ("product_images", "error", None, None),
+    ("product_images", "updated_at", "'1970-01-01 00:00:00'", "UPDATE product_images SET updated_at = created_at"),
+    ("category_images", "status", "'ready'", None),
+    ("category_images", "renditions", None, None),
+    ("category_images", "error", None, None),
+    ("category_images", "updated_at", "'1970-01-01 00:00:00'", "UPDATE category_images SET updated_at = created_at"),
+    # rollups count refunds only for captured payments; before this every
+    # captured or refunded payment was taken to have been captured
+    ("payments", "captured_at", None,
+     "UPDATE payments SET captured_at = created_at WHERE status IN ('captured', 'refunded')"),
+]
+
+
+def _tables():
+    for bind_key, metadata in db.metadatas.items():
+        for table in metadata.tables.values():
+            yield bind_key, table
+
+
+def _add_column_sql(dialect, column, default) -> list[str]:
+    quote = dialect.identifier_preparer.quote
+    table, name = quote(column.table.name), quote(column.name)
+    sql = f"ALTER TABLE {table} ADD COLUMN {name} {column.type.compile(dialect=dialect)}"
+    if default is not None:
+        sql += f" DEFAULT {default}"
+    if not column.nullable:
+        sql += " NOT NULL"
+    fk = next(iter(column.foreign_keys), None)
+    if fk is None:
+        return [sql]
+    target = f"{quote(fk.column.table.name)} ({quote(fk.column.name)})"
+    on_delete = f" ON DELETE {fk.ondelete}" if fk.ondelete else ""
+    if dialect.name == "sqlite":
+        # SQLite cannot add constraints later, only inline
+        return [f"{sql} REFERENCES {target}{on_delete}"]
+    constraint = quote(f"fk_{column.table.name}_{column.name}")
+    return [sql, f"ALTER TABLE {table} ADD CONSTRAINT {constraint} FOREIGN KEY ({name}) REFERENCES {target}{on_delete}"]
+
+
+def upgrade_schema() -> list[str]:
+    """Bring existing tables up to the models. Returns what was changed."""
+    tables = {table.name: (bind_key, table) for bind_key, table in _tables()}
+    changes = []
+
+    for table_name, column_name, default, backfill in COLUMN_UPGRADES:
+        bind_key, table = tables[table_name]
+        engine = db.engines[bind_key]
+        if column_name in {c["name"] for c in inspect(engine).get_columns(table_name)}:
+            continue
+        statements = _add_column_sql(engine.dialect, table.c[column_name], default)
+        if backfill:
+            statements.append(backfill)
+        with engine.begin() as conn:
+            for sql in statements:
+                conn.execute(text(sql))
+        changes.extend(statements)
+
+    for bind_key, table in _tables():
+        engine = db.engines[bind_key]
+        inspector = inspect(engine)
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            # an index on a column not listed in COLUMN_UPGRADES yet would fail
+            if index.name not in existing and {c.name for c in index.columns} <= columns:
+                index.create(engine)
+                changes.append(f"CREATE INDEX {index.name} ON {table.name}")
+    return changes
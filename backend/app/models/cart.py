@@ -25,6 +25,8 @@ class Cart(db.Model):
     )
     __table_args__ = (
         UniqueConstraint("user_id", "status", name="uq_user_cart_status"),
+        # lifecycle sweeper: idle active carts / closed carts by age
+        db.Index("ix_carts_status_updated_at", "status", "updated_at"),
     )
     @staticmethod
     def get_or_create_active(user_id: int) -> "Cart":
@@ -58,3 +60,30 @@ class CartItem(db.Model):
     )
     def line_total(self) -> int:
         return self.unit_amount * self.quantity
+
+# archived carts (moved out of the hot tables by the cart sweeper)
+class CartHistory(db.Model):
+    __tablename__ = "carts_history"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # original carts.id
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.Enum(CartStatus, name="cart_status_enum"), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    items = db.relationship(
+        "CartItemHistory",
+        backref="cart",
+        lazy=True,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+class CartItemHistory(db.Model):
+    __tablename__ = "cart_items_history"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # original cart_items.id
+    cart_id = db.Column(db.Integer, db.ForeignKey("carts_history.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    unit_amount = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
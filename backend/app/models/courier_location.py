@@ -0,0 +1,21 @@
+from datetime import datetime
+from ..extensions import db
+
+# downsampled courier tracks, written in bulk by utils/courier_locations.py
+# (the live position is only kept in memory)
+class CourierLocation(db.Model):
+    __tablename__ = "courier_locations"
+    id = db.Column(db.Integer, primary_key=True)
+    delivery_user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    lat = db.Column(db.Float, nullable=False)
+    lon = db.Column(db.Float, nullable=False)
+    accuracy_m = db.Column(db.Float, nullable=True)
+    recorded_at = db.Column(db.DateTime, nullable=False)  # device time of the ping
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        db.Index("ix_courier_locations_user_recorded", "delivery_user_id", "recorded_at"),
+    )
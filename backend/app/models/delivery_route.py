@@ -0,0 +1,50 @@
+from datetime import datetime
+import enum
+from ..extensions import db
+
+class DeliveryRouteStatus(enum.Enum):
+    open = "open"          # planned, waiting for a courier (replaced on the next planning run)
+    claimed = "claimed"    # taken as a unit by one courier
+
+# ordered batch of nearby orders (see utils/route_planner.py, utils/delivery.py)
+class DeliveryRoute(db.Model):
+    __tablename__ = "delivery_routes"
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(
+        db.Enum(DeliveryRouteStatus, name="delivery_route_status_enum"),
+        nullable=False,
+        default=DeliveryRouteStatus.open,
+    )
+    delivery_user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    stop_count = db.Column(db.Integer, nullable=False, default=0)
+    distance_km = db.Column(db.Float, nullable=False, default=0)  # depot -> stops -> depot estimate
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    stops = db.relationship(
+        "DeliveryRouteStop",
+        backref="route",
+        order_by="DeliveryRouteStop.seq",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    __table_args__ = (
+        # claim: open routes that fit, oldest first
+        db.Index("ix_delivery_routes_status_stop_count", "status", "stop_count", "id"),
+    )
+
+class DeliveryRouteStop(db.Model):
+    __tablename__ = "delivery_route_stops"
+    id = db.Column(db.Integer, primary_key=True)
+    route_id = db.Column(db.Integer, db.ForeignKey("delivery_routes.id", ondelete="CASCADE"), nullable=False)
+    # archived (delivered / canceled) orders take their stops with them
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id", ondelete="CASCADE"), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # 0 = first stop from the depot
+    order = db.relationship("Order", lazy="joined")
+    __table_args__ = (
+        db.UniqueConstraint("route_id", "seq", name="uq_delivery_route_stops_route_seq"),
+        db.Index("ix_delivery_route_stops_order_id", "order_id"),
+    )
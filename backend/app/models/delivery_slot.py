@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import CheckConstraint
+from ..extensions import db
+
+# bookable delivery window; `booked` is only changed with conditional
+# UPDATEs (see utils/delivery_slots.py), never read-modify-write
+class DeliverySlot(db.Model):
+    __tablename__ = "delivery_slots"
+    id = db.Column(db.Integer, primary_key=True)
+    starts_at = db.Column(db.DateTime, nullable=False, unique=True)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+    )
+    __table_args__ = (
+        CheckConstraint("capacity >= 0", name="ck_delivery_slots_capacity_nonnegative"),
+        CheckConstraint("booked >= 0", name="ck_delivery_slots_booked_nonnegative"),
+    )
+
+    def available(self) -> int:
+        return max(self.capacity - self.booked, 0)
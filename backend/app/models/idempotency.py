@@ -0,0 +1,34 @@
+from datetime import datetime
+import enum
+from sqlalchemy import UniqueConstraint
+from ..extensions import db
+
+class IdempotencyStatus(enum.Enum):
+    in_progress = "in_progress"
+    completed = "completed"
+
+# stored responses for Idempotency-Key replay (see utils/idempotency.py)
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    # sha256 of method + path + query string + body; same key with another request is rejected
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status = db.Column(
+        db.Enum(IdempotencyStatus, name="idempotency_status_enum"),
+        nullable=False,
+        default=IdempotencyStatus.in_progress,
+    )
+    response_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    # [[name, value], ...] replayed with the body (Location, Retry-After, ...)
+    response_headers = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # execution lease of an in_progress row; once past, a retry may take over
+    locked_until = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    __table_args__ = (
+        UniqueConstraint("user_id", "endpoint", "key", name="uq_idempotency_user_endpoint_key"),
+    )
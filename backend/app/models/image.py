@@ -1,6 +1,14 @@
 from datetime import datetime
+import enum
 from ..extensions import db
 
+# uploaded images get their renditions in the background (see utils/image_pipeline.py);
+# seeded / older rows have none and count as ready
+class ImageStatus(enum.Enum):
+    processing = "processing"
+    ready = "ready"
+    failed = "failed"
+
 class CategoryImage(db.Model):
     __tablename__ = "category_images"
     id = db.Column(db.Integer, primary_key=True)
@@ -11,8 +19,13 @@ class CategoryImage(db.Model):
         unique=True,   # exactly ONE image per category
         index=True,
     )
-    storage_key = db.Column(db.String(500), nullable=False)
+    storage_key = db.Column(db.String(500), nullable=False)  # original upload
+    status = db.Column(db.Enum(ImageStatus, name="image_status_enum"), nullable=False, default=ImageStatus.ready, index=True)
+    # rendition name -> {"key", "width", "height"}
+    renditions = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class ProductImage(db.Model):
     __tablename__ = "product_images"
@@ -24,5 +37,10 @@ class ProductImage(db.Model):
         nullable=False,
         index=True,
     )
-    storage_key = db.Column(db.String(500), nullable=False)
+    storage_key = db.Column(db.String(500), nullable=False)  # original upload
+    status = db.Column(db.Enum(ImageStatus, name="image_status_enum"), nullable=False, default=ImageStatus.ready, index=True)
+    # rendition name -> {"key", "width", "height"}
+    renditions = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
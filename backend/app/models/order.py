@@ -59,6 +59,19 @@ class Order(db.Model):
     )
     address = db.Column(db.String(255), nullable=False)
     phone_number = db.Column(db.String(50), nullable=False)
+    # courier assignment (see utils/delivery.py)
+    delivery_user_id = db.Column(
+        db.Integer,
+        db.ForeignKey("users.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    assigned_at = db.Column(db.DateTime, nullable=True)
+    # booked delivery window (see utils/delivery_slots.py)
+    delivery_slot_id = db.Column(
+        db.Integer,
+        db.ForeignKey("delivery_slots.id", ondelete="SET NULL"),
+        nullable=True,
+    )
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(
         db.DateTime,
@@ -86,6 +99,16 @@ class Order(db.Model):
         CheckConstraint("discount_amount >= 0", name="ck_orders_discount_nonnegative"),
         CheckConstraint("tax_amount >= 0", name="ck_orders_tax_nonnegative"),
         CheckConstraint("total_amount >= 0", name="ck_orders_total_nonnegative"),
+        # order history keyset pagination on (created_at, id)
+        db.Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+        db.Index("ix_orders_delivery_status_created_at", "delivery_status", "created_at"),
+        db.Index("ix_orders_payment_status_created_at", "payment_status", "created_at"),
+        db.Index("ix_orders_created_at", "created_at"),
+        # per-courier work queue
+        db.Index("ix_orders_delivery_user_status_assigned", "delivery_user_id", "delivery_status", "assigned_at"),
+        db.Index("ix_orders_delivery_slot_id", "delivery_slot_id"),
+        # ids move to the archive tables; never hand them out again
+        {"sqlite_autoincrement": True},
     )
     def recalc_totals(self) :
         """Recalculate derived totals from items and modifiers."""
@@ -94,7 +117,8 @@ class Order(db.Model):
             unit=oi.unit_amount or 0
             qty=oi.quantity or 0
             self.subtotal_amount += unit * qty
-        self.total_amount =self.subtotal_amount
+        discount = min(self.discount_amount or 0, self.subtotal_amount)
+        self.total_amount = self.subtotal_amount - discount + (self.shipping_amount or 0) + (self.tax_amount or 0)
     def cancel(self, user) -> tuple[bool, str]:
         """
         Cancel rules:
@@ -138,6 +162,8 @@ class OrderItem(db.Model):
     __table_args__ = (
         CheckConstraint("unit_amount >= 0", name="ck_order_items_unit_amount_nonnegative"),
         CheckConstraint("quantity >= 1", name="ck_order_items_quantity_positive"),
+        # ids move to the archive tables; never hand them out again
+        {"sqlite_autoincrement": True},
     )
 
 
@@ -164,7 +190,19 @@ class Payment(db.Model):
     amount = db.Column(db.Integer, nullable=False)
     # PayPal order id / PSP payment id, etc.
     provider_payment_id = db.Column(db.String(128), unique=True, index=True, nullable=True)
+    # PSP retries (utils/payment_gateway.py): retryable failures of the current
+    # step (authorize, then capture), and when the retry job may submit it again
+    provider_attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    # set when the payment is captured; a refund only counts against sales
+    # (rollups) if money was captured first, authorized -> refunded is a release
+    captured_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     __table_args__ = (
         CheckConstraint("amount >= 0", name="ck_payments_amount_nonnegative"),
+        # payments ledger keyset pagination on (created_at, id) + per-status totals
+        db.Index("ix_payments_status_created_at", "status", "created_at"),
+        db.Index("ix_payments_created_at", "created_at"),
+        # ids move to the archive tables; never hand them out again
+        {"sqlite_autoincrement": True},
     )
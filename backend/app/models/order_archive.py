@@ -0,0 +1,87 @@
+from __future__ import annotations
+from datetime import datetime
+from ..extensions import db
+from .order import OrderPaymentStatus, DeliveryStatus, PaymentProvider, PaymentStatus
+
+# Cold copies of closed orders (see utils/order_archive.py).
+# Same columns and ids as orders / order_items / payments so response
+# schemas and keyset cursors work on both. Lives on the "archive" bind
+# (ARCHIVE_DATABASE_URI, defaults to the main database).
+
+class OrderArchive(db.Model):
+    __tablename__ = "orders_archive"
+    __bind_key__ = "archive"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    subtotal_amount = db.Column(db.Integer, nullable=False)
+    shipping_amount = db.Column(db.Integer, nullable=False)
+    discount_amount = db.Column(db.Integer, nullable=False)
+    tax_amount = db.Column(db.Integer, nullable=False)
+    total_amount = db.Column(db.Integer, nullable=False)
+    payment_status = db.Column(db.Enum(OrderPaymentStatus, name="order_payment_status_enum"), nullable=False)
+    delivery_status = db.Column(db.Enum(DeliveryStatus, name="delivery_status_enum"), nullable=False)
+    address = db.Column(db.String(255), nullable=False)
+    phone_number = db.Column(db.String(50), nullable=False)
+    delivery_user_id = db.Column(db.Integer, nullable=True)
+    assigned_at = db.Column(db.DateTime, nullable=True)
+    delivery_slot_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    items = db.relationship(
+        "OrderItemArchive",
+        backref="order",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    payments = db.relationship(
+        "PaymentArchive",
+        backref="order",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    __table_args__ = (
+        db.Index("ix_orders_archive_user_id_created_at", "user_id", "created_at"),
+        db.Index("ix_orders_archive_delivery_status_created_at", "delivery_status", "created_at"),
+        db.Index("ix_orders_archive_payment_status_created_at", "payment_status", "created_at"),
+        db.Index("ix_orders_archive_created_at", "created_at"),
+    )
+
+class OrderItemArchive(db.Model):
+    __tablename__ = "order_items_archive"
+    __bind_key__ = "archive"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_id = db.Column(
+        db.Integer,
+        db.ForeignKey("orders_archive.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    unit_amount = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+class PaymentArchive(db.Model):
+    __tablename__ = "payments_archive"
+    __bind_key__ = "archive"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    order_id = db.Column(
+        db.Integer,
+        db.ForeignKey("orders_archive.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    provider = db.Column(db.Enum(PaymentProvider, name="payment_provider_enum"), nullable=False)
+    status = db.Column(db.Enum(PaymentStatus, name="payment_status_enum"), nullable=False)
+    currency = db.Column(db.String(3), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+    provider_payment_id = db.Column(db.String(128), unique=True, index=True, nullable=True)
+    captured_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    __table_args__ = (
+        db.Index("ix_payments_archive_status_created_at", "status", "created_at"),
+        db.Index("ix_payments_archive_created_at", "created_at"),
+    )
@@ -0,0 +1,36 @@
+from datetime import datetime
+import enum
+from ..extensions import db
+
+class OrderIntentStatus(enum.Enum):
+    queued = "queued"
+    processing = "processing"
+    completed = "completed"
+    failed = "failed"
+
+# async checkout job (durable queue row, see utils/checkout_queue.py)
+class OrderIntent(db.Model):
+    __tablename__ = "order_intents"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    cart_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(
+        db.Enum(OrderIntentStatus, name="order_intent_status_enum"),
+        nullable=False,
+        default=OrderIntentStatus.queued,
+    )
+    # checkout fields (address, phone_number, payment_provider) + product_ids
+    payload = db.Column(db.JSON, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    error = db.Column(db.JSON, nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    # fencing token: bumped on every claim; a worker only finishes the attempt it claimed
+    attempt = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        # dispatcher scans queued intents in FIFO order
+        db.Index("ix_order_intents_status_id", "status", "id"),
+    )
+    def is_final(self) -> bool:
+        return self.status in {OrderIntentStatus.completed, OrderIntentStatus.failed}
@@ -0,0 +1,37 @@
+from datetime import datetime
+from ..extensions import db
+
+# transactional outbox: one row per order / payment state change, written
+# in the same transaction as the change (see utils/outbox.py)
+class OutboxEvent(db.Model):
+    __tablename__ = "outbox_events"
+    __table_args__ = {"sqlite_autoincrement": True}  # ids are the delivery order
+    id = db.Column(db.Integer, primary_key=True)
+    event_type = db.Column(db.String(50), nullable=False)      # e.g. order.placed
+    aggregate_type = db.Column(db.String(20), nullable=False)  # order | payment
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "type": self.event_type,
+            "aggregate_type": self.aggregate_type,
+            "aggregate_id": self.aggregate_id,
+            "payload": self.payload,
+            "created_at": self.created_at.isoformat(),
+        }
+
+# delivery progress of one sink
+class OutboxCheckpoint(db.Model):
+    __tablename__ = "outbox_checkpoints"
+    sink = db.Column(db.String(50), primary_key=True)
+    last_event_id = db.Column(db.Integer, nullable=False, default=0)  # every id <= this is done
+    high_event_id = db.Column(db.Integer, nullable=False, default=0)  # highest id delivered
+    # ids below high_event_id not committed when it passed them: {"id": first seen (epoch s)}
+    gaps = db.Column(db.JSON, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # consecutive failures
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
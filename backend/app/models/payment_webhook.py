@@ -0,0 +1,16 @@
+from datetime import datetime
+from sqlalchemy import UniqueConstraint
+from ..extensions import db
+
+# PSP webhook events already applied (dedup of provider retries, see utils/payments.py)
+class PaymentWebhookEvent(db.Model):
+    __tablename__ = "payment_webhook_events"
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)
+    event_id = db.Column(db.String(128), nullable=False)
+    payment_id = db.Column(db.Integer, nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    __table_args__ = (
+        UniqueConstraint("provider", "event_id", name="uq_payment_webhook_provider_event"),
+    )
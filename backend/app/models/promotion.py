@@ -0,0 +1,61 @@
+from datetime import datetime
+import enum
+from ..extensions import db
+
+class PromotionKind(enum.Enum):
+    percent_off = "percent_off"          # percent of the line (or basket)
+    fixed_off = "fixed_off"              # amount off per unit (or off the basket)
+    buy_x_get_y = "buy_x_get_y"          # every buy_qty + get_qty units, get_qty are free
+    basket_threshold = "basket_threshold"  # percent / amount off once subtotal >= min_subtotal
+
+class PromotionScope(enum.Enum):
+    product = "product"
+    category = "category"
+    basket = "basket"
+
+# see utils/promotions.py for how rules are indexed and combined
+class Promotion(db.Model):
+    __tablename__ = "promotions"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(150), nullable=False)
+    kind = db.Column(db.Enum(PromotionKind, name="promotion_kind_enum"), nullable=False)
+    scope = db.Column(db.Enum(PromotionScope, name="promotion_scope_enum"), nullable=False)
+    percent = db.Column(db.Integer, nullable=True)        # 1..100
+    amount_off = db.Column(db.Integer, nullable=True)     # minor units
+    buy_qty = db.Column(db.Integer, nullable=True)
+    get_qty = db.Column(db.Integer, nullable=True)
+    min_subtotal = db.Column(db.Integer, nullable=True)   # basket_threshold
+    max_discount = db.Column(db.Integer, nullable=True)   # cap per application
+    priority = db.Column(db.Integer, nullable=False, default=0)  # tie breaker, higher wins
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    starts_at = db.Column(db.DateTime, nullable=True)
+    ends_at = db.Column(db.DateTime, nullable=True)
+    # bumped on every change; compiled rules are cached per (id, version)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    targets = db.relationship(
+        "PromotionTarget",
+        backref="promotion",
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+    __table_args__ = (
+        db.Index("ix_promotions_is_active_ends_at", "is_active", "ends_at"),
+    )
+
+# product / category a product- or category-scoped promotion applies to
+class PromotionTarget(db.Model):
+    __tablename__ = "promotion_targets"
+    id = db.Column(db.Integer, primary_key=True)
+    promotion_id = db.Column(db.Integer, db.ForeignKey("promotions.id", ondelete="CASCADE"), nullable=False, index=True)
+    product_id = db.Column(db.Integer, nullable=True, index=True)
+    category_id = db.Column(db.Integer, nullable=True, index=True)
+
+# single row: bumped with every promotion change so other processes
+# know when to rebuild their in-memory rule index
+class PromotionCatalog(db.Model):
+    __tablename__ = "promotion_catalog"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
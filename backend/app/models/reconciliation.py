@@ -0,0 +1,61 @@
+from datetime import datetime
+import enum
+from ..extensions import db
+
+class ReconciliationRunStatus(enum.Enum):
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class ReconciliationOutcome(enum.Enum):
+    matched = "matched"
+    mismatch = "mismatch"    # amount / currency / status differ (see issues)
+    missing = "missing"      # in the settlement file, no such payment here
+    orphan = "orphan"        # captured/refunded here, absent from the file
+    invalid = "invalid"      # unparseable settlement row
+
+# one settlement file checked against payments (see utils/reconciliation.py)
+class ReconciliationRun(db.Model):
+    __tablename__ = "reconciliation_runs"
+    id = db.Column(db.Integer, primary_key=True)
+    provider = db.Column(db.String(20), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    # payments created in [date_from, date_to) are expected in the file
+    date_from = db.Column(db.DateTime, nullable=False)
+    date_to = db.Column(db.DateTime, nullable=False)
+    status = db.Column(
+        db.Enum(ReconciliationRunStatus, name="reconciliation_run_status_enum"),
+        nullable=False,
+        default=ReconciliationRunStatus.running,
+    )
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    matched = db.Column(db.Integer, nullable=False, default=0)
+    mismatched = db.Column(db.Integer, nullable=False, default=0)
+    missing = db.Column(db.Integer, nullable=False, default=0)
+    orphans = db.Column(db.Integer, nullable=False, default=0)
+    invalid = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+class ReconciliationItem(db.Model):
+    __tablename__ = "reconciliation_items"
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey("reconciliation_runs.id", ondelete="CASCADE"), nullable=False)
+    outcome = db.Column(
+        db.Enum(ReconciliationOutcome, name="reconciliation_outcome_enum"),
+        nullable=False,
+    )
+    line_no = db.Column(db.Integer, nullable=True)  # settlement file line (None for orphans)
+    provider_payment_id = db.Column(db.String(128), nullable=True)
+    payment_id = db.Column(db.Integer, nullable=True)
+    issues = db.Column(db.JSON, nullable=True)  # e.g. ["amount", "status"]
+    settled_amount = db.Column(db.Integer, nullable=True)
+    settled_currency = db.Column(db.String(3), nullable=True)
+    settled_status = db.Column(db.String(20), nullable=True)
+    __table_args__ = (
+        db.Index("ix_reconciliation_items_run_outcome", "run_id", "outcome", "id"),
+        # orphan detection: NOT EXISTS (run_id, payment_id)
+        db.Index("ix_reconciliation_items_run_payment", "run_id", "payment_id"),
+    )
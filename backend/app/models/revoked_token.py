@@ -0,0 +1,14 @@
+from datetime import datetime
+from ..extensions import db
+
+# revoked JWTs (logout), kept until the token would have expired anyway
+# (see utils/token_revocation.py)
+class RevokedToken(db.Model):
+    __tablename__ = "revoked_tokens"
+    __table_args__ = {"sqlite_autoincrement": True}  # ids are the refresh watermark
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), nullable=False, unique=True)
+    token_type = db.Column(db.String(10), nullable=False)  # access | refresh
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
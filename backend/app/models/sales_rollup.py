@@ -0,0 +1,25 @@
+from datetime import datetime
+from ..extensions import db
+
+# Pre-aggregated sales per order day (see utils/sales_rollup.py).
+# Money in minor units (agorot/cents).
+
+class SalesDailyProduct(db.Model):
+    __tablename__ = "sales_daily_product"
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True, index=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    gross_amount = db.Column(db.Integer, nullable=False, default=0)
+    captured_amount = db.Column(db.Integer, nullable=False, default=0)
+    refunded_amount = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class SalesDailyCategory(db.Model):
+    __tablename__ = "sales_daily_category"
+    day = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, primary_key=True, index=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    gross_amount = db.Column(db.Integer, nullable=False, default=0)
+    captured_amount = db.Column(db.Integer, nullable=False, default=0)
+    refunded_amount = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,7 +1,7 @@
 from datetime import datetime
 import enum
-from werkzeug.security import generate_password_hash, check_password_hash
 from ..extensions import db
+from ..utils.password_hashing import password_hasher
 
 class UserRole(enum.Enum):
     USER = "user"
@@ -19,14 +19,21 @@ class User(db.Model):
     default_phone = db.Column(db.String(20), nullable=False)
     # ONE image per user: store key/url (NULL => default avatar in config)
     profile_image_key = db.Column(db.String(500), nullable=True)
+    # carried in JWT claims ("ver"); bumping it invalidates tokens issued before
+    token_version = db.Column(db.Integer, nullable=False, default=1)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     carts = db.relationship("Cart", backref="user", lazy=True)
-    orders = db.relationship("Order", backref="user", lazy=True)
+    orders = db.relationship("Order", backref="user", lazy=True, foreign_keys="Order.user_id")
+    # hashing runs in the password hasher's process pool (PASSWORD_HASH_*)
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+    def password_needs_rehash(self) -> bool:
+        return password_hasher.needs_rehash(self.password_hash)
+    def bump_token_version(self) -> None:
+        self.token_version = (self.token_version or 1) + 1
     def is_admin(self) -> bool:
         return self.role == UserRole.ADMIN
     def is_delivery(self) -> bool:
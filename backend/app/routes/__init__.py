@@ -7,6 +7,9 @@ from .order_routes import order_bp
 from .files_routes import files_bp
 from .payment_routes import payment_bp
 from .delivery_routes import delivery_bp
+from .analytics_routes import analytics_bp
+from .export_routes import export_bp
+from .promotion_routes import promotion_bp
 
 def _register_once(app, bp, name=None, url_prefix=None):
     key = name or bp.name
@@ -24,3 +27,6 @@ def register_blueprints(app):
     _register_once(app, files_bp, name="files_routes_bp")
     _register_once(app, payment_bp, name="payment_routes_bp")
     _register_once(app, delivery_bp, name="delivery_routes_bp")
+    _register_once(app, analytics_bp, name="analytics_routes_bp")
+    _register_once(app, export_bp, name="export_routes_bp")
+    _register_once(app, promotion_bp, name="promotion_routes_bp", url_prefix="/promotions")
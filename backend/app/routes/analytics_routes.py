@@ -0,0 +1,89 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+from sqlalchemy import func
+
+from ..extensions import db
+from ..utils.api import api_error, get_current_user, require_admin
+from ..models.sales_rollup import SalesDailyProduct, SalesDailyCategory
+from ..models.product import Product
+from ..models.category import Category
+from ..schemas.analytics_schema import SalesQuerySchema, SalesRowSchema, SALES_METRICS
+
+analytics_bp = Blueprint("analytics", __name__)
+
+
+def _load_query():
+    """Admin + parsed ?from&to; returns (args, None) or (None, error response)."""
+    user, err = get_current_user()
+    if err:
+        return None, err
+    err = require_admin(user)
+    if err:
+        return None, err
+    try:
+        return SalesQuerySchema().load(request.args.to_dict()), None
+    except ValidationError as ve:
+        return None, api_error("Validation error", 400, ve.messages)
+
+
+def _sums(model):
+    return [func.sum(getattr(model, m)).label(m) for m in SALES_METRICS]
+
+
+@analytics_bp.get("/sales/daily")
+@jwt_required()
+def sales_daily():
+    """Totals per day, read from sales_daily_product."""
+    args, err = _load_query()
+    if err:
+        return err
+    rows = (
+        db.session.query(SalesDailyProduct.day, *_sums(SalesDailyProduct))
+        .filter(SalesDailyProduct.day >= args["date_from"], SalesDailyProduct.day < args["date_to"])
+        .group_by(SalesDailyProduct.day)
+        .order_by(SalesDailyProduct.day)
+        .all()
+    )
+    return jsonify(SalesRowSchema(many=True, only=["day", *SALES_METRICS]).dump(rows)), 200
+
+
+@analytics_bp.get("/sales/products")
+@jwt_required()
+def sales_by_product():
+    """Top products in the range (?order_by=gross_amount&limit=20)."""
+    args, err = _load_query()
+    if err:
+        return err
+    sums = _sums(SalesDailyProduct)
+    order_col = next(c for c in sums if c.name == args["order_by"])
+    rows = (
+        db.session.query(SalesDailyProduct.product_id, Product.name, *sums)
+        .join(Product, Product.id == SalesDailyProduct.product_id)
+        .filter(SalesDailyProduct.day >= args["date_from"], SalesDailyProduct.day < args["date_to"])
+        .group_by(SalesDailyProduct.product_id, Product.name)
+        .order_by(order_col.desc())
+        .limit(args["limit"])
+        .all()
+    )
+    return jsonify(SalesRowSchema(many=True, only=["product_id", "name", *SALES_METRICS]).dump(rows)), 200
+
+
+@analytics_bp.get("/sales/categories")
+@jwt_required()
+def sales_by_category():
+    args, err = _load_query()
+    if err:
+        return err
+    sums = _sums(SalesDailyCategory)
+    order_col = next(c for c in sums if c.name == args["order_by"])
+    rows = (
+        db.session.query(SalesDailyCategory.category_id, Category.name, *sums)
+        .join(Category, Category.id == SalesDailyCategory.category_id)
+        .filter(SalesDailyCategory.day >= args["date_from"], SalesDailyCategory.day < args["date_to"])
+        .group_by(SalesDailyCategory.category_id, Category.name)
+        .order_by(order_col.desc())
+        .limit(args["limit"])
+        .all()
+    )
+    return jsonify(SalesRowSchema(many=True, only=["category_id", "name", *SALES_METRICS]).dump(rows)), 200
@@ -2,13 +2,17 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
+    decode_token,
     jwt_required,
+    get_jwt,
     get_jwt_identity
 )
 from ..extensions import db
 from ..models.user import User, UserRole
 from ..schemas.user_schema import UserResponseSchema
-from ..utils.api import api_error  # use shared helper
+from ..utils.api import api_error, get_current_user  # use shared helper
+from ..utils.principal_cache import principal_cache, token_claims
+from ..utils.token_revocation import token_revocations
 
 auth_bp = Blueprint("auth_routes", __name__)
 def _normalize_str(value):
@@ -66,9 +70,13 @@ def login():
     user = User.query.filter_by(email=email).first()
     if not user or not user.check_password(password):
         return api_error("Invalid credentials", 401)
+    if user.password_needs_rehash():
+        user.set_password(password)  # upgrade to the current PASSWORD_HASH_METHOD
+        db.session.commit()
 
-    access = create_access_token(identity=str(user.id))
-    refresh = create_refresh_token(identity=str(user.id))
+    # role / version claims let get_current_user skip the users table
+    access = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
+    refresh = create_refresh_token(identity=str(user.id), additional_claims=token_claims(user))
 
     # Returning user object helps your React app immediately know role/name
     return jsonify({
@@ -81,9 +89,44 @@ def login():
 @auth_bp.post("/refresh")
 @jwt_required(refresh=True)
 def refresh():
-    user_id = int(get_jwt_identity())
-    access = create_access_token(identity=str(user_id))
+    user, err = get_current_user()
+    if err:
+        return err
+    access = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
     return jsonify({"access_token": access}), 200
+# --- Logout ---
+@auth_bp.post("/logout")
+@jwt_required(verify_type=False)
+def logout():
+    """
+    Revoke the presented token (access or refresh). Optional body:
+      {"refresh_token": "..."}  revoke that refresh token too
+      {"all": true}             end every session of this user
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    claims = get_jwt()
+    data = request.get_json(silent=True) or {}
+
+    refresh_claims = None
+    if data.get("refresh_token"):
+        try:
+            refresh_claims = decode_token(data["refresh_token"], allow_expired=True)
+        except Exception:
+            return api_error("Invalid refresh token", 400)
+        if refresh_claims.get("type") != "refresh" or refresh_claims.get("sub") != claims["sub"]:
+            return api_error("Invalid refresh token", 400)
+
+    token_revocations.revoke(claims, user.id)
+    if refresh_claims:
+        token_revocations.revoke(refresh_claims, user.id)
+    if data.get("all") is True:
+        # tokens not presented here are cut off by the version claim
+        db.session.get(User, user.id).bump_token_version()
+        db.session.commit()
+        principal_cache.invalidate(user.id)
+    return jsonify({"message": "Logged out"}), 200
 # --- Get own profile ---
 @auth_bp.get("/me")
 @jwt_required()
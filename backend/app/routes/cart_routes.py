@@ -3,22 +3,62 @@ from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
 from ..extensions import db
-from ..models.cart import Cart, CartItem
 from ..models.product import Product
-from ..schemas.cart_schema import CartResponseSchema, CartItemAddSchema, CartItemUpdateSchema
+from ..models.image import ProductImage
+from ..schemas.cart_schema import (
+    CartResponseSchema,
+    CartExpandedResponseSchema,
+    CartItemAddSchema,
+    CartItemUpdateSchema,
+)
 from ..utils.api import api_error, get_current_user
+from ..utils.cart_store import cart_store
+from ..utils.promotions import promotion_engine
 
 cart_bp = Blueprint("cart", __name__)
 
 
+def _load_product_summaries(product_ids) -> dict:
+    """One joined query: product fields + main image key, keyed by product id."""
+    if not product_ids:
+        return {}
+    rows = (
+        db.session.query(
+            Product.id,
+            Product.name,
+            Product.price_amount,
+            Product.quantity,
+            Product.is_active,
+            ProductImage.storage_key.label("main_image_key"),
+        )
+        .outerjoin(ProductImage, ProductImage.id == Product.main_image_id)
+        .filter(Product.id.in_(set(product_ids)))
+        .all()
+    )
+    return {row.id: row for row in rows}
+
+
+def _dump_cart(cart) -> dict:
+    """
+    Supports embedding product summaries:
+      - /cart?expand=product
+    """
+    expand = {v.strip() for v in (request.args.get("expand") or "").split(",")}
+    pricing = promotion_engine.price_cart(cart)
+    if "product" not in expand:
+        return CartResponseSchema(context={"pricing": pricing}).dump(cart)
+    products = _load_product_summaries([item.product_id for item in cart.items])
+    return CartExpandedResponseSchema(context={"products": products, "pricing": pricing}).dump(cart)
+
+
 @cart_bp.get("/")
 @jwt_required()
 def get_cart():
     user, err = get_current_user()
     if err:
         return err
-    cart = Cart.get_or_create_active(user.id)
-    return jsonify(CartResponseSchema().dump(cart)), 200
+    cart = cart_store.get_cart(user.id)
+    return jsonify(_dump_cart(cart)), 200
 
 
 @cart_bp.post("/items")
@@ -34,7 +74,7 @@ def add_item():
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
-    cart = Cart.get_or_create_active(user.id)
+    cart = cart_store.get_cart(user.id)
 
     product = Product.query.get(validated["product_id"])
     if not product:
@@ -46,28 +86,19 @@ def add_item():
     if product.quantity < qty_to_add:
         return api_error("Insufficient product quantity", 400)
 
-    existing = CartItem.query.filter_by(cart_id=cart.id, product_id=product.id).first()
+    existing = cart_store.find_item(cart, product_id=product.id)
+    new_qty = qty_to_add
     if existing:
         new_qty = existing.quantity + qty_to_add
         if product.quantity < new_qty:
             return api_error("Insufficient product quantity", 400)
 
-        existing.quantity = new_qty
-        existing.unit_amount = product.price_amount  # refresh snapshot
-    else:
-        item = CartItem(
-            cart_id=cart.id,
-            product_id=product.id,
-            quantity=qty_to_add,
-            unit_amount=product.price_amount,  # snapshot price
-        )
-        db.session.add(item)
-
-    db.session.commit()
-    return jsonify(CartResponseSchema().dump(cart)), 200
+    cart_store.set_item(cart, product, new_qty)  # refreshes price snapshot
+    cart_store.save(cart)
+    return jsonify(_dump_cart(cart)), 200
 
 
-@cart_bp.put("/items/<int:item_id>")
+@cart_bp.put("/items/<int(signed=True):item_id>")
 @jwt_required()
 def update_item(item_id):
     user, err = get_current_user()
@@ -80,8 +111,8 @@ def update_item(item_id):
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
-    cart = Cart.get_or_create_active(user.id)
-    item = CartItem.query.filter_by(id=item_id, cart_id=cart.id).first()
+    cart = cart_store.get_cart(user.id)
+    item = cart_store.find_item(cart, item_id=item_id)
     if not item:
         return api_error("Cart item not found", 404)
 
@@ -95,26 +126,25 @@ def update_item(item_id):
     if product.quantity < new_qty:
         return api_error("Insufficient product quantity", 400)
 
-    item.quantity = new_qty
-    item.unit_amount = product.price_amount  # refresh snapshot
-    db.session.commit()
+    cart_store.set_item(cart, product, new_qty)  # refreshes price snapshot
+    cart_store.save(cart)
 
-    return jsonify(CartResponseSchema().dump(cart)), 200
+    return jsonify(_dump_cart(cart)), 200
 
 
-@cart_bp.delete("/items/<int:item_id>")
+@cart_bp.delete("/items/<int(signed=True):item_id>")
 @jwt_required()
 def delete_item(item_id):
     user, err = get_current_user()
     if err:
         return err
 
-    cart = Cart.get_or_create_active(user.id)
-    item = CartItem.query.filter_by(id=item_id, cart_id=cart.id).first()
+    cart = cart_store.get_cart(user.id)
+    item = cart_store.find_item(cart, item_id=item_id)
     if not item:
         return api_error("Cart item not found", 404)
 
-    db.session.delete(item)
-    db.session.commit()
+    cart_store.remove_item(cart, item)
+    cart_store.save(cart)
 
-    return jsonify(CartResponseSchema().dump(cart)), 200
+    return jsonify(_dump_cart(cart)), 200
@@ -4,8 +4,10 @@ from marshmallow import ValidationError
 
 from ..extensions import db
 from ..utils.api import api_error, get_current_user, require_admin
+from ..utils.image_pipeline import image_pipeline
+from ..utils.upload import UploadError, save_original
 from ..models.category import Category
-from ..models.image import CategoryImage
+from ..models.image import CategoryImage, ImageStatus
 from ..schemas.category_schema import (CategoryResponseSchema,CategoryCreateSchema,CategoryUpdateSchema,
 )
 
@@ -99,6 +101,45 @@ def update_category(category_id):
     return jsonify(CategoryResponseSchema().dump(category)), 200
 
 
+@category_bp.post("/<int:category_id>/image")
+@jwt_required()
+def upload_category_image(category_id):
+    """Multipart upload (field "image") replacing the category image; renditions follow in the background."""
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    category = Category.query.get(category_id)
+    if not category:
+        return api_error("Category not found", 404)
+
+    image_pipeline.reserve(1)
+    try:
+        try:
+            key = save_original(request.files.get("image"), f"categories/{category.id}")
+        except UploadError as e:
+            return api_error(str(e), 400)
+
+        if category.image:
+            image = category.image
+            image.storage_key = key  # a job still running for the old file is ignored
+            image.status = ImageStatus.processing
+            image.renditions = None
+            image.error = None
+        else:
+            image = CategoryImage(category_id=category.id, storage_key=key, status=ImageStatus.processing)
+            db.session.add(image)
+        db.session.commit()
+
+        image_pipeline.submit("category", image.id, key)
+    finally:
+        image_pipeline.release(1)
+    return jsonify(CategoryResponseSchema().dump(category)), 202
+
+
 @category_bp.delete("/<int:category_id>")
 @jwt_required()
 def delete_category(category_id):
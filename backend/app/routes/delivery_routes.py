@@ -1,11 +1,24 @@
-from flask import Blueprint, request, jsonify
+from datetime import datetime
+
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
 from ..extensions import db
-from ..utils.api import api_error, get_current_user, require_delivery
+from ..utils.api import api_error, get_current_user, require_admin, require_delivery
+from ..utils.courier_locations import courier_locations
+from ..utils.delivery_slots import slot_availability
+from ..utils.delivery import ACTIVE_STATUSES, active_count, apply_bulk_status, assign_order, claim_next_order, claim_route, courier_queue
+from ..utils.outbox import order_event
+from ..models.delivery_route import DeliveryRoute
+from ..models.delivery_slot import DeliverySlot
 from ..models.order import Order, DeliveryStatus
+from ..models.user import User, UserRole
 from ..schemas.order_schema import OrderResponseSchema, DeliveryOrderUpdateSchema
+from ..schemas.delivery_schema import (
+    DeliveryAssignSchema, DeliveryResponseSchema, DeliveryQueueOrderSchema, DeliveryRouteSchema,
+    DeliveryBulkStatusSchema, LocationBatchSchema, CourierPositionSchema, DeliverySlotResponseSchema, DeliverySlotUpdateSchema,
+)
 
 delivery_bp = Blueprint("delivery", __name__)
 
@@ -13,6 +26,43 @@ delivery_bp = Blueprint("delivery", __name__)
 @delivery_bp.get("/orders")
 @jwt_required()
 def list_orders_for_delivery():
+    """The calling courier's queue: assigned / on_the_way orders, oldest assignment first."""
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_delivery(user)
+    if err:
+        return err
+
+    orders = courier_queue(user.id)
+    return jsonify(DeliveryQueueOrderSchema(many=True).dump(orders)), 200
+
+
+@delivery_bp.post("/orders/claim")
+@jwt_required()
+def claim_order():
+    """Take the oldest packed (processing) order; safe under concurrent couriers."""
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_delivery(user)
+    if err:
+        return err
+
+    if active_count(user.id) >= current_app.config["DELIVERY_MAX_ACTIVE_PER_COURIER"]:
+        return api_error("Too many active deliveries", 409)
+
+    order = claim_next_order(user.id)
+    db.session.commit()
+    if order is None:
+        return api_error("No orders waiting for a courier", 404)
+    return jsonify(DeliveryQueueOrderSchema().dump(order)), 200
+
+
+@delivery_bp.post("/routes/claim")
+@jwt_required()
+def claim_delivery_route():
+    """Take the oldest planned route (nearby orders, in driving order) that fits the courier's free slots."""
     user, err = get_current_user()
     if err:
         return err
@@ -20,11 +70,167 @@ def list_orders_for_delivery():
     if err:
         return err
 
-    orders = Order.query.filter(
-        Order.delivery_status.notin_([DeliveryStatus.canceled, DeliveryStatus.delivered])
-    ).all()
+    room = current_app.config["DELIVERY_MAX_ACTIVE_PER_COURIER"] - active_count(user.id)
+    if room <= 0:
+        return api_error("Too many active deliveries", 409)
 
-    return jsonify(OrderResponseSchema(many=True).dump(orders)), 200
+    route = claim_route(user.id, room)
+    db.session.commit()
+    if route is None:
+        return api_error("No planned routes waiting for a courier", 404)
+    return jsonify(DeliveryRouteSchema().dump(route)), 200
+
+
+@delivery_bp.get("/routes/<int:route_id>")
+@jwt_required()
+def get_delivery_route(route_id):
+    user, err = get_current_user()
+    if err:
+        return err
+
+    route = db.session.get(DeliveryRoute, route_id)
+    if not route:
+        return api_error("Route not found", 404)
+    if user.role != UserRole.ADMIN:
+        err = require_delivery(user)
+        if err:
+            return err
+        if route.delivery_user_id != user.id:
+            return api_error("Route is assigned to another courier", 403)
+    return jsonify(DeliveryRouteSchema().dump(route)), 200
+
+
+@delivery_bp.post("/locations")
+@jwt_required()
+def report_locations():
+    """
+    Batched GPS pings from the courier app:
+      {"pings": [{"lat", "lon", "recorded_at"?, "accuracy_m"?}, ...]}
+    Only memory is touched here; the track is written behind in bulk.
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_delivery(user)
+    if err:
+        return err
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validated = LocationBatchSchema().load(data)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+    if len(validated["pings"]) > current_app.config["LOCATION_MAX_PINGS_PER_BATCH"]:
+        return api_error("Too many pings", 413)
+
+    accepted = courier_locations.record(user.id, validated["pings"])
+    return jsonify({"accepted": accepted}), 202
+
+
+@delivery_bp.get("/orders/<int:order_id>/location")
+@jwt_required()
+def get_courier_location(order_id):
+    """Where the order's courier is now (owner or admin, while the order is out for delivery)."""
+    user, err = get_current_user()
+    if err:
+        return err
+
+    order = Order.query.get(order_id)
+    if not order:
+        return api_error("Order not found", 404)
+    if user.role != UserRole.ADMIN and order.user_id != user.id:
+        return api_error("Access denied", 403)
+    if order.delivery_user_id is None or order.delivery_status not in ACTIVE_STATUSES:
+        return api_error("Order is not out for delivery", 404)
+
+    position = courier_locations.latest(order.delivery_user_id)
+    if position is None:
+        return api_error("Courier position unknown", 404)
+    age = (datetime.utcnow() - position.recorded_at).total_seconds()
+    return jsonify(CourierPositionSchema().dump({
+        "delivery_user_id": order.delivery_user_id,
+        "lat": position.lat,
+        "lon": position.lon,
+        "accuracy_m": position.accuracy_m,
+        "recorded_at": position.recorded_at,
+        "stale": age > current_app.config["LOCATION_STALE_SECONDS"],
+    })), 200
+
+
+@delivery_bp.get("/slots")
+@jwt_required()
+def list_delivery_slots():
+    """
+    Bookable slots grouped by day (cached grid):
+      - /slots?days=3   (default and max DELIVERY_SLOT_DAYS)
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+
+    max_days = current_app.config["DELIVERY_SLOT_DAYS"]
+    try:
+        days = int(request.args.get("days") or max_days)
+    except ValueError:
+        return api_error("days must be a number", 400)
+    days = max(0, min(days, max_days))
+    return jsonify({"days": slot_availability.grid(days)}), 200
+
+
+@delivery_bp.put("/slots/<int:slot_id>")
+@jwt_required()
+def update_delivery_slot(slot_id):
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    slot = db.session.get(DeliverySlot, slot_id)
+    if not slot:
+        return api_error("Delivery slot not found", 404)
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validated = DeliverySlotUpdateSchema().load(data)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    slot.capacity = validated["capacity"]  # below `booked` just stops new bookings
+    db.session.commit()
+    slot_availability.invalidate()
+    return jsonify(DeliverySlotResponseSchema().dump(slot)), 200
+
+
+@delivery_bp.post("/orders/<int:order_id>/assign")
+@jwt_required()
+def assign_order_to_courier(order_id):
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    order = Order.query.get(order_id)
+    if not order:
+        return api_error("Order not found", 404)
+
+    data = request.get_json(silent=True) or {}
+    courier = User.query.get(data.get("delivery_user_id")) if isinstance(data.get("delivery_user_id"), int) else None
+    schema = DeliveryAssignSchema()
+    schema.context = {"order": order, "delivery_user": courier}
+    try:
+        validated = schema.load(data)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    if not assign_order(order, validated["delivery_user_id"]):
+        db.session.rollback()
+        return api_error("Order can no longer be assigned", 409)
+    db.session.commit()
+    return jsonify(DeliveryResponseSchema().dump(order)), 200
 
 
 @delivery_bp.put("/orders/<int:order_id>/status")
@@ -40,6 +246,8 @@ def update_delivery_status(order_id):
     order = Order.query.get(order_id)
     if not order:
         return api_error("Order not found", 404)
+    if order.delivery_user_id != user.id:
+        return api_error("Order is not assigned to you", 403)
 
     data = request.get_json(silent=True) or {}
     schema = DeliveryOrderUpdateSchema()
@@ -49,6 +257,38 @@ def update_delivery_status(order_id):
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
+    previous_status = order.delivery_status
     order.delivery_status = DeliveryStatus(validated["delivery_status"])
+    order_event(order, "order.delivery_status_changed", previous_delivery_status=previous_status)
     db.session.commit()
     return jsonify(OrderResponseSchema().dump(order)), 200
+
+
+@delivery_bp.post("/orders/status")
+@jwt_required()
+def bulk_update_delivery_status():
+    """
+    Several orders at once (e.g. a drop-off cluster):
+      {"updates": [{"order_id", "delivery_status"}, ...]}
+    Valid changes are applied in one transaction; the response lists
+    one outcome per order (updated / unchanged / not_found / forbidden / rejected).
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_delivery(user)
+    if err:
+        return err
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validated = DeliveryBulkStatusSchema().load(data)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+    if len(validated["updates"]) > current_app.config["DELIVERY_BULK_STATUS_MAX"]:
+        return api_error("Too many updates", 413)
+
+    results = apply_bulk_status(user.id, validated["updates"])
+    db.session.commit()
+    updated = sum(1 for r in results if r["outcome"] == "updated")
+    return jsonify({"updated": updated, "results": results}), 200
@@ -0,0 +1,46 @@
+from flask import Blueprint, Response, current_app, request, stream_with_context
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+
+from ..utils.api import api_error, get_current_user, require_admin
+from ..utils.csv_export import stream_order_lines, stream_payments
+from ..schemas.export_schema import ExportQuerySchema
+
+export_bp = Blueprint("exports", __name__)
+
+
+def _csv_export(stream_fn, name):
+    """
+    Admin only, streamed CSV:
+      - ?from=2025-01-01T00:00:00&to=2025-02-01T00:00:00
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+    try:
+        args = ExportQuerySchema().load(request.args.to_dict())
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    chunks = stream_fn(args["date_from"], args["date_to"], current_app.config["EXPORT_CHUNK_SIZE"])
+    filename = f"{name}_{args['date_from']:%Y%m%d}_{args['date_to']:%Y%m%d}.csv"
+    return Response(
+        stream_with_context(chunks),
+        mimetype="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@export_bp.get("/orders.csv")
+@jwt_required()
+def export_orders():
+    return _csv_export(stream_order_lines, "orders")
+
+
+@export_bp.get("/payments.csv")
+@jwt_required()
+def export_payments():
+    return _csv_export(stream_payments, "payments")
@@ -1,39 +1,89 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
 from ..extensions import db
 from ..utils.api import api_error, get_current_user, require_admin
-from ..models.cart import Cart, CartStatus
-from ..models.product import Product
-from ..models.order import (
-    Order, OrderItem,
-    OrderPaymentStatus, DeliveryStatus,
-    Payment, PaymentProvider, PaymentStatus,
-)
-from ..models.user import UserRole
+from ..utils.idempotency import idempotent
+from ..utils.pagination import keyset_merge, CursorError
+from ..utils.order_archive import find_order
+from ..utils.outbox import order_event
+from ..utils.sales_rollup import record_checkout, record_cancel
+from ..utils.cart_store import cart_store
+from ..utils.checkout import place_order
+from ..utils.delivery import ACTIVE_STATUSES, assign_order
+from ..utils.delivery_slots import SlotUnavailable, release_slot, rebook_slot, slot_availability
+from ..utils.checkout_queue import checkout_queue
+from ..utils.payment_gateway import payment_gateway
+from ..models.cart import Cart
+from ..models.order import Order, OrderPaymentStatus, DeliveryStatus
+from ..models.order_archive import OrderArchive
+from ..models.order_intent import OrderIntent, OrderIntentStatus
+from ..models.user import User, UserRole
 from ..schemas.order_schema import (
     OrderResponseSchema,
     OrderCreateSchema,
+    OrderIntentCreateSchema,
+    OrderIntentResponseSchema,
+    OrderListQuerySchema,
     AdminOrderUpdateSchema,
 )
+from ..schemas.delivery_schema import DeliveryAssignSchema
 
 order_bp = Blueprint("orders", __name__)
 
 
+def _filter_orders(model, user, args):
+    """Apply list filters to Order or OrderArchive (same columns)."""
+    q = model.query
+    if user.role == UserRole.ADMIN:
+        if "user_id" in args:
+            q = q.filter(model.user_id == args["user_id"])
+    else:
+        q = q.filter(model.user_id == user.id)
+    if "payment_status" in args:
+        q = q.filter(model.payment_status == OrderPaymentStatus(args["payment_status"]))
+    if "delivery_status" in args:
+        q = q.filter(model.delivery_status == DeliveryStatus(args["delivery_status"]))
+    if "date_from" in args:
+        q = q.filter(model.created_at >= args["date_from"])
+    if "date_to" in args:
+        q = q.filter(model.created_at < args["date_to"])
+    return q
+
+
 @order_bp.get("/")
 @jwt_required()
 def list_orders():
+    """
+    Newest first, keyset paginated on (created_at, id):
+      - /orders?limit=20&cursor=<next_cursor>
+      - filters: payment_status, delivery_status, from, to (ISO datetimes)
+      - user_id (admin only; users always see their own orders)
+    """
     user, err = get_current_user()
     if err:
         return err
 
-    if user.role == UserRole.ADMIN:
-        orders = Order.query.all()
-    else:
-        orders = Order.query.filter_by(user_id=user.id).all()
+    try:
+        args = OrderListQuerySchema().load(request.args.to_dict())
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    # hot and archived orders share ids, so one cursor pages through both
+    sources = [
+        (_filter_orders(model, user, args), model.created_at, model.id)
+        for model in (Order, OrderArchive)
+    ]
+    try:
+        orders, next_cursor = keyset_merge(sources, args.get("cursor"), args["limit"])
+    except CursorError as ce:
+        return api_error(str(ce), 400)
 
-    return jsonify(OrderResponseSchema(many=True).dump(orders)), 200
+    return jsonify({
+        "items": OrderResponseSchema(many=True).dump(orders),
+        "next_cursor": next_cursor,
+    }), 200
 
 
 @order_bp.get("/<int:order_id>")
@@ -43,7 +93,7 @@ def get_order(order_id):
     if err:
         return err
 
-    order = Order.query.get(order_id)
+    order = find_order(order_id)  # falls back to the archive
     if not order:
         return api_error("Order not found", 404)
 
@@ -53,16 +103,40 @@ def get_order(order_id):
     return jsonify(OrderResponseSchema().dump(order)), 200
 
 
+def _wants_async_checkout() -> bool:
+    """CHECKOUT_ASYNC for everyone, or per request via `Prefer: respond-async`."""
+    if current_app.config["CHECKOUT_ASYNC"]:
+        return True
+    return "respond-async" in (request.headers.get("Prefer") or "")
+
+
 @order_bp.post("/checkout")
 @jwt_required()
+@idempotent("checkout")
 def checkout():
     user, err = get_current_user()
     if err:
         return err
 
+    data = request.get_json(silent=True) or {}
+
+    if _wants_async_checkout():
+        cart = cart_store.get_cart(user.id)
+        schema = OrderIntentCreateSchema()
+        schema.context = {"cart": cart}
+        try:
+            validated = schema.load(data)
+        except ValidationError as ve:
+            return api_error("Validation error", 400, ve.messages)
+        intent = checkout_queue.enqueue(user.id, cart, validated)
+        resp = jsonify(OrderIntentResponseSchema().dump(intent))
+        resp.headers["Location"] = url_for(".get_order_intent", intent_id=intent.id)
+        return resp, 202
+
+    # write-behind carts must hit the database before we read them
+    cart_store.flush(user.id)
     cart = Cart.get_or_create_active(user.id)
 
-    data = request.get_json(silent=True) or {}
     schema = OrderCreateSchema()
     schema.context={"cart": cart}
     try:
@@ -70,49 +144,56 @@ def checkout():
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
-    order = Order(
-        user_id=user.id,
-        currency="ILS",
-        address=validated["address"],
-        phone_number=validated["phone_number"],
-        payment_status=OrderPaymentStatus.pending,
-        delivery_status=DeliveryStatus.pending,
-    )
-
-    # copy items from cart (snapshot prices)
-    for ci in cart.items:
-        order.items.append(OrderItem(
-            product_id=ci.product_id,
-            unit_amount=ci.unit_amount,
-            quantity=ci.quantity,
-        ))
-
-    order.recalc_totals()
-
-    # decrease stock
-    for ci in cart.items:
-        p = Product.query.get(ci.product_id)
-        p.quantity -= ci.quantity
-
-    # create a payment attempt (created)
-    payment = Payment(
-        order=order,
-        provider=PaymentProvider(validated["payment_provider"]),
-        status=PaymentStatus.created,
-        currency=order.currency,
-        amount=order.total_amount,
-    )
-    order.payments.append(payment)
-
-    # close cart
-    cart.status = CartStatus.converted
-
-    db.session.add(order)
+    try:
+        order = place_order(user.id, cart, validated)
+    except SlotUnavailable as su:
+        db.session.rollback()
+        return api_error(str(su), 409)
     db.session.commit()
+    cart_store.evict(user.id)
+    if order.delivery_slot_id:
+        slot_availability.invalidate()
+    for payment in order.payments:
+        payment_gateway.submit_authorize(payment.id)
 
     return jsonify(OrderResponseSchema().dump(order)), 201
 
 
+@order_bp.get("/intents/<int:intent_id>")
+@jwt_required()
+def get_order_intent(intent_id):
+    """
+    Poll an async checkout:
+      - /intents/7          (current status)
+      - /intents/7?wait=10  (long poll up to 10s for completion)
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+
+    intent = db.session.get(OrderIntent, intent_id)
+    if not intent:
+        return api_error("Order intent not found", 404)
+    if user.role != UserRole.ADMIN and intent.user_id != user.id:
+        return api_error("Access denied", 403)
+
+    try:
+        wait = float(request.args.get("wait") or 0)
+    except ValueError:
+        return api_error("wait must be a number", 400)
+    wait = max(0.0, min(wait, current_app.config["CHECKOUT_MAX_WAIT"]))
+    if wait and not intent.is_final():
+        intent = checkout_queue.wait(intent_id, wait)
+
+    payload = OrderIntentResponseSchema().dump(intent)
+    if intent.status == OrderIntentStatus.completed and intent.order_id:
+        payload["order"] = OrderResponseSchema().dump(find_order(intent.order_id))
+    resp = jsonify(payload)
+    if not intent.is_final():
+        resp.headers["Retry-After"] = "1"
+    return resp, 200
+
+
 @order_bp.put("/<int:order_id>")
 @jwt_required()
 def admin_update_order(order_id):
@@ -133,12 +214,51 @@ def admin_update_order(order_id):
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
+    previous = {"previous_payment_status": order.payment_status,
+                "previous_delivery_status": order.delivery_status}
+    new_delivery_status = DeliveryStatus(validated["delivery_status"]) if "delivery_status" in validated else None
+    if new_delivery_status == DeliveryStatus.assigned:
+        if (
+            order.delivery_status in ACTIVE_STATUSES
+            and validated.get("delivery_user_id", order.delivery_user_id) == order.delivery_user_id
+        ):
+            order.delivery_status = DeliveryStatus.assigned  # e.g. back from on_the_way, same courier
+        else:
+            # same path as POST /delivery/orders/<id>/assign, so the order
+            # has a courier and shows up in that courier's queue
+            courier_id = validated.get("delivery_user_id")
+            schema = DeliveryAssignSchema()
+            schema.context = {"order": order, "delivery_user": User.query.get(courier_id) if courier_id else None}
+            try:
+                schema.load({"delivery_user_id": courier_id} if courier_id else {})
+            except ValidationError as ve:
+                return api_error("Validation error", 400, ve.messages)
+            if not assign_order(order, courier_id):
+                db.session.rollback()
+                return api_error("Order can no longer be assigned", 409)
+    elif new_delivery_status is not None:
+        was_canceled = order.delivery_status == DeliveryStatus.canceled
+        order.delivery_status = new_delivery_status
+        if new_delivery_status in (DeliveryStatus.pending, DeliveryStatus.processing):
+            # back before assignment: off the courier's queue, claimable again
+            order.delivery_user_id = None
+            order.assigned_at = None
+        is_canceled = order.delivery_status == DeliveryStatus.canceled
+        if is_canceled and not was_canceled:
+            record_cancel(order)
+            if order.delivery_slot_id:
+                release_slot(order.delivery_slot_id)
+        elif was_canceled and not is_canceled:
+            record_checkout(order)  # un-cancel counts the sale again
+            if order.delivery_slot_id:
+                rebook_slot(order.delivery_slot_id)
     if "payment_status" in validated:
         order.payment_status = OrderPaymentStatus(validated["payment_status"])
-    if "delivery_status" in validated:
-        order.delivery_status = DeliveryStatus(validated["delivery_status"])
+    order_event(order, "order.updated", **previous)
 
     db.session.commit()
+    if order.delivery_slot_id and "delivery_status" in validated:
+        slot_availability.invalidate()
     return jsonify(OrderResponseSchema().dump(order)), 200
 
 
@@ -153,9 +273,17 @@ def cancel_order(order_id):
     if not order:
         return api_error("Order not found", 404)
 
+    was_canceled = order.delivery_status == DeliveryStatus.canceled
     success, message = order.cancel(user)
     if not success:
         return api_error(message, 400)
+    if not was_canceled:
+        record_cancel(order)
+        if order.delivery_slot_id:
+            release_slot(order.delivery_slot_id)
+        order_event(order, "order.canceled")
 
     db.session.commit()
+    if order.delivery_slot_id and not was_canceled:
+        slot_availability.invalidate()
     return jsonify({"message": message}), 200
@@ -1,19 +1,74 @@
-from flask import Blueprint, request, jsonify
+import hashlib
+import hmac
+import os
+import uuid
+
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
+from sqlalchemy.exc import IntegrityError
 
 from ..extensions import db
 from ..utils.api import api_error, get_current_user, require_admin
+from ..utils.idempotency import idempotent
+from ..utils.order_archive import find_payment
+from ..utils.pagination import keyset_merge, CursorError
+from ..utils.payment_gateway import payment_gateway
+from ..utils.payments import apply_webhook_batch, transition_payment
+from ..utils.reconciliation import submit_reconciliation
 from ..models.order import Order, Payment, PaymentProvider, PaymentStatus, OrderPaymentStatus
+from ..models.order_archive import PaymentArchive
+from ..models.reconciliation import ReconciliationRun, ReconciliationItem, ReconciliationOutcome
 from ..models.user import UserRole
-from ..schemas.payment_schema import PaymentResponseSchema, PaymentCreateSchema, PaymentUpdateSchema, PaymentRefundSchema
+from ..schemas.payment_schema import (
+    PaymentResponseSchema, PaymentListQuerySchema, PaymentCreateSchema, PaymentUpdateSchema, PaymentRefundSchema,
+    PaymentWebhookBatchSchema,
+    ReconciliationCreateSchema, ReconciliationRunResponseSchema,
+    ReconciliationItemQuerySchema, ReconciliationItemResponseSchema,
+)
 
 payment_bp = Blueprint("payments", __name__)
 
 
+def _payment_filters(model, args) -> list:
+    """Ledger filters for Payment or PaymentArchive (same columns)."""
+    conditions = []
+    if "status" in args:
+        conditions.append(model.status == PaymentStatus(args["status"]))
+    if "provider" in args:
+        conditions.append(model.provider == PaymentProvider(args["provider"]))
+    if "currency" in args:
+        conditions.append(model.currency == args["currency"].upper())
+    if "order_id" in args:
+        conditions.append(model.order_id == args["order_id"])
+    if "date_from" in args:
+        conditions.append(model.created_at >= args["date_from"])
+    if "date_to" in args:
+        conditions.append(model.created_at < args["date_to"])
+    return conditions
+
+
+def _page_totals(payments) -> dict:
+    """{status: {"count", "amount"}} over the rows of one page (no extra query)."""
+    totals = {}
+    for payment in payments:
+        t = totals.setdefault(payment.status.value, {"count": 0, "amount": 0})
+        t["count"] += 1
+        t["amount"] += payment.amount
+    return totals
+
+
 @payment_bp.get("/")
 @jwt_required()
 def list_payments():
+    """
+    Payments ledger (admin), newest first, keyset paginated on (created_at, id):
+      - /payments?limit=50&cursor=<next_cursor>
+      - filters: status, provider, currency, order_id, from, to (ISO datetimes)
+    `totals` holds count / amount per status for the items on this page,
+    taken from the rows already fetched, so a page costs the same however
+    large the ledger grows.
+    """
     user, err = get_current_user()
     if err:
         return err
@@ -21,8 +76,27 @@ def list_payments():
     if err:
         return err
 
-    payments = Payment.query.all()
-    return jsonify(PaymentResponseSchema(many=True).dump(payments)), 200
+    try:
+        args = PaymentListQuerySchema().load(request.args.to_dict())
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    # hot and archived payments share ids, so one cursor pages through both
+    sources = [(model, _payment_filters(model, args)) for model in (Payment, PaymentArchive)]
+    try:
+        payments, next_cursor = keyset_merge(
+            [(model.query.filter(*conditions), model.created_at, model.id) for model, conditions in sources],
+            args.get("cursor"),
+            args["limit"],
+        )
+    except CursorError as ce:
+        return api_error(str(ce), 400)
+
+    return jsonify({
+        "items": PaymentResponseSchema(many=True).dump(payments),
+        "next_cursor": next_cursor,
+        "totals": _page_totals(payments),
+    }), 200
 
 
 @payment_bp.get("/<int:payment_id>")
@@ -32,7 +106,7 @@ def get_payment(payment_id):
     if err:
         return err
 
-    payment = Payment.query.get(payment_id)
+    payment = find_payment(payment_id)  # falls back to the archive
     if not payment:
         return api_error("Payment not found", 404)
 
@@ -44,6 +118,7 @@ def get_payment(payment_id):
 
 @payment_bp.post("/orders/<int:order_id>")
 @jwt_required()
+@idempotent("create_payment")
 def create_payment(order_id):
     user, err = get_current_user()
     if err:
@@ -73,6 +148,7 @@ def create_payment(order_id):
 
     db.session.add(payment)
     db.session.commit()
+    payment_gateway.submit_authorize(payment.id)
     return jsonify(PaymentResponseSchema().dump(payment)), 201
 
 
@@ -101,12 +177,8 @@ def update_payment(payment_id):
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
-    payment.status = PaymentStatus(validated["status"])
     payment.provider_payment_id = validated.get("provider_payment_id")
-
-    # if captured => mark order paid
-    if payment.status == PaymentStatus.captured:
-        payment.order.payment_status = OrderPaymentStatus.paid
+    transition_payment(payment, PaymentStatus(validated["status"]))
 
     db.session.commit()
     return jsonify(PaymentResponseSchema().dump(payment)), 200
@@ -133,8 +205,142 @@ def refund_payment(payment_id):
     except ValidationError as ve:
         return api_error("Validation error", 400, ve.messages)
 
-    payment.status = PaymentStatus.refunded
-    payment.order.payment_status = OrderPaymentStatus.refunded
+    transition_payment(payment, PaymentStatus.refunded)
 
     db.session.commit()
     return jsonify(PaymentResponseSchema().dump(payment)), 200
+
+
+def _valid_webhook_signature() -> bool:
+    """X-Webhook-Signature: hex HMAC-SHA256 of the raw body with PAYMENT_WEBHOOK_SECRET."""
+    secret = current_app.config["PAYMENT_WEBHOOK_SECRET"]
+    if not secret:
+        return False
+    expected = hmac.new(secret.encode(), request.get_data(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, request.headers.get("X-Webhook-Signature", ""))
+
+
+@payment_bp.post("/webhooks/<provider>")
+def payment_webhook(provider):
+    """
+    Batch PSP callbacks:
+      {"events": [{"event_id", "provider_payment_id", "status", "amount"?}, ...]}
+    All events are applied in one transaction; the response lists
+    one outcome per event (applied / duplicate / not_found / rejected).
+    """
+    if provider not in {p.value for p in PaymentProvider}:
+        return api_error("Unknown provider", 404)
+    if not _valid_webhook_signature():
+        return api_error("Invalid signature", 401)
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validated = PaymentWebhookBatchSchema().load(data)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+    if len(validated["events"]) > current_app.config["PAYMENT_WEBHOOK_MAX_EVENTS"]:
+        return api_error("Too many events", 413)
+
+    try:
+        results = apply_webhook_batch(PaymentProvider(provider), validated["events"])
+        db.session.commit()
+    except IntegrityError:
+        # a concurrent delivery recorded the same event ids first
+        db.session.rollback()
+        return api_error("Concurrent delivery, retry", 409)
+
+    applied = sum(1 for r in results if r["outcome"] == "applied")
+    return jsonify({"applied": applied, "results": results}), 200
+
+
+# --- settlement reconciliation (admin) ---
+@payment_bp.post("/reconciliations")
+@jwt_required()
+def create_reconciliation():
+    """
+    multipart/form-data: file (settlement CSV), provider, from, to
+    The file is stored and reconciled in the background (202 + run).
+    Larger files: `flask reconcile-payments`.
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    file = request.files.get("file")
+    if not file or file.filename == "":
+        return api_error("No file provided", 400)
+    try:
+        validated = ReconciliationCreateSchema().load(request.form.to_dict())
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    folder = current_app.config["RECONCILIATION_FOLDER"]
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"{uuid.uuid4()}.csv")
+    file.save(path)
+
+    run = ReconciliationRun(
+        provider=validated["provider"],
+        filename=file.filename[:255],
+        date_from=validated["date_from"],
+        date_to=validated["date_to"],
+        created_by=user.id,
+    )
+    db.session.add(run)
+    db.session.commit()
+    submit_reconciliation(run.id, path)
+    return jsonify(ReconciliationRunResponseSchema().dump(run)), 202
+
+
+@payment_bp.get("/reconciliations/<int:run_id>")
+@jwt_required()
+def get_reconciliation(run_id):
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    run = db.session.get(ReconciliationRun, run_id)
+    if not run:
+        return api_error("Reconciliation not found", 404)
+    return jsonify(ReconciliationRunResponseSchema().dump(run)), 200
+
+
+@payment_bp.get("/reconciliations/<int:run_id>/items")
+@jwt_required()
+def list_reconciliation_items(run_id):
+    """
+    Report rows, keyset by id:
+      - ?outcome=mismatch|missing|orphan|invalid|matched
+      - ?after=<last id>&limit=100
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    if not db.session.get(ReconciliationRun, run_id):
+        return api_error("Reconciliation not found", 404)
+    try:
+        args = ReconciliationItemQuerySchema().load(request.args.to_dict())
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    query = ReconciliationItem.query.filter(
+        ReconciliationItem.run_id == run_id,
+        ReconciliationItem.id > args["after"],
+    )
+    if "outcome" in args:
+        query = query.filter(ReconciliationItem.outcome == ReconciliationOutcome(args["outcome"]))
+    items = query.order_by(ReconciliationItem.id).limit(args["limit"]).all()
+    return jsonify({
+        "items": ReconciliationItemResponseSchema(many=True).dump(items),
+        "next_after": items[-1].id if len(items) == args["limit"] else None,
+    }), 200
@@ -1,12 +1,16 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from marshmallow import ValidationError
 
 from ..extensions import db
 from ..utils.api import api_error, get_current_user, require_admin
+from ..utils.image_pipeline import image_pipeline
+from ..utils.upload import UploadError, save_original
 from ..models.product import Product
 from ..models.category import Category
+from ..models.image import ImageStatus, ProductImage
 from ..schemas.product_schema import (
+    ProductImageResponseSchema,
     ProductResponseSchema,
     ProductCreateSchema,
     ProductUpdateSchema,
@@ -122,6 +126,65 @@ def update_product(product_id):
     return jsonify(ProductResponseSchema().dump(product)), 200
 
 
+@product_bp.post("/<int:product_id>/images")
+@jwt_required()
+def upload_product_images(product_id):
+    """
+    Multipart upload of one or more images (field "images"). Each file gets
+    a header-only check and is stored as-is; renditions (thumb, card, ...)
+    follow in the background. One outcome per file (accepted / rejected).
+    """
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    product = Product.query.get(product_id)
+    if not product:
+        return api_error("Product not found", 404)
+
+    files = request.files.getlist("images") or request.files.getlist("image")
+    if not files:
+        return api_error("No files provided", 400)
+    if len(files) > current_app.config["IMAGE_MAX_FILES_PER_REQUEST"]:
+        return api_error("Too many files", 413)
+    image_pipeline.reserve(len(files))
+    try:
+        uploads = []  # (filename, ProductImage | None, error)
+        for file in files:
+            try:
+                key = save_original(file, f"products/{product.id}")
+            except UploadError as e:
+                uploads.append((file.filename, None, str(e)))
+                continue
+            image = ProductImage(product_id=product.id, storage_key=key, status=ImageStatus.processing)
+            db.session.add(image)
+            uploads.append((file.filename, image, None))
+
+        results = [{"filename": name, "outcome": "rejected", "error": error} for name, image, error in uploads if image is None]
+        stored = [image for _, image, _ in uploads if image is not None]
+        if not stored:
+            return api_error("No valid images", 400, results)
+        db.session.flush()
+        if product.main_image_id is None:
+            product.main_image_id = stored[0].id
+        db.session.commit()
+
+        for image in stored:
+            image_pipeline.submit("product", image.id, image.storage_key)
+    finally:
+        image_pipeline.release(len(files))  # submitted images now count as in flight
+    schema = ProductImageResponseSchema()
+    results = [
+        {"filename": name, "outcome": "accepted", "image": schema.dump(image)} if image is not None
+        else {"filename": name, "outcome": "rejected", "error": error}
+        for name, image, error in uploads
+    ]
+    return jsonify({"accepted": len(stored), "results": results}), 202
+
+
 @product_bp.delete("/<int:product_id>")
 @jwt_required()
 def delete_product(product_id):
@@ -0,0 +1,125 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from marshmallow import ValidationError
+
+from ..extensions import db
+from ..utils.api import api_error, get_current_user, require_admin
+from ..utils.promotions import bump_catalog_version, promotion_engine
+from ..models.promotion import Promotion, PromotionTarget, PromotionKind, PromotionScope
+from ..schemas.promotion_schema import PromotionResponseSchema, PromotionWriteSchema
+
+promotion_bp = Blueprint("promotions", __name__)
+
+RULE_FIELDS = (
+    "name", "percent", "amount_off", "buy_qty", "get_qty", "min_subtotal",
+    "max_discount", "priority", "is_active", "starts_at", "ends_at",
+)
+
+
+def _apply(promotion, validated):
+    for name in RULE_FIELDS:
+        if name in validated:
+            setattr(promotion, name, validated[name])
+    if "kind" in validated:
+        promotion.kind = PromotionKind(validated["kind"])
+    if "scope" in validated:
+        promotion.scope = PromotionScope(validated["scope"])
+    if "product_ids" in validated or "category_ids" in validated:
+        product_ids = validated.get("product_ids", [t.product_id for t in promotion.targets if t.product_id])
+        category_ids = validated.get("category_ids", [t.category_id for t in promotion.targets if t.category_id])
+        promotion.targets = (
+            [PromotionTarget(product_id=pid) for pid in set(product_ids)]
+            + [PromotionTarget(category_id=cid) for cid in set(category_ids)]
+        )
+
+
+@promotion_bp.get("/")
+@jwt_required()
+def list_promotions():
+    """Admin, ?active=true for currently enabled promotions only."""
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    q = Promotion.query
+    if request.args.get("active") == "true":
+        q = q.filter(Promotion.is_active.is_(True))
+    promotions = q.order_by(Promotion.id.desc()).all()
+    return jsonify(PromotionResponseSchema(many=True).dump(promotions)), 200
+
+
+@promotion_bp.post("/")
+@jwt_required()
+def create_promotion():
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validated = PromotionWriteSchema().load(data)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    promotion = Promotion(version=1)
+    _apply(promotion, validated)
+    db.session.add(promotion)
+    bump_catalog_version()
+    db.session.commit()
+    promotion_engine.invalidate()
+    return jsonify(PromotionResponseSchema().dump(promotion)), 201
+
+
+@promotion_bp.put("/<int:promotion_id>")
+@jwt_required()
+def update_promotion(promotion_id):
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    promotion = db.session.get(Promotion, promotion_id)
+    if not promotion:
+        return api_error("Promotion not found", 404)
+
+    data = request.get_json(silent=True) or {}
+    try:
+        validated = PromotionWriteSchema(context={"promotion": promotion}).load(data, partial=True)
+    except ValidationError as ve:
+        return api_error("Validation error", 400, ve.messages)
+
+    _apply(promotion, validated)
+    promotion.version += 1
+    bump_catalog_version()
+    db.session.commit()
+    promotion_engine.invalidate()
+    return jsonify(PromotionResponseSchema().dump(promotion)), 200
+
+
+@promotion_bp.delete("/<int:promotion_id>")
+@jwt_required()
+def delete_promotion(promotion_id):
+    user, err = get_current_user()
+    if err:
+        return err
+    err = require_admin(user)
+    if err:
+        return err
+
+    promotion = db.session.get(Promotion, promotion_id)
+    if not promotion:
+        return api_error("Promotion not found", 404)
+
+    db.session.delete(promotion)
+    bump_catalog_version()
+    db.session.commit()
+    promotion_engine.invalidate()
+    return jsonify({"message": "Promotion deleted"}), 200
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..extensions import db
 from ..models.user import User, UserRole
+from ..utils.api import get_current_user
+from ..utils.principal_cache import principal_cache
 from ..schemas.user_schema import (
     UserResponseSchema,
     AdminUserCreateSchema,
@@ -19,11 +21,8 @@ def _serialize(user):
     return UserResponseSchema().dump(user)
 
 def _get_current_user():
-    user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    if not user:
-        return None,_bad_request("User not found", 404)
-    return user,None
+    # principal (id / role) from the cache; load the User row only where it is changed
+    return get_current_user()
 
 def _admin_required(user):
     if user.role != UserRole.ADMIN:
@@ -45,9 +44,10 @@ def get_me():
 @user_bp.put("/me")
 @jwt_required()
 def update_me():
-    user, error = _get_current_user()
+    current_user, error = _get_current_user()
     if error:
         return error
+    user = User.query.get(current_user.id)
     data = request.get_json(silent=True) or {}
     schema = UserUpdateSchema()
     try:
@@ -66,11 +66,12 @@ def update_me():
 @user_bp.delete("/me")
 @jwt_required()
 def delete_me():
-    user, error =_get_current_user()
+    current_user, error =_get_current_user()
     if error:
         return error
-    db.session.delete(user)
+    db.session.delete(User.query.get(current_user.id))
     db.session.commit()
+    principal_cache.invalidate(current_user.id)
     return jsonify({"message": "User account deleted"}), 200
 
 #--- Admin & Delivery routes ---
@@ -158,11 +159,15 @@ def update_user(user_id):
     for key, value in validated.items():
         if key == "password":
             user.set_password(value)
+            user.bump_token_version()  # reset: sign out existing sessions
         elif key == "role":
+            if user.role != UserRole(value):
+                user.bump_token_version()  # tokens carry the old role
             user.role = UserRole(value)
         else:
             setattr(user, key, value)
     db.session.commit()
+    principal_cache.invalidate(user.id)
     return jsonify(_serialize(user)), 200
 
 # Admin: Delete user
@@ -180,4 +185,5 @@ def delete_user(user_id):
         return _bad_request("User not found", 404)
     db.session.delete(user)
     db.session.commit()
+    principal_cache.invalidate(user_id)
     return jsonify({"message": "User deleted"}), 200
\ No newline at end of file
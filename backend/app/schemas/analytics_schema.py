@@ -0,0 +1,27 @@
+from marshmallow import fields, validate, validates_schema, ValidationError
+from .base import BaseSchema
+
+SALES_METRICS = ["units", "gross_amount", "captured_amount", "refunded_amount"]
+
+# SALES ANALYTICS QUERY (?from=YYYY-MM-DD&to=YYYY-MM-DD, to is exclusive)
+class SalesQuerySchema(BaseSchema):
+    date_from = fields.Date(required=True, data_key="from")
+    date_to = fields.Date(required=True, data_key="to")
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=500))
+    order_by = fields.Str(load_default="gross_amount", validate=validate.OneOf(SALES_METRICS))
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if data["date_to"] <= data["date_from"]:
+            raise ValidationError("'to' must be after 'from'")
+        if (data["date_to"] - data["date_from"]).days > 3660:
+            raise ValidationError("Date range is limited to 10 years")
+# SALES ROW RESPONSE (per day / product / category)
+class SalesRowSchema(BaseSchema):
+    day = fields.Date(dump_only=True)
+    product_id = fields.Int(dump_only=True)
+    category_id = fields.Int(dump_only=True)
+    name = fields.Str(dump_only=True)
+    units = fields.Int(dump_only=True)
+    gross_amount = fields.Int(dump_only=True)
+    captured_amount = fields.Int(dump_only=True)
+    refunded_amount = fields.Int(dump_only=True)
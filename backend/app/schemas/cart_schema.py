@@ -19,8 +19,57 @@ class CartResponseSchema(BaseSchema):
     status = fields.Str(dump_only=True)
     items = fields.List(fields.Nested(CartItemResponseSchema),dump_only=True,)
     subtotal_amount = fields.Method("get_subtotal_amount",dump_only=True,)
+    # context["pricing"]: PromotionResult for this cart (see utils/promotions.py)
+    discount_amount = fields.Method("get_discount_amount",dump_only=True,)
+    total_amount = fields.Method("get_total_amount",dump_only=True,)
+    promotions = fields.Method("get_promotions",dump_only=True,)
     def get_subtotal_amount(self, obj):
         return sum(item.unit_amount * item.quantity for item in obj.items)
+    def get_discount_amount(self, obj):
+        pricing = self.context.get("pricing")
+        return pricing.discount_amount if pricing else 0
+    def get_total_amount(self, obj):
+        return self.get_subtotal_amount(obj) - self.get_discount_amount(obj)
+    def get_promotions(self, obj):
+        pricing = self.context.get("pricing")
+        return pricing.applied() if pricing else []
+# compact product summary embedded per cart line (read only)
+class CartProductSummarySchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    name = fields.Str(dump_only=True)
+    main_image_key = fields.Str(dump_only=True, allow_none=True)
+    price_amount = fields.Int(dump_only=True)
+    quantity = fields.Int(dump_only=True)
+    is_active = fields.Bool(dump_only=True)
+# cart item schema with product summary (?expand=product)
+class CartItemExpandedResponseSchema(CartItemResponseSchema):
+    """
+    Expects context["products"]: {product_id: summary row}
+    loaded in one query by the route.
+    """
+    product = fields.Method("get_product", dump_only=True, allow_none=True)
+    price_changed = fields.Method("get_price_changed", dump_only=True)
+    def get_product(self, obj):
+        summary = self.context.get("products", {}).get(obj.product_id)
+        if summary is None:
+            return None
+        return CartProductSummarySchema().dump(summary)
+    def get_price_changed(self, obj):
+        summary = self.context.get("products", {}).get(obj.product_id)
+        if summary is None:
+            return False
+        return summary.price_amount != obj.unit_amount
+# cart response schema with product summaries (?expand=product)
+class CartExpandedResponseSchema(CartResponseSchema):
+    items = fields.List(fields.Nested(CartItemExpandedResponseSchema),dump_only=True,)
+    needs_reprice = fields.Method("get_needs_reprice", dump_only=True)
+    def get_needs_reprice(self, obj):
+        products = self.context.get("products", {})
+        return any(
+            item.product_id in products
+            and products[item.product_id].price_amount != item.unit_amount
+            for item in obj.items
+        )
 # add item to cart schema 
 class CartItemAddSchema(BaseSchema):
     product_id = fields.Int(required=True)
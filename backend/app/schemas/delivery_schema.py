@@ -1,5 +1,8 @@
+from datetime import datetime, timedelta, timezone
+
 from marshmallow import (
     fields,
+    post_load,
     validate,
     validates_schema,
     ValidationError,
@@ -10,11 +13,78 @@ from ..models.user import User
 
 # DELIVERY ASSIGNMENT RESPONSE SCHEMA
 class DeliveryResponseSchema(BaseSchema):
-    order_id = fields.Int(dump_only=True)
+    order_id = fields.Int(attribute="id", dump_only=True)
     delivery_user_id = fields.Int(dump_only=True, allow_none=True)
     delivery_status = fields.Function(lambda obj: obj.delivery_status.value)
     assigned_at = fields.DateTime(dump_only=True, allow_none=True)
     updated_at = fields.DateTime(dump_only=True)
+# COURIER QUEUE ORDER (what a courier needs: no payments / prices)
+class DeliveryQueueItemSchema(BaseSchema):
+    product_id = fields.Int(dump_only=True)
+    quantity = fields.Int(dump_only=True)
+class DeliveryQueueOrderSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    delivery_status = fields.Function(lambda obj: obj.delivery_status.value)
+    address = fields.Str(dump_only=True)
+    phone_number = fields.Str(dump_only=True)
+    assigned_at = fields.DateTime(dump_only=True, allow_none=True)
+    items = fields.List(fields.Nested(DeliveryQueueItemSchema),dump_only=True,)
+# ROUTE BATCH (claimed as a unit, stops in driving order)
+class DeliveryRouteStopSchema(BaseSchema):
+    seq = fields.Int(dump_only=True)
+    order = fields.Nested(DeliveryQueueOrderSchema, dump_only=True)
+class DeliveryRouteSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    status = fields.Function(lambda obj: obj.status.value)
+    delivery_user_id = fields.Int(dump_only=True, allow_none=True)
+    stop_count = fields.Int(dump_only=True)
+    distance_km = fields.Float(dump_only=True)
+    claimed_at = fields.DateTime(dump_only=True, allow_none=True)
+    stops = fields.List(fields.Nested(DeliveryRouteStopSchema), dump_only=True)
+# COURIER LOCATION PINGS (batched by the courier app)
+class LocationPingSchema(BaseSchema):
+    lat = fields.Float(required=True,validate=validate.Range(min=-90, max=90))
+    lon = fields.Float(required=True,validate=validate.Range(min=-180, max=180))
+    accuracy_m = fields.Float(required=False,allow_none=True,validate=validate.Range(min=0))
+    recorded_at = fields.DateTime(required=False)
+    @post_load
+    def normalize_time(self, data, **kwargs):
+        recorded_at = data.get("recorded_at") or datetime.utcnow()
+        if recorded_at.tzinfo is not None:
+            recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if recorded_at > datetime.utcnow() + timedelta(minutes=1):
+            raise ValidationError("recorded_at is in the future", "recorded_at")
+        data["recorded_at"] = recorded_at
+        return data
+class LocationBatchSchema(BaseSchema):
+    pings = fields.List(fields.Nested(LocationPingSchema),required=True,validate=validate.Length(min=1))
+class CourierPositionSchema(BaseSchema):
+    delivery_user_id = fields.Int(dump_only=True)
+    lat = fields.Float(dump_only=True)
+    lon = fields.Float(dump_only=True)
+    accuracy_m = fields.Float(dump_only=True, allow_none=True)
+    recorded_at = fields.DateTime(dump_only=True)
+    stale = fields.Bool(dump_only=True)
+# DELIVERY SLOT (ADMIN capacity change)
+class DeliverySlotResponseSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    starts_at = fields.DateTime(dump_only=True)
+    ends_at = fields.DateTime(dump_only=True)
+    capacity = fields.Int(dump_only=True)
+    booked = fields.Int(dump_only=True)
+class DeliverySlotUpdateSchema(BaseSchema):
+    capacity = fields.Int(required=True,validate=validate.Range(min=0, max=100000))
+# BULK STATUS UPDATE (courier, drop-off cluster)
+class DeliveryBulkStatusItemSchema(BaseSchema):
+    order_id = fields.Int(required=True)
+    delivery_status = fields.Str(required=True,validate=validate.OneOf([DeliveryStatus.on_the_way.value,DeliveryStatus.delivered.value]))
+class DeliveryBulkStatusSchema(BaseSchema):
+    updates = fields.List(fields.Nested(DeliveryBulkStatusItemSchema),required=True,validate=validate.Length(min=1))
+    @validates_schema
+    def validate_unique_orders(self, data, **kwargs):
+        order_ids = [u["order_id"] for u in data["updates"]]
+        if len(order_ids) != len(set(order_ids)):
+            raise ValidationError("Each order may appear only once", "updates")
 # DELIVERY ASSIGNMENT CREATE / UPDATE SCHEMA
 class DeliveryAssignSchema(BaseSchema):
     """
@@ -34,6 +104,8 @@ class DeliveryAssignSchema(BaseSchema):
             DeliveryStatus.canceled,
         }:
             raise ValidationError("Cannot assign delivery for completed or canceled order")
+        if order.delivery_user_id is not None:
+            raise ValidationError("Order is already assigned")
         if not delivery_user.is_delivery():
             raise ValidationError("User is not a delivery personnel")
 # DELIVERY STATUS UPDATE SCHEMA
@@ -0,0 +1,11 @@
+from marshmallow import fields, validates_schema, ValidationError
+from .base import BaseSchema
+
+# CSV EXPORT QUERY (?from=&to=, ISO datetimes, to is exclusive)
+class ExportQuerySchema(BaseSchema):
+    date_from = fields.DateTime(required=True, data_key="from")
+    date_to = fields.DateTime(required=True, data_key="to")
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if data["date_to"] <= data["date_from"]:
+            raise ValidationError("'to' must be after 'from'")
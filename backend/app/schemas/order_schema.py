@@ -1,8 +1,16 @@
-from marshmallow import fields,validate,validates_schema,ValidationError
+from marshmallow import fields,validate,validates,validates_schema,ValidationError
 from .base import BaseSchema
+from ..extensions import db
 from ..models.cart import CartStatus
+from ..models.delivery_slot import DeliverySlot
 from ..models.product import Product
 from ..models.order import OrderPaymentStatus,DeliveryStatus,PaymentProvider,PaymentStatus
+from ..utils.delivery_slots import booking_cutoff
+# courier delivery status transitions (single and bulk updates)
+COURIER_DELIVERY_TRANSITIONS = {
+    DeliveryStatus.assigned: frozenset({DeliveryStatus.on_the_way}),
+    DeliveryStatus.on_the_way: frozenset({DeliveryStatus.delivered}),
+}
 # ORDER ITEM RESPONSE
 class OrderItemResponseSchema(BaseSchema):
     id = fields.Int(dump_only=True)
@@ -35,15 +43,56 @@ class OrderResponseSchema(BaseSchema):
     delivery_status = fields.Function(lambda obj: obj.delivery_status.value)
     address = fields.Str(dump_only=True)
     phone_number = fields.Str(dump_only=True)
+    delivery_user_id = fields.Int(dump_only=True, allow_none=True)
+    assigned_at = fields.DateTime(dump_only=True, allow_none=True)
+    delivery_slot_id = fields.Int(dump_only=True, allow_none=True)
     items = fields.List(fields.Nested(OrderItemResponseSchema),dump_only=True,)
     payments = fields.List(fields.Nested(PaymentResponseSchema),dump_only=True,)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
+# ORDER INTENT CREATE / ASYNC CHECKOUT (USER)
+class OrderIntentCreateSchema(BaseSchema):
+    """
+    Cheap request-time checks only (no product lookups);
+    workers re-validate with OrderCreateSchema.
+    """
+    payment_provider = fields.Str(required=True,validate=validate.OneOf([p.value for p in PaymentProvider]))
+    address = fields.Str(required=True,validate=validate.Length(min=5, max=255))
+    phone_number = fields.Str(required=True,validate=validate.Length(min=7, max=50))
+    delivery_slot_id = fields.Int(required=False,allow_none=True)
+    @validates_schema
+    def validate_cart_not_empty(self, data, **kwargs):
+        cart = self.context.get("cart")
+        if not cart:
+            raise ValidationError("Cart context is required")
+        if not cart.items:
+            raise ValidationError("Cart is empty")
+# ORDER INTENT RESPONSE
+class OrderIntentResponseSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    status = fields.Function(lambda obj: obj.status.value)
+    order_id = fields.Int(dump_only=True, allow_none=True)
+    error = fields.Raw(dump_only=True, allow_none=True)
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
 # ORDER CREATE / CHECKOUT (USER)
 class OrderCreateSchema(BaseSchema):
     payment_provider = fields.Str(required=True,validate=validate.OneOf([p.value for p in PaymentProvider]))
     address = fields.Str(required=True,validate=validate.Length(min=5, max=255))
     phone_number = fields.Str(required=True,validate=validate.Length(min=7, max=50))
+    delivery_slot_id = fields.Int(required=False,allow_none=True)
+    @validates("delivery_slot_id")
+    def validate_delivery_slot(self, value, **kwargs):
+        """Slot must exist and still be open; capacity is checked when booking."""
+        if value is None:
+            return
+        slot = db.session.get(DeliverySlot, value)
+        if not slot:
+            raise ValidationError("Delivery slot not found")
+        if slot.starts_at <= booking_cutoff():
+            raise ValidationError("Delivery slot is closed for booking")
+        if slot.available() <= 0:
+            raise ValidationError("Delivery slot is full")
     @validates_schema
     def validate_cart_and_inventory(self, data, **kwargs):
         """
@@ -78,14 +127,27 @@ class OrderCreateSchema(BaseSchema):
                 errors[item.product_id] = "Insufficient stock"
         if errors:
             raise ValidationError({"cart_items": errors})
+# ORDER LIST QUERY (?cursor=&limit=&filters)
+class OrderListQuerySchema(BaseSchema):
+    cursor = fields.Str()
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=100))
+    payment_status = fields.Str(validate=validate.OneOf([s.value for s in OrderPaymentStatus]))
+    delivery_status = fields.Str(validate=validate.OneOf([s.value for s in DeliveryStatus]))
+    date_from = fields.DateTime(data_key="from")
+    date_to = fields.DateTime(data_key="to")
+    user_id = fields.Int()  # admin only
 # ADMIN ORDER UPDATE
 class AdminOrderUpdateSchema(BaseSchema):
     payment_status = fields.Str(validate=validate.OneOf([s.value for s in OrderPaymentStatus]))
     delivery_status = fields.Str(validate=validate.OneOf([s.value for s in DeliveryStatus]))
+    # courier for delivery_status "assigned" (goes through the courier assignment)
+    delivery_user_id = fields.Int()
     @validates_schema
     def validate_not_empty(self, data, **kwargs):
         if not data:
             raise ValidationError("At least one field must be provided")
+        if "delivery_user_id" in data and data.get("delivery_status") != DeliveryStatus.assigned.value:
+            raise ValidationError("delivery_user_id is only used with delivery_status 'assigned'")
 # DELIVERY ORDER UPDATE (DELIVERY ROLE ONLY)
 class DeliveryOrderUpdateSchema(BaseSchema):
     delivery_status = fields.Str(required=True,validate=validate.OneOf([DeliveryStatus.assigned.value,DeliveryStatus.on_the_way.value,DeliveryStatus.delivered.value,]))
@@ -99,14 +161,10 @@ class DeliveryOrderUpdateSchema(BaseSchema):
         order = self.context.get("order")
         if not order:
             raise ValidationError("Order context is required")
-        current = order.delivery_status.value
-        new = data["delivery_status"]
-        allowed_transitions = {
-            DeliveryStatus.assigned.value: {DeliveryStatus.on_the_way.value},
-            DeliveryStatus.on_the_way.value: {DeliveryStatus.delivered.value},
-        }
-        if current not in allowed_transitions:
+        current = order.delivery_status
+        new = DeliveryStatus(data["delivery_status"])
+        if current not in COURIER_DELIVERY_TRANSITIONS:
             raise ValidationError("Order cannot be updated at this stage")
-        if new not in allowed_transitions[current]:
+        if new not in COURIER_DELIVERY_TRANSITIONS[current]:
             raise ValidationError(
-                f"Invalid delivery status transition: {current} → {new}")
+                f"Invalid delivery status transition: {current.value} → {new.value}")
@@ -2,6 +2,23 @@ from marshmallow import fields,validate,validates_schema,ValidationError
 from .base import BaseSchema
 from ..models.order import PaymentProvider,PaymentStatus,OrderPaymentStatus
 from ..models.order import Order
+from ..models.reconciliation import ReconciliationOutcome
+# valid payment status transitions (terminal statuses have no entry)
+PAYMENT_TRANSITIONS = {
+    PaymentStatus.created: frozenset({
+        PaymentStatus.authorized,
+        PaymentStatus.failed,
+        PaymentStatus.canceled,
+    }),
+    PaymentStatus.authorized: frozenset({
+        PaymentStatus.captured,
+        PaymentStatus.canceled,
+        PaymentStatus.refunded,
+    }),
+    PaymentStatus.captured: frozenset({
+        PaymentStatus.refunded,
+    }),
+}
 # PAYMENT RESPONSE SCHEMA
 class PaymentResponseSchema(BaseSchema):
     id = fields.Int(dump_only=True)
@@ -12,6 +29,16 @@ class PaymentResponseSchema(BaseSchema):
     amount = fields.Int(dump_only=True)
     provider_payment_id = fields.Str(dump_only=True, allow_none=True)
     created_at = fields.DateTime(dump_only=True)
+# PAYMENT LEDGER QUERY (?cursor=&limit=&filters, admin)
+class PaymentListQuerySchema(BaseSchema):
+    cursor = fields.Str()
+    limit = fields.Int(load_default=50, validate=validate.Range(min=1, max=200))
+    status = fields.Str(validate=validate.OneOf([s.value for s in PaymentStatus]))
+    provider = fields.Str(validate=validate.OneOf([p.value for p in PaymentProvider]))
+    currency = fields.Str(validate=validate.Length(equal=3))
+    date_from = fields.DateTime(data_key="from")
+    date_to = fields.DateTime(data_key="to")
+    order_id = fields.Int()
 # PAYMENT CREATE SCHEMA (USER / SYSTEM)
 class PaymentCreateSchema(BaseSchema):
     """
@@ -66,29 +93,22 @@ class PaymentUpdateSchema(BaseSchema):
         payment = self.context.get("payment")
         if not payment:
             raise ValidationError("Payment context is required")
-        current = payment.status.value
-        new = data["status"]
-        allowed_transitions = {
-            PaymentStatus.created.value: {
-                PaymentStatus.authorized.value,
-                PaymentStatus.failed.value,
-                PaymentStatus.canceled.value,
-            },
-            PaymentStatus.authorized.value: {
-                PaymentStatus.captured.value,
-                PaymentStatus.canceled.value,
-                PaymentStatus.refunded.value,
-            },
-            PaymentStatus.captured.value: {
-                PaymentStatus.refunded.value,
-            },
-        }
-        if current not in allowed_transitions:
+        current = payment.status
+        new = PaymentStatus(data["status"])
+        if current not in PAYMENT_TRANSITIONS:
             raise ValidationError("Payment cannot be updated further")
-        if new not in allowed_transitions[current]:
+        if new not in PAYMENT_TRANSITIONS[current]:
             raise ValidationError(
-                f"Invalid payment status transition: {current} → {new}"
+                f"Invalid payment status transition: {current.value} → {new.value}"
             )
+# PAYMENT WEBHOOK BATCH SCHEMA (PSP callbacks, keyed by provider_payment_id)
+class PaymentWebhookEventSchema(BaseSchema):
+    event_id = fields.Str(required=True,validate=validate.Length(min=1, max=128))
+    provider_payment_id = fields.Str(required=True,validate=validate.Length(min=1, max=128))
+    status = fields.Str(required=True,validate=validate.OneOf([s.value for s in PaymentStatus]))
+    amount = fields.Int(required=False)
+class PaymentWebhookBatchSchema(BaseSchema):
+    events = fields.List(fields.Nested(PaymentWebhookEventSchema),required=True,validate=validate.Length(min=1))
 # ADMIN PAYMENT REFUND SCHEMA
 class PaymentRefundSchema(BaseSchema):
     """
@@ -105,3 +125,42 @@ class PaymentRefundSchema(BaseSchema):
             raise ValidationError("Payment context is required")
         if payment.status != PaymentStatus.captured:
             raise ValidationError("Only captured payments can be refunded")
+# SETTLEMENT RECONCILIATION (multipart form: file + provider + from / to)
+class ReconciliationCreateSchema(BaseSchema):
+    provider = fields.Str(required=True,validate=validate.OneOf([p.value for p in PaymentProvider]))
+    date_from = fields.DateTime(required=True, data_key="from")
+    date_to = fields.DateTime(required=True, data_key="to")
+    @validates_schema
+    def validate_range(self, data, **kwargs):
+        if data["date_to"] <= data["date_from"]:
+            raise ValidationError("'to' must be after 'from'")
+class ReconciliationRunResponseSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    provider = fields.Str(dump_only=True)
+    filename = fields.Str(dump_only=True)
+    date_from = fields.DateTime(dump_only=True, data_key="from")
+    date_to = fields.DateTime(dump_only=True, data_key="to")
+    status = fields.Function(lambda obj: obj.status.value)
+    rows_read = fields.Int(dump_only=True)
+    matched = fields.Int(dump_only=True)
+    mismatched = fields.Int(dump_only=True)
+    missing = fields.Int(dump_only=True)
+    orphans = fields.Int(dump_only=True)
+    invalid = fields.Int(dump_only=True)
+    error = fields.Str(dump_only=True, allow_none=True)
+    started_at = fields.DateTime(dump_only=True)
+    finished_at = fields.DateTime(dump_only=True, allow_none=True)
+class ReconciliationItemQuerySchema(BaseSchema):
+    outcome = fields.Str(required=False,validate=validate.OneOf([o.value for o in ReconciliationOutcome]))
+    after = fields.Int(required=False, load_default=0)
+    limit = fields.Int(required=False, load_default=100, validate=validate.Range(min=1, max=500))
+class ReconciliationItemResponseSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    outcome = fields.Function(lambda obj: obj.outcome.value)
+    line_no = fields.Int(dump_only=True, allow_none=True)
+    provider_payment_id = fields.Str(dump_only=True, allow_none=True)
+    payment_id = fields.Int(dump_only=True, allow_none=True)
+    issues = fields.Raw(dump_only=True, allow_none=True)
+    settled_amount = fields.Int(dump_only=True, allow_none=True)
+    settled_currency = fields.Str(dump_only=True, allow_none=True)
+    settled_status = fields.Str(dump_only=True, allow_none=True)
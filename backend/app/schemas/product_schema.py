@@ -8,6 +8,10 @@ from ..models.image import ProductImage
 class ProductImageResponseSchema(BaseSchema):
     id = fields.Int(dump_only=True)
     storage_key = fields.Str(dump_only=True)
+    # processing -> ready (renditions: name -> {key, width, height}) | failed
+    status = fields.Function(lambda obj: obj.status.value if obj.status else None)
+    renditions = fields.Dict(dump_only=True, allow_none=True)
+    error = fields.Str(dump_only=True, allow_none=True)
     created_at = fields.DateTime(dump_only=True)
 # category mini schema
 class CategoryMiniResponseSchema(BaseSchema):
@@ -0,0 +1,84 @@
+from marshmallow import fields, validate, validates_schema, ValidationError
+from .base import BaseSchema
+from ..models.promotion import PromotionKind, PromotionScope
+
+# promotion response schema (ADMIN)
+class PromotionResponseSchema(BaseSchema):
+    id = fields.Int(dump_only=True)
+    name = fields.Str(dump_only=True)
+    kind = fields.Function(lambda obj: obj.kind.value)
+    scope = fields.Function(lambda obj: obj.scope.value)
+    percent = fields.Int(dump_only=True, allow_none=True)
+    amount_off = fields.Int(dump_only=True, allow_none=True)
+    buy_qty = fields.Int(dump_only=True, allow_none=True)
+    get_qty = fields.Int(dump_only=True, allow_none=True)
+    min_subtotal = fields.Int(dump_only=True, allow_none=True)
+    max_discount = fields.Int(dump_only=True, allow_none=True)
+    priority = fields.Int(dump_only=True)
+    is_active = fields.Bool(dump_only=True)
+    starts_at = fields.DateTime(dump_only=True, allow_none=True)
+    ends_at = fields.DateTime(dump_only=True, allow_none=True)
+    version = fields.Int(dump_only=True)
+    product_ids = fields.Function(lambda obj: [t.product_id for t in obj.targets if t.product_id is not None])
+    category_ids = fields.Function(lambda obj: [t.category_id for t in obj.targets if t.category_id is not None])
+    created_at = fields.DateTime(dump_only=True)
+    updated_at = fields.DateTime(dump_only=True)
+# promotion create / update schema (ADMIN only; update loads with partial=True
+# and context["promotion"] so the merged result is validated)
+class PromotionWriteSchema(BaseSchema):
+    name = fields.Str(required=True,validate=validate.Length(min=2, max=150))
+    kind = fields.Str(required=True,validate=validate.OneOf([k.value for k in PromotionKind]))
+    scope = fields.Str(required=True,validate=validate.OneOf([s.value for s in PromotionScope]))
+    percent = fields.Int(allow_none=True,validate=validate.Range(min=1, max=100))
+    amount_off = fields.Int(allow_none=True,validate=validate.Range(min=1))
+    buy_qty = fields.Int(allow_none=True,validate=validate.Range(min=1))
+    get_qty = fields.Int(allow_none=True,validate=validate.Range(min=1))
+    min_subtotal = fields.Int(allow_none=True,validate=validate.Range(min=0))
+    max_discount = fields.Int(allow_none=True,validate=validate.Range(min=1))
+    priority = fields.Int(validate=validate.Range(min=0, max=1000))
+    is_active = fields.Bool()
+    starts_at = fields.DateTime(allow_none=True)
+    ends_at = fields.DateTime(allow_none=True)
+    product_ids = fields.List(fields.Int(), validate=validate.Length(max=1000))
+    category_ids = fields.List(fields.Int(), validate=validate.Length(max=200))
+    @validates_schema
+    def validate_rule(self, data, **kwargs):
+        """
+        HARD RULES:
+        - basket scope only with basket_threshold (and vice versa)
+        - kind-specific fields must be present
+        - product / category scope needs matching targets
+        """
+        current = self.context.get("promotion")
+        def get(name):
+            if name in data:
+                return data[name]
+            if current is None:
+                return None
+            if name == "product_ids":
+                return [t.product_id for t in current.targets if t.product_id is not None]
+            if name == "category_ids":
+                return [t.category_id for t in current.targets if t.category_id is not None]
+            value = getattr(current, name)
+            return value.value if hasattr(value, "value") else value
+        kind, scope = get("kind"), get("scope")
+        if (kind == PromotionKind.basket_threshold.value) != (scope == PromotionScope.basket.value):
+            raise ValidationError("basket_threshold promotions use basket scope (and only they do)")
+        if kind == PromotionKind.percent_off.value and not get("percent"):
+            raise ValidationError({"percent": ["Required for percent_off"]})
+        if kind == PromotionKind.fixed_off.value and not get("amount_off"):
+            raise ValidationError({"amount_off": ["Required for fixed_off"]})
+        if kind == PromotionKind.buy_x_get_y.value and not (get("buy_qty") and get("get_qty")):
+            raise ValidationError({"buy_qty": ["buy_qty and get_qty are required for buy_x_get_y"]})
+        if kind == PromotionKind.basket_threshold.value:
+            if get("min_subtotal") is None:
+                raise ValidationError({"min_subtotal": ["Required for basket_threshold"]})
+            if bool(get("percent")) == bool(get("amount_off")):
+                raise ValidationError("basket_threshold needs exactly one of percent / amount_off")
+        if scope == PromotionScope.product.value and not get("product_ids"):
+            raise ValidationError({"product_ids": ["Required for product scope"]})
+        if scope == PromotionScope.category.value and not get("category_ids"):
+            raise ValidationError({"category_ids": ["Required for category scope"]})
+        starts_at, ends_at = get("starts_at"), get("ends_at")
+        if starts_at and ends_at and ends_at <= starts_at:
+            raise ValidationError("ends_at must be after starts_at")
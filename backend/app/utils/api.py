@@ -1,6 +1,7 @@
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
-from ..models.user import User, UserRole
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from ..models.user import UserRole
+from .principal_cache import principal_cache
 from flask import Blueprint
 
 api_bp = Blueprint("api", __name__)
@@ -15,14 +16,22 @@ def api_error(message: str, code: int = 400, extra=None):
     return jsonify(payload), code
 
 def get_current_user():
+    """
+    The caller as a Principal (id, role, token_version), usually from the
+    principal cache instead of the users table. Tokens whose "ver" claim
+    no longer matches (role change, admin password reset) are rejected.
+    """
     user_id = get_jwt_identity()
     try:
         user_id = int(user_id)
     except (TypeError, ValueError):
         return None, api_error("Invalid token identity", 401)
-    user = User.query.get(user_id)
+    user = principal_cache.get(user_id)
     if not user:
         return None, api_error("User not found", 404)
+    version = get_jwt().get("ver")
+    if version is not None and version != user.token_version:
+        return None, api_error("Token is no longer valid", 401)
     return user, None
 
 def require_admin(user):
@@ -0,0 +1,358 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models.cart import Cart, CartItem, CartStatus
+from ..models.product import Product
+
+log = logging.getLogger(__name__)
+
+
+class SqlCartBackend:
+    """
+    Direct-SQL backend (default)
+    - every write commits a transaction
+    - reads go to carts / cart_items
+    """
+
+    def get_cart(self, user_id: int):
+        return Cart.get_or_create_active(user_id)
+
+    def find_item(self, cart, item_id: int = None, product_id: int = None):
+        q = CartItem.query.filter_by(cart_id=cart.id)
+        if item_id is not None:
+            q = q.filter_by(id=item_id)
+        if product_id is not None:
+            q = q.filter_by(product_id=product_id)
+        return q.first()
+
+    def set_item(self, cart, product, quantity: int):
+        item = self.find_item(cart, product_id=product.id)
+        if item is None:
+            item = CartItem(cart_id=cart.id, product_id=product.id)
+            db.session.add(item)
+        item.quantity = quantity
+        item.unit_amount = product.price_amount  # snapshot price
+        cart.updated_at = datetime.utcnow()  # keeps the cart out of the idle sweep
+        return item
+
+    def remove_item(self, cart, item):
+        db.session.delete(item)
+        cart.updated_at = datetime.utcnow()
+
+    def save(self, cart):
+        db.session.commit()
+
+    def flush(self, user_id: int = None):
+        return 0
+
+    def dirty_user_ids(self) -> set:
+        return set()
+
+    def evict(self, user_id: int):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+# in-memory cart snapshots (dumped by CartResponseSchema like ORM rows)
+class MemoryCartItem:
+    def __init__(self, id, product_id, quantity, unit_amount, created_at=None, updated_at=None):
+        now = datetime.utcnow()
+        self.id = id
+        self.local_id = None  # temporary id handed out before the row existed
+        self.product_id = product_id
+        self.quantity = quantity
+        self.unit_amount = unit_amount
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+
+    def line_total(self) -> int:
+        return self.unit_amount * self.quantity
+
+
+class MemoryCart:
+    def __init__(self, id, user_id, created_at=None, updated_at=None, items=None):
+        now = datetime.utcnow()
+        self.id = id
+        self.user_id = user_id
+        self.status = CartStatus.active
+        self.created_at = created_at or now
+        self.updated_at = updated_at or now
+        self.items = items or []
+        self.version = 0  # bumped on every write, compared after flush
+        self.persisted = False
+
+
+class MemoryCartBackend:
+    """
+    In-memory write-behind backend
+    - reads and writes are served from process memory
+    - dirty carts are persisted to carts / cart_items by a background
+      thread every CART_STORE_FLUSH_INTERVAL seconds, in batches of
+      CART_STORE_FLUSH_BATCH, or sooner once CART_STORE_MAX_DIRTY is hit
+    - cart rows are created on first load, so cart ids come from the DB;
+      new items get a temporary negative id until their row is inserted
+      (the old id keeps working for the client that saw it)
+    - one app process must own the carts (single worker or sticky routing by user)
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.flush_interval = app.config["CART_STORE_FLUSH_INTERVAL"]
+        self.batch_size = app.config["CART_STORE_FLUSH_BATCH"]
+        self.max_dirty = app.config["CART_STORE_MAX_DIRTY"]
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._carts = {}     # user_id -> MemoryCart
+        self._dirty = {}     # user_id -> version when marked dirty
+        self._next_local_id = -1
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cart-write-behind", daemon=True)
+        self._thread.start()
+
+    # --- id allocation ---
+    def _new_item_id(self):
+        # negative: never collides with a row id; replaced at flush
+        item_id = self._next_local_id
+        self._next_local_id -= 1
+        return item_id
+
+    # --- reads ---
+    def _load(self, user_id: int) -> MemoryCart:
+        row = Cart.query.filter_by(user_id=user_id, status=CartStatus.active).first()
+        if row is None:
+            row = Cart.get_or_create_active(user_id)
+            db.session.commit()
+        cart = MemoryCart(
+            id=row.id,
+            user_id=row.user_id,
+            created_at=row.created_at,
+            updated_at=row.updated_at,
+            items=[
+                MemoryCartItem(i.id, i.product_id, i.quantity, i.unit_amount, i.created_at, i.updated_at)
+                for i in row.items
+            ],
+        )
+        cart.persisted = True
+        return cart
+
+    def get_cart(self, user_id: int):
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is None:
+                cart = self._load(user_id)
+                self._carts[user_id] = cart
+            return cart
+
+    def find_item(self, cart, item_id: int = None, product_id: int = None):
+        for item in cart.items:
+            if item_id is not None and item_id not in (item.id, item.local_id):
+                continue
+            if product_id is not None and item.product_id != product_id:
+                continue
+            return item
+        return None
+
+    # --- writes ---
+    def set_item(self, cart, product, quantity: int):
+        with self._lock:
+            item = self.find_item(cart, product_id=product.id)
+            if item is None:
+                item = MemoryCartItem(self._new_item_id(), product.id, quantity, product.price_amount)
+                cart.items.append(item)
+            item.quantity = quantity
+            item.unit_amount = product.price_amount  # snapshot price
+            item.updated_at = datetime.utcnow()
+            return item
+
+    def remove_item(self, cart, item):
+        with self._lock:
+            cart.items = [i for i in cart.items if i.id != item.id]
+
+    def save(self, cart):
+        with self._lock:
+            cart.version += 1
+            cart.updated_at = datetime.utcnow()
+            self._dirty[cart.user_id] = cart.version
+            too_many = len(self._dirty) >= self.max_dirty
+        if too_many:
+            self._wakeup.set()
+
+    def dirty_user_ids(self) -> set:
+        """Users whose cart has writes not yet persisted."""
+        with self._lock:
+            return set(self._dirty)
+
+    def evict(self, user_id: int):
+        with self._lock:
+            self._carts.pop(user_id, None)
+            self._dirty.pop(user_id, None)
+
+    # --- persistence ---
+    def flush(self, user_id: int = None) -> int:
+        """
+        Persist dirty carts. With user_id only that cart is written
+        (checkout path); otherwise every dirty cart, in batches.
+        Returns the number of carts written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if user_id is not None:
+                    user_ids = [user_id] if user_id in self._dirty else []
+                else:
+                    user_ids = list(self._dirty)
+            written = 0
+            for start in range(0, len(user_ids), self.batch_size):
+                written += self._flush_batch(user_ids[start:start + self.batch_size])
+            return written
+
+    def _flush_batch(self, user_ids) -> int:
+        with self._lock:
+            snapshots = []
+            for uid in user_ids:
+                cart = self._carts.get(uid)
+                if cart is None:
+                    continue
+                snapshots.append((
+                    cart,
+                    cart.version,
+                    cart.updated_at,
+                    [(i, i.id, i.product_id, i.quantity, i.unit_amount, i.created_at, i.updated_at) for i in cart.items],
+                ))
+        if not snapshots:
+            return 0
+
+        cart_ids = [cart.id for cart, _, _, _ in snapshots]
+        existing_carts = {c.id: c for c in Cart.query.filter(Cart.id.in_(cart_ids))}
+        rows_by_cart = {}
+        for row in CartItem.query.filter(CartItem.cart_id.in_(cart_ids)):
+            rows_by_cart.setdefault(row.cart_id, {})[row.id] = row
+        product_ids = {line[2] for _, _, _, lines in snapshots for line in lines}
+        live_products = set(db.session.scalars(select(Product.id).where(Product.id.in_(product_ids))))
+        deleted_products = product_ids - live_products
+
+        written, dropped, inserted = [], [], []
+        for cart, version, updated_at, lines in snapshots:
+            row = existing_carts.get(cart.id)
+            if row is None or row.status != CartStatus.active:
+                # swept or checked out by another path: memory is stale
+                dropped.append((cart, "cart is no longer active"))
+                continue
+            lines = [line for line in lines if line[2] in live_products]
+            try:
+                # one savepoint per cart: a bad cart must not hold back the batch
+                with db.session.begin_nested():
+                    inserted.extend(self._write_cart(row, updated_at, lines, rows_by_cart.get(cart.id, {})))
+            except IntegrityError as e:
+                dropped.append((cart, str(e.orig)))
+                continue
+            written.append((cart, version))
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        with self._lock:
+            for item, row_id in inserted:
+                item.local_id, item.id = item.id, row_id
+            for cart, version in written:
+                cart.persisted = True
+                # lines of products deleted since they were added
+                cart.items = [i for i in cart.items if i.product_id not in deleted_products]
+                # still dirty if written to again while we were flushing
+                if self._dirty.get(cart.user_id) == version:
+                    del self._dirty[cart.user_id]
+            for cart, reason in dropped:
+                log.warning("cart %s of user %s dropped from memory: %s", cart.id, cart.user_id, reason)
+                if self._carts.get(cart.user_id) is cart:
+                    del self._carts[cart.user_id]
+                    self._dirty.pop(cart.user_id, None)
+        return len(written)
+
+    def _write_cart(self, row, updated_at, lines, current) -> list:
+        """Bring one cart's rows in line with its snapshot. Returns (memory item, new row id) pairs."""
+        keep = {line[1] for line in lines}
+        # deletes first: a re-added product must not hit uq_cart_product
+        for row_id, item_row in current.items():
+            if row_id not in keep:
+                db.session.delete(item_row)
+        db.session.flush()
+
+        row.updated_at = updated_at
+        inserted = []
+        for item, item_id, product_id, quantity, unit_amount, created_at, item_updated_at in lines:
+            item_row = current.get(item_id)
+            if item_row is None:
+                item_row = CartItem(
+                    cart_id=row.id,
+                    product_id=product_id,
+                    quantity=quantity,
+                    unit_amount=unit_amount,
+                    created_at=created_at,
+                    updated_at=item_updated_at,
+                )
+                db.session.add(item_row)
+                inserted.append((item, item_row))
+            else:
+                item_row.quantity = quantity
+                item_row.unit_amount = unit_amount
+        db.session.flush()
+        return [(item, item_row.id) for item, item_row in inserted]
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                log.exception("cart write-behind flush failed; will retry")
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        with self.app.app_context():
+            self.flush()
+
+
+class CartStore:
+    """
+    Cart storage behind the cart routes and checkout.
+    Backend chosen by CART_STORE_BACKEND: "sql" (default) or "memory".
+    """
+
+    backends = {
+        "sql": lambda app: SqlCartBackend(),
+        "memory": MemoryCartBackend,
+    }
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        name = app.config.get("CART_STORE_BACKEND", "sql")
+        if name not in self.backends:
+            raise ValueError(f"Unknown CART_STORE_BACKEND: {name}")
+        self.backend = self.backends[name](app)
+        app.extensions["cart_store"] = self
+        atexit.register(self.backend.shutdown)
+
+    def __getattr__(self, name):
+        backend = self.__dict__.get("backend")
+        if backend is None:
+            raise RuntimeError("CartStore is not initialized; call init_app(app)")
+        return getattr(backend, name)
+
+
+cart_store = CartStore()
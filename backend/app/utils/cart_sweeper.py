@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.orm import aliased
+
+from ..extensions import db
+from ..models.cart import Cart, CartItem, CartStatus, CartHistory, CartItemHistory
+from .cart_store import cart_store
+
+CLOSED_STATUSES = (CartStatus.converted, CartStatus.abandoned)
+
+
+def archive_carts(cart_ids) -> int:
+    """
+    Copy carts + their items into the history tables and delete them
+    from the hot tables. Does NOT commit (caller owns the transaction).
+    """
+    cart_ids = list(cart_ids)
+    if not cart_ids:
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(insert(CartHistory).from_select(
+        ["id", "user_id", "status", "created_at", "updated_at", "archived_at"],
+        select(Cart.id, Cart.user_id, Cart.status, Cart.created_at, Cart.updated_at, db.literal(now))
+        .where(Cart.id.in_(cart_ids)),
+    ))
+    db.session.execute(insert(CartItemHistory).from_select(
+        ["id", "cart_id", "product_id", "quantity", "unit_amount", "created_at", "updated_at"],
+        select(
+            CartItem.id, CartItem.cart_id, CartItem.product_id, CartItem.quantity,
+            CartItem.unit_amount, CartItem.created_at, CartItem.updated_at,
+        ).where(CartItem.cart_id.in_(cart_ids)),
+    ))
+    db.session.execute(delete(CartItem).where(CartItem.cart_id.in_(cart_ids)))
+    db.session.execute(delete(Cart).where(Cart.id.in_(cart_ids)))
+    return len(cart_ids)
+
+
+def archive_closed_batch(batch_size: int) -> int:
+    """Move one batch of converted / abandoned carts to history (oldest first)."""
+    cart_ids = db.session.scalars(
+        select(Cart.id)
+        .where(Cart.status.in_(CLOSED_STATUSES))
+        .order_by(Cart.updated_at)
+        .limit(batch_size)
+    ).all()
+    archived = archive_carts(cart_ids)
+    db.session.commit()
+    return archived
+
+
+def abandon_idle_batch(idle_before: datetime, batch_size: int) -> int:
+    """
+    Mark one batch of idle active carts abandoned.
+    Users that still hold an (unarchived) abandoned cart are skipped
+    so uq_user_cart_status can't collide; the next sweep picks them up.
+    Carts with unflushed in-memory writes are skipped too: their DB
+    updated_at lags the cart the user is actually using.
+    """
+    # persist write-behind carts first so updated_at below is current
+    cart_store.flush()
+    busy = cart_store.dirty_user_ids()
+    other = aliased(Cart)
+    query = (
+        select(Cart.id)
+        .where(
+            Cart.status == CartStatus.active,
+            Cart.updated_at < idle_before,
+            ~exists().where(
+                other.user_id == Cart.user_id,
+                other.status == CartStatus.abandoned,
+            ),
+        )
+        .order_by(Cart.updated_at)
+        .limit(batch_size)
+    )
+    if busy:
+        query = query.where(Cart.user_id.notin_(busy))
+    cart_ids = db.session.scalars(query).all()
+    if not cart_ids:
+        return 0
+    db.session.execute(
+        update(Cart)
+        .where(
+            Cart.id.in_(cart_ids),
+            # re-check: the cart may have been touched since we selected it
+            Cart.status == CartStatus.active,
+            Cart.updated_at < idle_before,
+        )
+        .values(status=CartStatus.abandoned, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    # the selected carts were all active, so the abandoned ones are exactly
+    # those this UPDATE changed (no RETURNING on MySQL)
+    abandoned = db.session.execute(
+        select(Cart.id, Cart.user_id).where(Cart.id.in_(cart_ids), Cart.status == CartStatus.abandoned)
+    ).all()
+    db.session.commit()
+    for r in abandoned:
+        cart_store.evict(r.user_id)
+    # carts touched since the SELECT were skipped; a short batch ends this pass, the next one retries
+    return len(abandoned)
+
+
+def sweep_carts(max_batches: int = None) -> dict:
+    """
+    One sweeper pass:
+    1. archive converted / abandoned carts
+    2. mark carts idle for CART_ABANDON_AFTER_HOURS as abandoned
+    Each step runs in batches of CART_SWEEP_BATCH, at most max_batches each.
+    """
+    cfg = current_app.config
+    batch_size = cfg["CART_SWEEP_BATCH"]
+    max_batches = max_batches or cfg["CART_SWEEP_MAX_BATCHES"]
+    idle_before = datetime.utcnow() - timedelta(hours=cfg["CART_ABANDON_AFTER_HOURS"])
+
+    archived = 0
+    for _ in range(max_batches):
+        n = archive_closed_batch(batch_size)
+        archived += n
+        if n < batch_size:
+            break
+
+    abandoned = 0
+    for _ in range(max_batches):
+        n = abandon_idle_batch(idle_before, batch_size)
+        abandoned += n
+        if n < batch_size:
+            break
+
+    return {"archived": archived, "abandoned": abandoned}
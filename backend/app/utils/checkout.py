@@ -0,0 +1,87 @@
+from ..extensions import db
+from ..models.cart import Cart, CartStatus
+from ..models.product import Product
+from ..models.order import (
+    Order, OrderItem,
+    OrderPaymentStatus, DeliveryStatus,
+    Payment, PaymentProvider, PaymentStatus,
+)
+from .cart_sweeper import archive_carts
+from .delivery_slots import reserve_slot
+from .outbox import order_event, payment_event
+from .promotions import promotion_engine
+from .sales_rollup import record_checkout
+
+
+def place_order(user_id: int, cart: Cart, validated: dict) -> Order:
+    """
+    Turn a validated (OrderCreateSchema) active cart into an order:
+    - copy items (snapshot prices)
+    - decrease stock
+    - create a payment attempt
+    - close the cart
+    - book the delivery slot (raises SlotUnavailable when it filled up)
+    Shared by sync checkout and the async checkout workers.
+    Does NOT commit (caller owns the transaction).
+    """
+    order = Order(
+        user_id=user_id,
+        currency="ILS",
+        address=validated["address"],
+        phone_number=validated["phone_number"],
+        delivery_slot_id=validated.get("delivery_slot_id"),
+        payment_status=OrderPaymentStatus.pending,
+        delivery_status=DeliveryStatus.pending,
+    )
+
+    # copy items from cart (snapshot prices)
+    for ci in cart.items:
+        order.items.append(OrderItem(
+            product_id=ci.product_id,
+            unit_amount=ci.unit_amount,
+            quantity=ci.quantity,
+        ))
+
+    order.discount_amount = promotion_engine.price_cart(cart).discount_amount
+    order.recalc_totals()
+
+    # decrease stock (one locking query for all lines)
+    products = {
+        p.id: p
+        for p in Product.query
+        .filter(Product.id.in_([ci.product_id for ci in cart.items]))
+        .order_by(Product.id)
+        .with_for_update()
+    }
+    for ci in cart.items:
+        products[ci.product_id].quantity -= ci.quantity
+
+    # create a payment attempt (created)
+    payment = Payment(
+        order=order,
+        provider=PaymentProvider(validated["payment_provider"]),
+        status=PaymentStatus.created,
+        currency=order.currency,
+        amount=order.total_amount,
+    )
+    order.payments.append(payment)
+
+    # close cart (a previous converted cart would hit uq_user_cart_status)
+    archive_carts(db.session.scalars(
+        db.select(Cart.id).filter_by(user_id=user_id, status=CartStatus.converted)
+    ).all())
+    cart.status = CartStatus.converted
+
+    db.session.add(order)
+    db.session.flush()
+    record_checkout(order)
+    order_event(order, "order.placed", items=[
+        {"product_id": i.product_id, "unit_amount": i.unit_amount, "quantity": i.quantity}
+        for i in order.items
+    ])
+    payment_event(payment, "payment.created")
+
+    # last statement: the slot row stays locked only until the caller commits
+    if order.delivery_slot_id:
+        reserve_slot(order.delivery_slot_id)
+    return order
@@ -0,0 +1,255 @@
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from marshmallow import ValidationError
+from sqlalchemy import update
+
+from ..extensions import db
+from ..models.cart import Cart, CartStatus
+from ..models.order_intent import OrderIntent, OrderIntentStatus
+from ..schemas.order_schema import OrderCreateSchema
+from .cart_store import cart_store
+from .checkout import place_order
+from .delivery_slots import SlotUnavailable, slot_availability
+from .payment_gateway import payment_gateway
+
+log = logging.getLogger(__name__)
+
+CHECKOUT_FIELDS = ("address", "phone_number", "payment_provider", "delivery_slot_id")
+
+
+class CheckoutQueue:
+    """
+    Async checkout pipeline
+    - POST /checkout enqueues an OrderIntent row (durable queue)
+    - a dispatcher thread claims queued intents in id order and hands
+      them to CHECKOUT_WORKERS worker threads
+    - intents sharing a product never run concurrently and never overtake
+      each other, so stock is consumed in arrival order per product
+    - CHECKOUT_WORKERS = 0 only enqueues (run `flask checkout-workers`
+      in a dedicated process instead)
+    - every claim bumps intent.attempt; a worker completes or fails only
+      the attempt it claimed, so a lease that ran out while it was still
+      working cannot produce a second order or undo a completed one
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._in_flight = set()   # product ids currently being checked out
+        self._running = 0
+        self._claimed = set()     # intent ids this process is working on
+        self._waiters = {}        # intent_id -> threading.Event
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._executor = None
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["checkout_queue"] = self
+        if app.config["CHECKOUT_WORKERS"] > 0:
+            self.start()
+
+    # --- producer side ---
+    def enqueue(self, user_id: int, cart, validated: dict) -> OrderIntent:
+        payload = {k: validated[k] for k in CHECKOUT_FIELDS if k in validated}
+        payload["product_ids"] = sorted({item.product_id for item in cart.items})
+        intent = OrderIntent(
+            user_id=user_id,
+            cart_id=cart.id,
+            status=OrderIntentStatus.queued,
+            payload=payload,
+        )
+        db.session.add(intent)
+        db.session.commit()
+        self._wakeup.set()
+        return intent
+
+    def wait(self, intent_id: int, timeout: float) -> OrderIntent | None:
+        """
+        Block up to timeout seconds for an intent to finish (long poll)
+        - a worker in this process wakes us through the event
+        - an intent owned by another process (CHECKOUT_WORKERS = 0 here)
+          is re-read every CHECKOUT_WAIT_POLL seconds
+        """
+        poll = self.app.config["CHECKOUT_WAIT_POLL"]
+        deadline = time.monotonic() + timeout
+        event = self._waiters.setdefault(intent_id, threading.Event())
+        try:
+            while True:
+                # end the transaction first: under REPEATABLE READ a re-read
+                # inside it would keep returning the pre-wait snapshot
+                db.session.rollback()
+                intent = db.session.get(OrderIntent, intent_id)
+                remaining = deadline - time.monotonic()
+                if intent is None or intent.is_final() or remaining <= 0:
+                    return intent
+                event.wait(min(poll, remaining))
+        finally:
+            self._waiters.pop(intent_id, None)
+
+    # --- consumer side ---
+    def start(self):
+        if self._thread is not None:
+            return
+        workers = self.app.config["CHECKOUT_WORKERS"]
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="checkout-worker")
+        self._thread = threading.Thread(target=self._dispatch_loop, name="checkout-dispatcher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def run_forever(self):
+        self.start()
+        self._thread.join()
+
+    def _dispatch_loop(self):
+        poll = self.app.config["CHECKOUT_POLL_INTERVAL"]
+        while not self._stopped.is_set():
+            try:
+                with self.app.app_context():
+                    self._requeue_stale()
+                    self._dispatch()
+            except Exception:
+                log.exception("checkout dispatcher failed; retrying")
+            self._wakeup.wait(poll)
+            self._wakeup.clear()
+
+    def _requeue_stale(self):
+        """Intents left in processing by a crashed worker go back to the queue."""
+        lease = timedelta(seconds=self.app.config["CHECKOUT_INTENT_LEASE"])
+        with self._lock:
+            own = set(self._claimed)  # alive here, however slow
+        db.session.execute(
+            update(OrderIntent)
+            .where(
+                OrderIntent.status == OrderIntentStatus.processing,
+                OrderIntent.claimed_at < datetime.utcnow() - lease,
+                OrderIntent.id.notin_(own),
+            )
+            .values(status=OrderIntentStatus.queued, claimed_at=None)
+        )
+        db.session.commit()
+
+    def _dispatch(self):
+        workers = self.app.config["CHECKOUT_WORKERS"]
+        rows = db.session.execute(
+            db.select(OrderIntent.id, OrderIntent.payload, OrderIntent.attempt)
+            .where(OrderIntent.status == OrderIntentStatus.queued)
+            .order_by(OrderIntent.id)
+            .limit(self.app.config["CHECKOUT_DISPATCH_BATCH"])
+        ).all()
+        with self._lock:
+            blocked = set(self._in_flight)
+        for row in rows:
+            with self._lock:
+                if self._running >= workers:
+                    return
+            product_ids = set(row.payload.get("product_ids", []))
+            if product_ids & blocked:
+                # an earlier intent holds one of these products; keep FIFO
+                blocked |= product_ids
+                continue
+            claimed = db.session.execute(
+                update(OrderIntent)
+                .where(
+                    OrderIntent.id == row.id,
+                    OrderIntent.status == OrderIntentStatus.queued,
+                    OrderIntent.attempt == row.attempt,
+                )
+                .values(status=OrderIntentStatus.processing, claimed_at=datetime.utcnow(), attempt=row.attempt + 1)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                continue  # taken by another process
+            blocked |= product_ids
+            with self._lock:
+                self._in_flight |= product_ids
+                self._running += 1
+                self._claimed.add(row.id)
+            self._executor.submit(self._work, row.id, row.attempt + 1, product_ids)
+
+    def _work(self, intent_id: int, attempt: int, product_ids: set):
+        try:
+            with self.app.app_context():
+                self.process(intent_id, attempt)
+        except Exception:
+            log.exception("checkout intent %s crashed", intent_id)
+        finally:
+            with self._lock:
+                self._in_flight -= product_ids
+                self._running -= 1
+                self._claimed.discard(intent_id)
+            event = self._waiters.get(intent_id)
+            if event is not None:
+                event.set()
+            self._wakeup.set()
+
+    def process(self, intent_id: int, attempt: int):
+        intent = db.session.get(OrderIntent, intent_id)
+        if intent is None or intent.status != OrderIntentStatus.processing or intent.attempt != attempt:
+            return  # finished, or reclaimed by another worker
+
+        cart_store.flush(intent.user_id)
+        cart = db.session.get(Cart, intent.cart_id)
+        if cart is None or cart.user_id != intent.user_id or cart.status != CartStatus.active:
+            return self._fail(intent_id, attempt, "Cart is not active")
+
+        schema = OrderCreateSchema()
+        schema.context = {"cart": cart}
+        try:
+            validated = schema.load({k: intent.payload[k] for k in CHECKOUT_FIELDS if k in intent.payload})
+        except ValidationError as ve:
+            return self._fail(intent_id, attempt, ve.messages)
+
+        try:
+            order = place_order(intent.user_id, cart, validated)
+            db.session.flush()
+            owned = self._finish(intent_id, attempt, status=OrderIntentStatus.completed, order_id=order.id)
+            if not owned:
+                # lease ran out and the intent was claimed again: that attempt owns it
+                db.session.rollback()
+                log.warning("checkout intent %s attempt %s lost its claim; order discarded", intent_id, attempt)
+                return
+            db.session.commit()
+        except SlotUnavailable as su:
+            db.session.rollback()
+            return self._fail(intent_id, attempt, str(su))
+        except Exception:
+            db.session.rollback()
+            log.exception("checkout intent %s failed", intent_id)
+            return self._fail(intent_id, attempt, "Checkout failed")
+        cart_store.evict(intent.user_id)
+        if order.delivery_slot_id:
+            slot_availability.invalidate()
+        for payment in order.payments:
+            payment_gateway.submit_authorize(payment.id)
+
+    def _finish(self, intent_id: int, attempt: int, **values) -> bool:
+        """Set the outcome if this attempt still holds the claim. Does not commit."""
+        return db.session.execute(
+            update(OrderIntent)
+            .where(
+                OrderIntent.id == intent_id,
+                OrderIntent.status == OrderIntentStatus.processing,
+                OrderIntent.attempt == attempt,
+            )
+            .values(**values)
+        ).rowcount == 1
+
+    def _fail(self, intent_id: int, attempt: int, error):
+        self._finish(intent_id, attempt, status=OrderIntentStatus.failed, error=error)
+        db.session.commit()
+
+
+checkout_queue = CheckoutQueue()
@@ -0,0 +1,189 @@
+import atexit
+import logging
+import math
+import threading
+from collections import deque
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+
+from ..extensions import db
+from ..models.courier_location import CourierLocation
+from ..models.user import User
+
+log = logging.getLogger(__name__)
+
+
+class CourierPosition:
+    __slots__ = ("lat", "lon", "accuracy_m", "recorded_at")
+
+    def __init__(self, lat, lon, accuracy_m, recorded_at):
+        self.lat = lat
+        self.lon = lon
+        self.accuracy_m = accuracy_m
+        self.recorded_at = recorded_at
+
+
+def _distance_m(a: CourierPosition, b: CourierPosition) -> float:
+    """Equirectangular approximation; fine for the few hundred metres we compare."""
+    x = math.radians(b.lon - a.lon) * math.cos(math.radians((a.lat + b.lat) / 2))
+    y = math.radians(b.lat - a.lat)
+    return math.hypot(x, y) * 6371000.0
+
+
+class CourierLocationStore:
+    """
+    Live courier positions (per process, like the memory cart store):
+      - latest position per courier, served from memory
+      - ring buffer of recent pings per courier
+      - pings kept for the track are downsampled (every LOCATION_TRACK_SECONDS
+        or LOCATION_TRACK_METERS) and written behind in bulk inserts
+    """
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._latest = {}    # courier_id -> CourierPosition
+        self._recent = {}    # courier_id -> deque[CourierPosition]
+        self._tracked = {}   # courier_id -> last position queued for the track
+        self._pending = []   # rows waiting for the next bulk insert
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        cfg = app.config
+        self.ring_size = cfg["LOCATION_RING_SIZE"]
+        self.track_seconds = cfg["LOCATION_TRACK_SECONDS"]
+        self.track_meters = cfg["LOCATION_TRACK_METERS"]
+        self.flush_interval = cfg["LOCATION_FLUSH_INTERVAL"]
+        self.flush_batch = cfg["LOCATION_FLUSH_BATCH"]
+        self.max_pending = cfg["LOCATION_MAX_PENDING"]
+        app.extensions["courier_locations"] = self
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="courier-location-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def record(self, courier_id: int, pings: list[dict]) -> int:
+        """pings: validated {lat, lon, recorded_at, accuracy_m?}. Returns pings newer than the last one seen."""
+        accepted = 0
+        with self._lock:
+            latest = self._latest.get(courier_id)
+            recent = self._recent.get(courier_id)
+            if recent is None:
+                recent = self._recent[courier_id] = deque(maxlen=self.ring_size)
+            for ping in sorted(pings, key=lambda p: p["recorded_at"]):
+                if latest is not None and ping["recorded_at"] <= latest.recorded_at:
+                    continue  # duplicate or out of order (client retry)
+                latest = CourierPosition(ping["lat"], ping["lon"], ping.get("accuracy_m"), ping["recorded_at"])
+                recent.append(latest)
+                accepted += 1
+                if self._keep_for_track(courier_id, latest):
+                    self._tracked[courier_id] = latest
+                    self._pending.append({
+                        "delivery_user_id": courier_id,
+                        "lat": latest.lat,
+                        "lon": latest.lon,
+                        "accuracy_m": latest.accuracy_m,
+                        "recorded_at": latest.recorded_at,
+                    })
+            if latest is not None:
+                self._latest[courier_id] = latest
+            if len(self._pending) > self.max_pending:
+                # database fell behind: drop the oldest track points, never the live position
+                del self._pending[:len(self._pending) - self.max_pending]
+        return accepted
+
+    def _keep_for_track(self, courier_id: int, position: CourierPosition) -> bool:
+        last = self._tracked.get(courier_id)
+        if last is None:
+            return True
+        if (position.recorded_at - last.recorded_at).total_seconds() >= self.track_seconds:
+            return True
+        return _distance_m(last, position) >= self.track_meters
+
+    def latest(self, courier_id: int) -> CourierPosition | None:
+        with self._lock:
+            return self._latest.get(courier_id)
+
+    def recent(self, courier_id: int) -> list[CourierPosition]:
+        with self._lock:
+            return list(self._recent.get(courier_id, ()))
+
+    def forget(self, courier_id: int):
+        with self._lock:
+            self._latest.pop(courier_id, None)
+            self._recent.pop(courier_id, None)
+            self._tracked.pop(courier_id, None)
+
+    def flush(self) -> int:
+        """Bulk insert the queued track points. Returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            done = written = 0
+            try:
+                for start in range(0, len(rows), self.flush_batch):
+                    batch = rows[start:start + self.flush_batch]
+                    written += self._insert(batch)
+                    done = start + len(batch)
+            except Exception:
+                db.session.rollback()
+                with self._lock:  # retry next time, ahead of newer points
+                    self._pending[:0] = rows[done:]
+                raise
+            return written
+
+    def _insert(self, batch: list[dict]) -> int:
+        now = datetime.utcnow()
+        batch = [{**r, "created_at": now} for r in batch]
+        try:
+            db.session.execute(insert(CourierLocation), batch)
+            db.session.commit()
+            return len(batch)
+        except (IntegrityError, DataError):
+            db.session.rollback()
+
+        # a bad row must not hold back the batch (and every flush after it):
+        # drop points of couriers deleted since, then insert row by row
+        courier_ids = {r["delivery_user_id"] for r in batch}
+        live = set(db.session.scalars(select(User.id).where(User.id.in_(courier_ids))))
+        for courier_id in courier_ids - live:
+            self.forget(courier_id)
+        written = 0
+        for row in batch:
+            if row["delivery_user_id"] not in live:
+                continue
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(CourierLocation).values(**row))
+                written += 1
+            except (IntegrityError, DataError) as e:
+                log.warning("dropping track point of courier %s: %s", row["delivery_user_id"], e.orig)
+        db.session.commit()
+        log.warning("courier location batch: %d of %d rows dropped", len(batch) - written, len(batch))
+        return written
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    self.flush()
+            except Exception:
+                log.exception("courier location flush failed; will retry")
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout=self.flush_interval + 5)
+        with self.app.app_context():
+            self.flush()
+
+
+courier_locations = CourierLocationStore()
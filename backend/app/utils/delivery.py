@@ -0,0 +1,267 @@
+from datetime import datetime
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import noload
+
+from ..extensions import db
+from ..models.delivery_route import DeliveryRoute, DeliveryRouteStatus, DeliveryRouteStop
+from ..models.order import Order, DeliveryStatus
+from ..schemas.order_schema import COURIER_DELIVERY_TRANSITIONS
+from .outbox import order_event
+from .route_planner import locality_table, plan, resolve_locality
+
+# packed orders waiting for a courier, oldest first
+CLAIMABLE_STATUS = DeliveryStatus.processing
+# statuses that sit in a courier's queue
+ACTIVE_STATUSES = (DeliveryStatus.assigned, DeliveryStatus.on_the_way)
+CLAIM_CANDIDATES = 5
+# orders the route planner batches (pending ones are packed while the courier drives)
+PLANNABLE_STATUSES = (DeliveryStatus.pending, DeliveryStatus.processing)
+
+
+def active_count(courier_id: int) -> int:
+    return db.session.scalar(
+        select(func.count()).select_from(Order).where(
+            Order.delivery_user_id == courier_id,
+            Order.delivery_status.in_(ACTIVE_STATUSES),
+        )
+    )
+
+
+def _assign(order_id: int, courier_id: int, from_statuses) -> bool:
+    """Conditional update: only wins if the order is still unassigned and claimable."""
+    now = datetime.utcnow()
+    return db.session.execute(
+        update(Order)
+        .where(
+            Order.id == order_id,
+            Order.delivery_user_id.is_(None),
+            Order.delivery_status.in_(from_statuses),
+        )
+        .values(
+            delivery_user_id=courier_id,
+            assigned_at=now,
+            delivery_status=DeliveryStatus.assigned,
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def claim_next_order(courier_id: int) -> Order | None:
+    """
+    Atomically give the oldest claimable order to this courier.
+    Candidates are read with FOR UPDATE SKIP LOCKED where supported
+    (MySQL 8 / Postgres), so concurrent couriers get different rows
+    without waiting; the conditional update keeps it correct on
+    databases without row locks (SQLite): a lost race just tries the
+    next candidate. Does NOT commit.
+    """
+    candidates = db.session.scalars(
+        select(Order.id)
+        .where(Order.delivery_status == CLAIMABLE_STATUS, Order.delivery_user_id.is_(None))
+        .order_by(Order.created_at, Order.id)
+        .limit(CLAIM_CANDIDATES)
+        .with_for_update(skip_locked=True)
+    ).all()
+    for order_id in candidates:
+        if _assign(order_id, courier_id, (CLAIMABLE_STATUS,)):
+            order = db.session.get(Order, order_id, populate_existing=True)
+            order_event(order, "order.assigned", delivery_user_id=courier_id)
+            return order
+    return None
+
+
+def assign_order(order: Order, courier_id: int) -> bool:
+    """Admin assignment of a pending / processing order. Does NOT commit."""
+    ok = _assign(order.id, courier_id, (DeliveryStatus.pending, DeliveryStatus.processing))
+    if ok:
+        db.session.refresh(order)
+        order_event(order, "order.assigned", delivery_user_id=courier_id)
+    return ok
+
+
+def courier_queue(courier_id: int) -> list[Order]:
+    """
+    The courier's active orders (index on delivery_user_id, status, assigned_at).
+    Orders claimed together as a route share assigned_at and follow the stop order.
+    """
+    stop_seq = (
+        select(func.min(DeliveryRouteStop.seq))
+        .where(DeliveryRouteStop.order_id == Order.id)
+        .scalar_subquery()
+    )
+    return (
+        Order.query
+        .options(noload(Order.payments))
+        .filter(
+            Order.delivery_user_id == courier_id,
+            Order.delivery_status.in_(ACTIVE_STATUSES),
+        )
+        .order_by(Order.assigned_at, stop_seq, Order.id)
+        .all()
+    )
+
+
+def apply_bulk_status(courier_id: int, updates: list[dict]) -> list[dict]:
+    """
+    Courier status changes for many orders in the caller's transaction:
+    - orders are loaded (and locked) with one IN query, without items / payments
+    - each change is checked against COURIER_DELIVERY_TRANSITIONS; asking for
+      the status an order already has is "unchanged" (safe client retry)
+    Returns one outcome per update: updated | unchanged | not_found | forbidden | rejected.
+    Does NOT commit.
+    """
+    orders = {
+        o.id: o
+        for o in db.session.scalars(
+            select(Order)
+            .where(Order.id.in_([u["order_id"] for u in updates]))
+            .options(noload(Order.items), noload(Order.payments))
+            .order_by(Order.id)
+            .with_for_update()
+        )
+    }
+    results = []
+    for u in updates:
+        result = {"order_id": u["order_id"]}
+        results.append(result)
+        order = orders.get(u["order_id"])
+        if order is None:
+            result["outcome"] = "not_found"
+            continue
+        if order.delivery_user_id != courier_id:
+            result["outcome"] = "forbidden"
+            result["error"] = "Order is not assigned to you"
+            continue
+        new_status = DeliveryStatus(u["delivery_status"])
+        if new_status == order.delivery_status:
+            result["outcome"] = "unchanged"
+        elif new_status not in COURIER_DELIVERY_TRANSITIONS.get(order.delivery_status, ()):
+            result["outcome"] = "rejected"
+            result["error"] = f"Invalid delivery status transition: {order.delivery_status.value} → {new_status.value}"
+        else:
+            previous_status = order.delivery_status
+            order.delivery_status = new_status
+            order_event(order, "order.delivery_status_changed", previous_delivery_status=previous_status)
+            result["outcome"] = "updated"
+        result["delivery_status"] = order.delivery_status.value
+    return results
+
+
+# --- route batches ---
+def plan_routes() -> dict:
+    """
+    Replace the open (unclaimed) routes with a fresh plan over every
+    unassigned pending / processing order. Claimed routes are left alone.
+    Orders whose address matches no bundled locality are skipped.
+    """
+    cfg = current_app.config
+    open_routes = select(DeliveryRoute.id).where(DeliveryRoute.status == DeliveryRouteStatus.open)
+    db.session.execute(delete(DeliveryRouteStop).where(DeliveryRouteStop.route_id.in_(open_routes)))
+    db.session.execute(delete(DeliveryRoute).where(DeliveryRoute.status == DeliveryRouteStatus.open))
+
+    rows = db.session.execute(
+        select(Order.id, Order.address)
+        .where(Order.delivery_status.in_(PLANNABLE_STATUSES), Order.delivery_user_id.is_(None))
+        .order_by(Order.created_at, Order.id)
+        .limit(cfg["DELIVERY_PLAN_MAX_ORDERS"])
+    ).all()
+
+    _, coords = locality_table()
+    resolved = {}  # many orders share an address
+    order_ids, localities = [], []
+    for order_id, address in rows:
+        if address not in resolved:
+            resolved[address] = resolve_locality(address)
+        if resolved[address] is not None:
+            order_ids.append(order_id)
+            localities.append(resolved[address])
+
+    routes = []
+    if order_ids:
+        depot = (cfg["DELIVERY_DEPOT_LAT"], cfg["DELIVERY_DEPOT_LON"])
+        order_ids = np.array(order_ids, dtype=np.int64)
+        routes = plan(coords[localities], depot, cfg["DELIVERY_ROUTE_CAPACITY"])
+        route_rows = [DeliveryRoute(stop_count=len(stops), distance_km=round(km, 2)) for stops, km in routes]
+        db.session.add_all(route_rows)
+        db.session.flush()
+        db.session.execute(insert(DeliveryRouteStop), [
+            {"route_id": route.id, "order_id": int(order_ids[i]), "seq": seq}
+            for route, (stops, _) in zip(route_rows, routes)
+            for seq, i in enumerate(stops)
+        ])
+    db.session.commit()
+    return {"routes": len(routes), "orders": len(order_ids), "unresolved": len(rows) - len(order_ids)}
+
+
+def claim_route(courier_id: int, room: int) -> DeliveryRoute | None:
+    """
+    Give the oldest open route with at most `room` stops to this courier
+    and assign its orders in one go. Same locking scheme as
+    claim_next_order; orders taken individually since planning are
+    dropped from the route. Does NOT commit.
+    """
+    candidates = db.session.scalars(
+        select(DeliveryRoute.id)
+        .where(
+            DeliveryRoute.status == DeliveryRouteStatus.open,
+            DeliveryRoute.stop_count <= room,
+        )
+        .order_by(DeliveryRoute.id)
+        .limit(CLAIM_CANDIDATES)
+        .with_for_update(skip_locked=True)
+    ).all()
+    now = datetime.utcnow()
+    for route_id in candidates:
+        won = db.session.execute(
+            update(DeliveryRoute)
+            .where(DeliveryRoute.id == route_id, DeliveryRoute.status == DeliveryRouteStatus.open)
+            .values(status=DeliveryRouteStatus.claimed, delivery_user_id=courier_id, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        if not won:
+            continue
+
+        stop_orders = select(DeliveryRouteStop.order_id).where(DeliveryRouteStop.route_id == route_id)
+        db.session.execute(
+            update(Order)
+            .where(
+                Order.id.in_(stop_orders),
+                Order.delivery_user_id.is_(None),
+                Order.delivery_status.in_(PLANNABLE_STATUSES),
+            )
+            .values(
+                delivery_user_id=courier_id,
+                assigned_at=now,
+                delivery_status=DeliveryStatus.assigned,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # stale stops: assigned elsewhere or canceled since planning
+        db.session.execute(
+            delete(DeliveryRouteStop).where(
+                DeliveryRouteStop.route_id == route_id,
+                DeliveryRouteStop.order_id.not_in(
+                    select(Order.id).where(Order.delivery_user_id == courier_id)
+                ),
+            )
+        )
+        route = db.session.get(DeliveryRoute, route_id, populate_existing=True)
+        if not route.stops:
+            db.session.delete(route)
+            continue
+        route.stop_count = len(route.stops)
+        db.session.scalars(  # reload the orders changed by the bulk update
+            select(Order)
+            .where(Order.id.in_([stop.order_id for stop in route.stops]))
+            .execution_options(populate_existing=True)
+        ).all()
+        for stop in route.stops:
+            order_event(stop.order, "order.assigned", delivery_user_id=courier_id, route_id=route_id)
+        return route
+    return None
+
@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models.delivery_slot import DeliverySlot
+
+
+class SlotUnavailable(Exception):
+    """The slot filled up (or closed) between validation and booking."""
+
+
+def booking_cutoff() -> datetime:
+    return datetime.utcnow() + timedelta(minutes=current_app.config["DELIVERY_SLOT_CUTOFF_MINUTES"])
+
+
+def _slot_starts(day: date) -> list[datetime]:
+    starts = []
+    for hhmm in current_app.config["DELIVERY_SLOT_STARTS"].split(","):
+        hour, minute = (int(x) for x in hhmm.strip().split(":"))
+        starts.append(datetime.combine(day, datetime.min.time()).replace(hour=hour, minute=minute))
+    return starts
+
+
+def ensure_slots(days: int) -> int:
+    """Create the configured daily slots for today + `days` that are missing. Commits."""
+    cfg = current_app.config
+    today = datetime.utcnow().date()
+    wanted = [start for d in range(days + 1) for start in _slot_starts(today + timedelta(days=d))]
+    existing = set(db.session.scalars(
+        select(DeliverySlot.starts_at).where(DeliverySlot.starts_at.in_(wanted))
+    ))
+    length = timedelta(minutes=cfg["DELIVERY_SLOT_MINUTES"])
+    missing = [
+        DeliverySlot(starts_at=start, ends_at=start + length, capacity=cfg["DELIVERY_SLOT_CAPACITY"])
+        for start in wanted if start not in existing
+    ]
+    if not missing:
+        return 0
+    db.session.add_all(missing)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()  # another process created them first
+        return 0
+    return len(missing)
+
+
+# --- counters: single conditional UPDATEs, no SELECT ... FOR UPDATE ---
+def reserve_slot(slot_id: int):
+    """
+    Take one place in the slot or raise SlotUnavailable. Does NOT commit;
+    run it last in the transaction so the row lock is held only until commit.
+    """
+    ok = db.session.execute(
+        update(DeliverySlot)
+        .where(
+            DeliverySlot.id == slot_id,
+            DeliverySlot.booked < DeliverySlot.capacity,
+            DeliverySlot.starts_at > booking_cutoff(),
+        )
+        .values(booked=DeliverySlot.booked + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not ok:
+        raise SlotUnavailable("Delivery slot is full or closed")
+
+
+def release_slot(slot_id: int):
+    """Give a place back (cancel). Does NOT commit."""
+    db.session.execute(
+        update(DeliverySlot)
+        .where(DeliverySlot.id == slot_id, DeliverySlot.booked > 0)
+        .values(booked=DeliverySlot.booked - 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebook_slot(slot_id: int):
+    """Admin un-cancel: the order gets its place back even if the slot filled since."""
+    db.session.execute(
+        update(DeliverySlot)
+        .where(DeliverySlot.id == slot_id)
+        .values(booked=DeliverySlot.booked + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+# --- availability grid ---
+class SlotAvailability:
+    """
+    Cached availability for the next N days. Call invalidate() after a
+    booking / cancel commits; DELIVERY_SLOT_CACHE_TTL bounds staleness
+    from other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grids = {}  # days -> (built_at monotonic, grid)
+        self._generation = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._grids.clear()
+
+    def grid(self, days: int) -> list[dict]:
+        ttl = current_app.config["DELIVERY_SLOT_CACHE_TTL"]
+        with self._lock:
+            cached = self._grids.get(days)
+            generation = self._generation
+        if cached and time.monotonic() - cached[0] < ttl:
+            return cached[1]
+
+        grid = self._build(days)
+        with self._lock:
+            # a booking committed while we were reading: serve it, don't cache it
+            if generation == self._generation:
+                self._grids[days] = (time.monotonic(), grid)
+        return grid
+
+    def _build(self, days: int) -> list[dict]:
+        ensure_slots(days)
+        today = datetime.utcnow().date()
+        end = datetime.combine(today + timedelta(days=days + 1), datetime.min.time())
+        slots = db.session.scalars(
+            select(DeliverySlot)
+            .where(DeliverySlot.starts_at > booking_cutoff(), DeliverySlot.starts_at < end)
+            .order_by(DeliverySlot.starts_at)
+        ).all()
+        by_day = {}
+        for slot in slots:
+            by_day.setdefault(slot.starts_at.date(), []).append({
+                "id": slot.id,
+                "starts_at": slot.starts_at.isoformat(),
+                "ends_at": slot.ends_at.isoformat(),
+                "capacity": slot.capacity,
+                "available": slot.available(),
+            })
+        return [{"date": day.isoformat(), "slots": day_slots} for day, day_slots in by_day.items()]
+
+
+slot_availability = SlotAvailability()
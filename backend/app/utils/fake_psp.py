@@ -0,0 +1,124 @@
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for PayPal and the card acquirer (tests, load benchmarks).
+# Keep-alive HTTP/1.1, honours Idempotency-Key, optional latency / failures.
+
+ROUTES = [
+    ("POST", re.compile(r"^/v1/payment_intents$"), "card_create"),
+    ("POST", re.compile(r"^/v1/payment_intents/(?P<id>[\w-]+)/capture$"), "card_capture"),
+    ("POST", re.compile(r"^/v2/checkout/orders$"), "paypal_create"),
+    ("POST", re.compile(r"^/v2/checkout/orders/(?P<id>[\w-]+)/authorize$"), "paypal_authorize"),
+    ("POST", re.compile(r"^/v2/checkout/orders/(?P<id>[\w-]+)/capture$"), "paypal_capture"),
+]
+
+
+class FakePSP:
+    def __init__(self, latency_ms: float = 0, failure_rate: float = 0, decline_amount: int | None = None):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.decline_amount = decline_amount  # card intents with this amount are declined
+        self.lock = threading.Lock()
+        self.objects = {}     # id -> dict
+        self.responses = {}   # idempotency key -> (status, body)
+        self.requests = 0
+
+    # --- handlers: (status, body) ---
+    def card_create(self, body, _):
+        declined = body.get("amount") == self.decline_amount
+        obj = {"id": f"pi_{uuid.uuid4().hex[:24]}", "amount": body.get("amount"),
+               "currency": body.get("currency"),
+               "status": "canceled" if declined else "requires_capture"}
+        self.objects[obj["id"]] = obj
+        return 200, obj
+
+    def card_capture(self, _, obj_id):
+        obj = self.objects.get(obj_id)
+        if not obj:
+            return 404, {"error": "No such payment_intent"}
+        if obj["status"] != "requires_capture":
+            return 400, {"error": f"Cannot capture a {obj['status']} intent"}
+        obj["status"] = "succeeded"
+        return 200, obj
+
+    def paypal_create(self, body, _):
+        obj = {"id": uuid.uuid4().hex[:17].upper(), "intent": body.get("intent"), "status": "CREATED"}
+        self.objects[obj["id"]] = obj
+        return 201, obj
+
+    def paypal_authorize(self, _, obj_id):
+        obj = self.objects.get(obj_id)
+        if not obj:
+            return 404, {"error": "RESOURCE_NOT_FOUND"}
+        obj["status"] = "COMPLETED"
+        obj["authorized"] = True
+        return 201, obj
+
+    def paypal_capture(self, _, obj_id):
+        obj = self.objects.get(obj_id)
+        if not obj or not obj.get("authorized"):
+            return 422, {"error": "ORDER_NOT_APPROVED"}
+        obj["status"] = "COMPLETED"
+        return 201, obj
+
+    def handle(self, method: str, path: str, body: dict, idempotency_key: str):
+        with self.lock:
+            self.requests += 1
+            if idempotency_key and idempotency_key in self.responses:
+                return self.responses[idempotency_key]
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return 503, {"error": "Service unavailable"}
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(path)
+            if match and method == route_method:
+                with self.lock:
+                    result = getattr(self, name)(body, match.groupdict().get("id"))
+                    if idempotency_key:
+                        self.responses[idempotency_key] = result
+                return result
+        return 404, {"error": "Not found"}
+
+
+def make_server(host: str, port: int, psp: FakePSP) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so the client pool is exercised
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                body = None
+            if body is None:
+                status, payload = 400, {"error": "Invalid JSON"}
+            else:
+                status, payload = psp.handle("POST", self.path, body, self.headers.get("Idempotency-Key", ""))
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(host: str = "127.0.0.1", port: int = 0, **kwargs):
+    """Start a FakePSP on a daemon thread; returns (server, psp, base_url)."""
+    psp = FakePSP(**kwargs)
+    server = make_server(host, port, psp)
+    threading.Thread(target=server.serve_forever, name="fake-psp", daemon=True).start()
+    return server, psp, f"http://{host}:{server.server_address[1]}"
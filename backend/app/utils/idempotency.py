@@ -0,0 +1,223 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models.idempotency import IdempotencyKey, IdempotencyStatus
+from .api import api_error
+
+# in-process executions, so duplicates can wait without polling the DB
+_running = {}
+_running_lock = threading.Lock()
+
+# recomputed for the replayed body, not stored
+_UNSTORED_HEADERS = {"content-length", "set-cookie"}
+
+
+def _fingerprint() -> str:
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(request.path.encode())
+    h.update(b"?" + request.query_string)
+    h.update(request.get_data())
+    return h.hexdigest()
+
+
+def _replay(row: IdempotencyKey):
+    resp = make_response(row.response_body, row.response_code)
+    del resp.headers["Content-Type"]
+    for name, value in row.response_headers:
+        resp.headers.add(name, value)
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _lease_expired(row: IdempotencyKey) -> bool:
+    return row.status == IdempotencyStatus.in_progress and row.locked_until < datetime.utcnow()
+
+
+def _claim(user_id: int, endpoint: str, key: str, fingerprint: str):
+    """
+    Insert an in_progress row, or take over one whose execution lease ran
+    out (its owner died). Returns (row, None) or (None, existing_row).
+    """
+    ttl = timedelta(hours=current_app.config["IDEMPOTENCY_TTL_HOURS"])
+    lease = timedelta(seconds=current_app.config["IDEMPOTENCY_LEASE_SECONDS"])
+    for _ in range(3):
+        now = datetime.utcnow()
+        row = IdempotencyKey(
+            user_id=user_id,
+            endpoint=endpoint,
+            key=key,
+            fingerprint=fingerprint,
+            status=IdempotencyStatus.in_progress,
+            locked_until=now + lease,
+            expires_at=now + ttl,
+        )
+        db.session.add(row)
+        try:
+            db.session.commit()
+            return row, None
+        except IntegrityError:
+            db.session.rollback()
+        existing = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).first()
+        if existing is None:
+            continue  # released in the meantime
+        if existing.expires_at < now:
+            db.session.delete(existing)
+            db.session.commit()
+            continue
+        if existing.fingerprint == fingerprint and _lease_expired(existing):
+            # only one retry wins the takeover
+            taken = db.session.execute(
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.id == existing.id,
+                    IdempotencyKey.status == IdempotencyStatus.in_progress,
+                    IdempotencyKey.locked_until == existing.locked_until,
+                )
+                .values(locked_until=now + lease, expires_at=now + ttl)
+            ).rowcount
+            db.session.commit()
+            if taken:
+                return db.session.get(IdempotencyKey, existing.id), None
+            continue
+        return None, existing
+    return None, None
+
+
+def _wait_for(row_id: int, timeout: float):
+    """Poll until another process stores its response, dies, or we give up."""
+    deadline = time.monotonic() + timeout
+    while True:
+        # end the transaction first: under REPEATABLE READ a re-read inside
+        # it would keep returning the snapshot taken before the wait
+        db.session.rollback()
+        row = db.session.get(IdempotencyKey, row_id)
+        if row is None or row.status == IdempotencyStatus.completed or _lease_expired(row):
+            return row
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return row
+        time.sleep(min(0.1, remaining))
+
+
+def idempotent(endpoint: str):
+    """
+    Idempotency-Key support for unsafe endpoints (use under @jwt_required).
+    - first request runs and its response is stored for IDEMPOTENCY_TTL_HOURS
+    - a retry with the same key + same request (method, path, query string,
+      body) replays the stored response, status and headers
+    - a retry while the first is still running waits for it; if the first
+      one's process died, a retry takes over once IDEMPOTENCY_LEASE_SECONDS
+      have passed instead of getting 409 until the key expires
+    - same key with a different request => 422
+    5xx responses and exceptions release the key so the client can retry.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (request.headers.get("Idempotency-Key") or "").strip()
+            if not key:
+                return fn(*args, **kwargs)
+            if len(key) > 255:
+                return api_error("Idempotency-Key is too long", 400)
+            try:
+                user_id = int(get_jwt_identity())
+            except (TypeError, ValueError):
+                return api_error("Invalid token identity", 401)
+
+            fingerprint = _fingerprint()
+            run_key = (user_id, endpoint, key)
+            with _running_lock:
+                event = _running.get(run_key)
+                if event is None:
+                    event = _running[run_key] = threading.Event()
+                    owner = True
+                else:
+                    owner = False
+
+            if not owner:
+                # duplicate of a request running in this process
+                event.wait(current_app.config["IDEMPOTENCY_WAIT_TIMEOUT"])
+                db.session.rollback()  # see _wait_for
+                row = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).first()
+                if row is not None and row.fingerprint != fingerprint:
+                    return api_error("Idempotency-Key was used with a different request", 422)
+                if row is not None and row.status == IdempotencyStatus.completed:
+                    return _replay(row)
+                return api_error("A request with this Idempotency-Key is still in progress", 409)
+
+            try:
+                row, existing = _claim(user_id, endpoint, key, fingerprint)
+                if (
+                    existing is not None
+                    and existing.fingerprint == fingerprint
+                    and existing.status == IdempotencyStatus.in_progress
+                ):
+                    # running in another process
+                    existing = _wait_for(existing.id, current_app.config["IDEMPOTENCY_WAIT_TIMEOUT"])
+                    if existing is None or _lease_expired(existing):
+                        # released, or its owner died: try to run it here
+                        row, existing = _claim(user_id, endpoint, key, fingerprint)
+                if row is None:
+                    if existing is None:
+                        return api_error("A request with this Idempotency-Key is still in progress", 409)
+                    if existing.fingerprint != fingerprint:
+                        return api_error("Idempotency-Key was used with a different request", 422)
+                    if existing.status == IdempotencyStatus.completed:
+                        return _replay(existing)
+                    return api_error("A request with this Idempotency-Key is still in progress", 409)
+
+                row_id = row.id
+                try:
+                    resp = make_response(fn(*args, **kwargs))
+                except Exception:
+                    db.session.rollback()
+                    db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id == row_id))
+                    db.session.commit()
+                    raise
+
+                row = db.session.get(IdempotencyKey, row_id)
+                if resp.status_code >= 500:
+                    db.session.delete(row)
+                else:
+                    row.status = IdempotencyStatus.completed
+                    row.response_code = resp.status_code
+                    row.response_body = resp.get_data(as_text=True)
+                    row.response_headers = [
+                        [name, value] for name, value in resp.headers.items()
+                        if name.lower() not in _UNSTORED_HEADERS
+                    ]
+                db.session.commit()
+                return resp
+            finally:
+                with _running_lock:
+                    _running.pop(run_key, None)
+                event.set()
+        return wrapper
+    return decorator
+
+
+def purge_expired_keys():
+    """TTL cleanup, bounded batches (scheduled job)."""
+    batch_size = current_app.config["IDEMPOTENCY_PURGE_BATCH"]
+    purged = 0
+    while True:
+        ids = db.session.scalars(
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at < datetime.utcnow())
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            return purged
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(ids)))
+        db.session.commit()
+        purged += len(ids)
@@ -0,0 +1,213 @@
+import atexit
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+from PIL import Image, ImageOps
+from sqlalchemy import select, update
+
+from ..extensions import db
+from ..models.image import CategoryImage, ImageStatus, ProductImage
+from .api import api_error
+from .process_pool import new_pool
+
+log = logging.getLogger(__name__)
+
+# Image renditions, made off the request:
+# - upload routes store the original after a header-only check and commit
+#   the image row as "processing"
+# - a process pool decodes the original once and writes every rendition
+#   (largest first, each scaled down from the previous one) as WebP
+# - the result is recorded on the row; a newer upload for the same row
+#   (category image replaced) wins over an older job still running
+# - rows left "processing" by a restart are picked up by resume_stalled_images()
+
+MODELS = {"product": ProductImage, "category": CategoryImage}
+
+
+class ImagePipelineBusy(Exception):
+    """Too many images waiting for renditions; answered with 503 + Retry-After."""
+
+
+def parse_renditions(spec: str) -> list[tuple[str, int]]:
+    """"thumb:160,card:480" -> [("thumb", 160), ("card", 480)] (longest edge in px)."""
+    sizes = []
+    for item in spec.split(","):
+        name, px = item.strip().split(":")
+        sizes.append((name.strip(), int(px)))
+    return sizes
+
+
+def rendition_key(storage_key: str, name: str) -> str:
+    """products/3/<uuid>.jpg -> products/3/<uuid>-thumb.webp"""
+    return f"{os.path.splitext(storage_key)[0]}-{name}.webp"
+
+
+# module level so the pool can pickle it
+def render_renditions(upload_root: str, storage_key: str, sizes: list[tuple[str, int]], quality: int) -> dict:
+    largest = max(px for _, px in sizes)
+    with Image.open(os.path.join(upload_root, storage_key)) as img:
+        img.draft("RGB", (largest, largest))  # JPEG: let libjpeg decode at a reduced scale
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+    renditions = {}
+    current = img
+    for name, px in sorted(sizes, key=lambda s: -s[1]):
+        if max(current.size) > px:
+            current = current.copy()
+            current.thumbnail((px, px), Image.LANCZOS)
+        key = rendition_key(storage_key, name)
+        current.save(os.path.join(upload_root, key), "WEBP", quality=quality, method=4)
+        renditions[name] = {"key": key, "width": current.width, "height": current.height}
+    return renditions
+
+
+class ImagePipeline:
+    """
+    Rendition jobs on a process pool (IMAGE_WORKERS, 0 = inline). At most
+    IMAGE_MAX_PENDING images wait at once; reserve(n) raises ImagePipelineBusy
+    before an upload batch is stored rather than queueing without bound.
+    Reserved slots count against the limit until release(n), which the
+    upload route calls once its images are submitted (or rejected).
+    """
+
+    def __init__(self):
+        self.app = None
+        self.workers = 0
+        self.max_pending = 0
+        self.sizes = []
+        self.quality = 85
+        self._lock = threading.Lock()
+        self._executor = None
+        self._inflight = set()  # (kind, image id, storage_key)
+        self._reserved = 0      # slots held by uploads not yet submitted
+
+    def init_app(self, app):
+        cfg = app.config
+        self.app = app
+        self.workers = cfg["IMAGE_WORKERS"]
+        self.max_pending = cfg["IMAGE_MAX_PENDING"]
+        self.sizes = parse_renditions(cfg["IMAGE_RENDITIONS"])
+        self.quality = cfg["IMAGE_QUALITY"]
+        app.extensions["image_pipeline"] = self
+        app.register_error_handler(ImagePipelineBusy, _busy_response)
+        atexit.register(self.shutdown)
+
+    def reserve(self, count: int):
+        """Hold `count` queue slots, or raise ImagePipelineBusy if they do not fit."""
+        with self._lock:
+            if self.workers > 0 and len(self._inflight) + self._reserved + count > self.max_pending:
+                raise ImagePipelineBusy()
+            self._reserved += count
+
+    def release(self, count: int):
+        """Give back slots from reserve(); submitted images already hold their own."""
+        with self._lock:
+            self._reserved -= count
+
+    def submit(self, kind: str, image_id: int, storage_key: str):
+        """Queue renditions for a committed image row."""
+        job = (kind, image_id, storage_key)
+        args = (self.app.config["UPLOAD_FOLDER"], storage_key, self.sizes, self.quality)
+        with self._lock:
+            if job in self._inflight:
+                return
+            self._inflight.add(job)
+            if self.workers > 0 and self._executor is None:
+                self._executor = new_pool(self.workers)
+            executor = self._executor
+        if executor is None:
+            future = Future()
+            try:
+                future.set_result(render_renditions(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        else:
+            try:
+                future = executor.submit(render_renditions, *args)
+            except RuntimeError:  # pool broken / shut down: resume_stalled_images retries
+                with self._lock:
+                    self._inflight.discard(job)
+                    if self._executor is executor:
+                        self._executor = None
+                return
+        future.add_done_callback(lambda f: self._finish(job, f))
+
+    def _finish(self, job, future):
+        kind, image_id, storage_key = job
+        model = MODELS[kind]
+        try:
+            values = {"status": ImageStatus.ready, "renditions": future.result(), "error": None}
+        except BrokenProcessPool:
+            # a worker died (not necessarily on this image): new pool, row stays processing for a retry
+            log.error("image pool died; %s image %s will be retried", kind, image_id)
+            with self._lock:
+                self._inflight.discard(job)
+                executor, self._executor = self._executor, None
+            if executor is not None:
+                executor.shutdown(wait=False)
+            return
+        except Exception as exc:
+            log.warning("renditions failed for %s image %s: %s", kind, image_id, exc)
+            values = {"status": ImageStatus.failed, "renditions": None, "error": str(exc)[:255] or type(exc).__name__}
+        try:
+            with self.app.app_context():
+                try:
+                    db.session.execute(
+                        update(model)
+                        .where(
+                            model.id == image_id,
+                            model.storage_key == storage_key,  # replaced since: drop the result
+                            model.status == ImageStatus.processing,
+                        )
+                        .values(**values, updated_at=datetime.utcnow())
+                        .execution_options(synchronize_session=False)
+                    )
+                    db.session.commit()
+                finally:
+                    db.session.remove()
+        except Exception:
+            log.exception("could not record renditions for %s image %s", kind, image_id)
+        finally:
+            with self._lock:
+                self._inflight.discard(job)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_pipeline = ImagePipeline()
+
+
+def _busy_response(error):
+    resp, code = api_error("Too many images being processed, retry shortly", 503)
+    resp.headers["Retry-After"] = "5"
+    return resp, code
+
+
+def resume_stalled_images():
+    """Periodic job: requeue images still "processing" long after upload (restart, dead worker)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=image_pipeline.app.config["IMAGE_STALE_SECONDS"])
+    for kind, model in MODELS.items():
+        rows = db.session.execute(
+            select(model.id, model.storage_key)
+            .where(model.status == ImageStatus.processing, model.updated_at < cutoff)
+            .limit(image_pipeline.max_pending)
+        ).all()
+        for row in rows:
+            db.session.execute(
+                update(model).where(model.id == row.id).values(updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            image_pipeline.submit(kind, row.id, row.storage_key)
@@ -0,0 +1,329 @@
+import asyncio
+import atexit
+import json
+import logging
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import event, select
+
+from ..extensions import db
+from ..models.order import Order
+from ..models.outbox import OutboxEvent
+from ..models.user import UserRole
+from .principal_cache import principal_cache
+from .token_revocation import token_revocations
+
+log = logging.getLogger(__name__)
+
+# Server-Sent Events for order / delivery status changes:
+# - order events written to the outbox are published to the in-process
+#   hub once their transaction commits (session after_flush / after_commit)
+# - the hub fans them out to "user:<id>" and "courier:<id>" channels as
+#   small deltas (no items / payments)
+# - streams are served by one asyncio loop on its own port, so idle
+#   connections cost a socket and a small queue, not a worker thread
+# - the SSE id is the outbox event id: a reconnect with Last-Event-ID
+#   replays missed events from the outbox table (within its retention)
+
+_PENDING_KEY = "live_events_pending"
+DELTA_FIELDS = ("order_id", "delivery_status", "payment_status", "delivery_user_id")
+STREAMS = {"/orders/stream": "user", "/delivery/stream": "courier"}
+
+
+def delta(event_id: int, event_type: str, payload: dict) -> dict:
+    data = {k: payload[k] for k in DELTA_FIELDS if payload.get(k) is not None}
+    return {"id": event_id, "type": event_type, "data": data}
+
+
+def channels_for(payload: dict) -> list[str]:
+    channels = [f"user:{payload['user_id']}"]
+    if payload.get("delivery_user_id") is not None:
+        channels.append(f"courier:{payload['delivery_user_id']}")
+    return channels
+
+
+class EventHub:
+    """In-process pub/sub: channel -> subscriber callbacks (called on the publishing thread)."""
+
+    def __init__(self):
+        self.app = None
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> set(callback)
+        self._server = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["event_hub"] = self
+        if not event.contains(db.session, "after_commit", _after_commit):
+            event.listen(db.session, "after_flush", _after_flush)
+            event.listen(db.session, "after_commit", _after_commit)
+            event.listen(db.session, "after_rollback", _after_rollback)
+        if app.config["LIVE_EVENTS_PORT"] > 0 and self._server is None:
+            self._server = LiveEventServer(app, self)
+            self._server.start()
+
+    def subscribe(self, channel: str, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(callback)
+
+    def unsubscribe(self, channel: str, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(channel)
+            if callbacks:
+                callbacks.discard(callback)
+                if not callbacks:
+                    del self._subscribers[channel]
+
+    def publish(self, events: list[tuple[int, str, dict]]):
+        """events: (outbox id, event type, payload) in commit order."""
+        for event_id, event_type, payload in events:
+            message = delta(event_id, event_type, payload)
+            with self._lock:
+                callbacks = [cb for ch in channels_for(payload) for cb in self._subscribers.get(ch, ())]
+            for callback in callbacks:
+                callback(message)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(cbs) for cbs in self._subscribers.values())
+
+
+event_hub = EventHub()
+
+
+# --- session hooks: publish only what actually committed ---
+def _after_flush(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, OutboxEvent) and obj.aggregate_type == "order":
+            session.info.setdefault(_PENDING_KEY, []).append((obj.id, obj.event_type, dict(obj.payload)))
+
+
+def _after_commit(session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        try:
+            event_hub.publish(events)
+        except Exception:
+            log.exception("live event publish failed")
+
+
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# --- SSE server ---
+class LiveEventServer:
+    """
+    Minimal HTTP/1.1 server for two GET streams:
+      - /orders/stream    the caller's orders (any user)
+      - /delivery/stream  orders assigned to the calling courier
+    Auth: `Authorization: Bearer <access token>` or ?access_token= (EventSource
+    cannot set headers). Resume: Last-Event-ID header or ?last_event_id=.
+    """
+
+    def __init__(self, app, hub: EventHub):
+        self.app = app
+        self.hub = hub
+        cfg = app.config
+        self.host = cfg["LIVE_EVENTS_HOST"]
+        self.port = cfg["LIVE_EVENTS_PORT"]
+        self.heartbeat = cfg["LIVE_EVENTS_HEARTBEAT"]
+        self.max_connections = cfg["LIVE_EVENTS_MAX_CONNECTIONS"]
+        self.queue_size = cfg["LIVE_EVENTS_QUEUE_SIZE"]
+        self.replay_limit = cfg["LIVE_EVENTS_REPLAY_LIMIT"]
+        self.connections = 0
+        self._loop = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="live-events", daemon=True).start()
+        self._ready.wait(5)
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, limit=16 * 1024)
+            )
+        except OSError:
+            log.exception("live events: cannot listen on %s:%s", self.host, self.port)
+            self._ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]  # port 0 in tests -> real port
+        self._ready.set()
+        self._loop.run_forever()
+
+    # --- blocking parts (database), run on the loop's default executor ---
+    def _authenticate(self, token: str, kind: str):
+        with self.app.app_context():
+            try:
+                claims = decode_token(token)
+                user = principal_cache.get(int(claims["sub"]))
+                revoked = token_revocations.is_revoked(claims)  # decode_token skips the blocklist
+            except Exception:
+                return None, (401, "Invalid token")
+            finally:
+                db.session.remove()
+            if revoked:
+                return None, (401, "Token has been revoked")
+            if not user:
+                return None, (401, "User not found")
+            if claims.get("ver") is not None and claims["ver"] != user.token_version:
+                return None, (401, "Token is no longer valid")
+            if kind == "courier" and user.role != UserRole.DELIVERY:
+                return None, (403, "Delivery privileges required")
+            return f"{kind}:{user.id}", None
+
+    def _replay(self, channel: str, last_id: int) -> list[dict]:
+        kind, user_id = channel.split(":")
+        owner = Order.user_id if kind == "user" else Order.delivery_user_id
+        with self.app.app_context():
+            try:
+                rows = db.session.execute(
+                    select(OutboxEvent.id, OutboxEvent.event_type, OutboxEvent.payload)
+                    .where(
+                        OutboxEvent.id > last_id,
+                        OutboxEvent.aggregate_type == "order",
+                        OutboxEvent.aggregate_id.in_(select(Order.id).where(owner == int(user_id))),
+                    )
+                    .order_by(OutboxEvent.id)
+                    .limit(self.replay_limit)
+                ).all()
+            finally:
+                db.session.remove()
+        return [delta(*row) for row in rows]
+
+    # --- connection handling ---
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(_read_request(reader), 10)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+        method, target, headers = request
+        url = urlsplit(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+        if method == "OPTIONS":
+            await _respond(writer, 204, None)
+            return
+        kind = STREAMS.get(url.path)
+        if method != "GET" or kind is None:
+            await _respond(writer, 404, "Not found")
+            return
+        if self.connections >= self.max_connections:
+            await _respond(writer, 503, "Too many connections")
+            return
+
+        auth = headers.get("authorization", "")
+        token = auth[7:] if auth.lower().startswith("bearer ") else query.get("access_token", "")
+        if not token:
+            await _respond(writer, 401, "Missing token")
+            return
+        try:
+            last_id = int(headers.get("last-event-id") or query.get("last_event_id") or 0)
+        except ValueError:
+            await _respond(writer, 400, "Invalid Last-Event-ID")
+            return
+
+        loop = asyncio.get_running_loop()
+        channel, error = await loop.run_in_executor(None, self._authenticate, token, kind)
+        if error:
+            await _respond(writer, *error)
+            return
+
+        queue = asyncio.Queue(self.queue_size)
+
+        def on_event(message):  # publishing thread -> loop
+            loop.call_soon_threadsafe(_offer, queue, message)
+
+        self.connections += 1
+        self.hub.subscribe(channel, on_event)  # before the replay: nothing falls in between
+        try:
+            replay = await loop.run_in_executor(None, self._replay, channel, last_id) if last_id else []
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\n"
+                b"Connection: close\r\n"
+                b"X-Accel-Buffering: no\r\n"
+                b"Access-Control-Allow-Origin: *\r\n\r\n"
+                b"retry: 3000\n\n"
+            )
+            for message in replay:
+                writer.write(_format(message))
+            replayed = {message["id"] for message in replay}
+            await writer.drain()
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")  # keeps proxies open, detects dead clients
+                    await writer.drain()
+                    continue
+                if message is None:
+                    break  # too slow: client reconnects with Last-Event-ID
+                if message["id"] in replayed:
+                    continue  # committed while replaying
+                writer.write(_format(message))
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.hub.unsubscribe(channel, on_event)
+            self.connections -= 1
+            writer.close()
+
+
+def _offer(queue: asyncio.Queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # drop the backlog and end the stream; resume fills the gap
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+def _format(message: dict) -> bytes:
+    data = json.dumps({"type": message["type"], **message["data"]}, separators=(",", ":"))
+    return f"id: {message['id']}\nevent: {message['type']}\ndata: {data}\n\n".encode()
+
+
+async def _read_request(reader):
+    line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+    method, target, _ = line.split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readuntil(b"\r\n")).decode("latin-1").strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+async def _respond(writer, status: int, message: str | None):
+    reason = {204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+              404: "Not Found", 503: "Service Unavailable"}[status]
+    body = json.dumps({"error": message}).encode() if message else b""
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Access-Control-Allow-Origin: *\r\n"
+        f"Access-Control-Allow-Headers: Authorization, Last-Event-ID\r\n"
+        f"Connection: close\r\n\r\n".encode() + body
+    )
+    try:
+        await writer.drain()
+    finally:
+        writer.close()
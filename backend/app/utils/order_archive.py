@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from ..extensions import db
+from ..models.order import Order, OrderItem, Payment, DeliveryStatus
+from ..models.order_archive import OrderArchive, OrderItemArchive, PaymentArchive
+
+CLOSED_DELIVERY_STATUSES = (DeliveryStatus.delivered, DeliveryStatus.canceled)
+
+ORDER_COLUMNS = (
+    "id", "user_id", "currency", "subtotal_amount", "shipping_amount",
+    "discount_amount", "tax_amount", "total_amount", "payment_status",
+    "delivery_status", "address", "phone_number", "delivery_user_id",
+    "assigned_at", "delivery_slot_id", "created_at", "updated_at",
+)
+ORDER_ITEM_COLUMNS = ("id", "order_id", "product_id", "unit_amount", "quantity")
+PAYMENT_COLUMNS = (
+    "id", "order_id", "provider", "status", "currency", "amount",
+    "provider_payment_id", "captured_at", "created_at",
+)
+
+
+def _copy(obj, model, columns):
+    return model(**{c: getattr(obj, c) for c in columns})
+
+
+# --- read-through ---
+def find_order(order_id: int):
+    """Hot order, else its archived copy (same attributes), else None."""
+    return db.session.get(Order, order_id) or db.session.get(OrderArchive, order_id)
+
+
+def find_payment(payment_id: int):
+    return db.session.get(Payment, payment_id) or db.session.get(PaymentArchive, payment_id)
+
+
+# --- archival job ---
+def archive_orders_batch(cutoff: datetime, batch_size: int) -> int:
+    """
+    Move one batch of closed orders created before cutoff to the archive.
+    Resumable: the copy is committed before the hot rows are deleted,
+    and orders already present in the archive are only deleted, so a
+    crash between the two steps is repaired by the next run.
+    """
+    order_ids = db.session.scalars(
+        select(Order.id)
+        .where(
+            Order.delivery_status.in_(CLOSED_DELIVERY_STATUSES),
+            Order.created_at < cutoff,
+        )
+        .order_by(Order.created_at, Order.id)
+        .limit(batch_size)
+    ).all()
+    if not order_ids:
+        return 0
+
+    already = set(db.session.scalars(
+        select(OrderArchive.id).where(OrderArchive.id.in_(order_ids))
+    ))
+    to_copy = [oid for oid in order_ids if oid not in already]
+    if to_copy:
+        now = datetime.utcnow()
+        for order in Order.query.filter(Order.id.in_(to_copy)):  # items/payments: selectin
+            archived = _copy(order, OrderArchive, ORDER_COLUMNS)
+            archived.archived_at = now
+            archived.items = [_copy(i, OrderItemArchive, ORDER_ITEM_COLUMNS) for i in order.items]
+            archived.payments = [_copy(p, PaymentArchive, PAYMENT_COLUMNS) for p in order.payments]
+            db.session.add(archived)
+        db.session.commit()
+
+    db.session.execute(delete(Payment).where(Payment.order_id.in_(order_ids)))
+    db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+    db.session.execute(delete(Order).where(Order.id.in_(order_ids)))
+    db.session.commit()
+    return len(order_ids)
+
+
+def archive_closed_orders(max_batches: int = None) -> int:
+    """
+    Archive delivered / canceled orders older than ORDER_ARCHIVE_AFTER_DAYS
+    in batches of ORDER_ARCHIVE_BATCH (at most max_batches per run).
+    """
+    cfg = current_app.config
+    batch_size = cfg["ORDER_ARCHIVE_BATCH"]
+    max_batches = max_batches or cfg["ORDER_ARCHIVE_MAX_BATCHES"]
+    cutoff = datetime.utcnow() - timedelta(days=cfg["ORDER_ARCHIVE_AFTER_DAYS"])
+    archived = 0
+    for _ in range(max_batches):
+        n = archive_orders_batch(cutoff, batch_size)
+        archived += n
+        if n < batch_size:
+            break
+    return archived
@@ -0,0 +1,205 @@
+import enum
+import logging
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from ..extensions import db
+from ..models.outbox import OutboxEvent, OutboxCheckpoint
+from .outbox_sinks import build_sinks
+
+log = logging.getLogger(__name__)
+
+
+# --- producer side (call inside the transaction that changes the row) ---
+def _plain(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def emit(event_type: str, aggregate_type: str, aggregate_id: int, payload: dict) -> OutboxEvent:
+    """Add an event to the current session; it commits (or rolls back) with the change."""
+    event = OutboxEvent(
+        event_type=event_type,
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        payload={k: _plain(v) for k, v in payload.items()},
+    )
+    db.session.add(event)
+    return event
+
+
+def order_event(order, event_type: str, **extra) -> OutboxEvent:
+    payload = {
+        "order_id": order.id,
+        "user_id": order.user_id,
+        "payment_status": order.payment_status,
+        "delivery_status": order.delivery_status,
+        "delivery_user_id": order.delivery_user_id,
+        "currency": order.currency,
+        "total_amount": order.total_amount,
+        **extra,
+    }
+    return emit(event_type, "order", order.id, payload)
+
+
+def payment_event(payment, event_type: str, **extra) -> OutboxEvent:
+    payload = {
+        "payment_id": payment.id,
+        "order_id": payment.order_id,
+        "provider": payment.provider,
+        "status": payment.status,
+        "currency": payment.currency,
+        "amount": payment.amount,
+        "provider_payment_id": payment.provider_payment_id,
+        **extra,
+    }
+    return emit(event_type, "payment", payment.id, payload)
+
+
+# --- dispatcher ---
+def _sinks():
+    app = current_app._get_current_object()
+    if "outbox_sinks" not in app.extensions:
+        app.extensions["outbox_sinks"] = build_sinks(app.config)
+    return app.extensions["outbox_sinks"]
+
+
+def _checkpoint(sink_name: str) -> OutboxCheckpoint | None:
+    """Lock the sink's checkpoint; None if another dispatcher holds it."""
+    cp = db.session.scalars(
+        select(OutboxCheckpoint)
+        .filter_by(sink=sink_name)
+        .with_for_update(skip_locked=True)
+    ).first()
+    if cp is None and not db.session.get(OutboxCheckpoint, sink_name):
+        cp = OutboxCheckpoint(sink=sink_name, last_event_id=0, high_event_id=0, attempts=0)
+        db.session.add(cp)
+        db.session.flush()
+    return cp
+
+
+def dispatch_sink(sink, batch_size: int, max_batches: int) -> int:
+    """
+    Deliver pending events to one sink in id order, batch_size at a time.
+    The checkpoint only moves after a successful delivery, so a failed
+    batch is retried as a whole (with exponential backoff) and nothing
+    is skipped; consumers see each event at least once.
+
+    Ids are allocated before commit, so a slow transaction can commit a
+    lower id after higher ones were shipped. Ids missing below the highest
+    delivered one are kept as gaps on the checkpoint and looked up again
+    on every run; they ship as soon as they commit, and only count as
+    rolled back after OUTBOX_GAP_TIMEOUT. last_event_id stays below the
+    oldest open gap, so purge_outbox() never deletes past it.
+    """
+    cfg = current_app.config
+    delivered = 0
+    for _ in range(max_batches):
+        now = datetime.utcnow()
+        cp = _checkpoint(sink.name)
+        if cp is None or (cp.next_attempt_at and cp.next_attempt_at > now):
+            db.session.rollback()
+            break
+
+        gaps = {int(i): seen for i, seen in (cp.gaps or {}).items()}
+        late = []
+        if gaps:
+            late = db.session.scalars(
+                select(OutboxEvent).where(OutboxEvent.id.in_(list(gaps))).order_by(OutboxEvent.id)
+            ).all()
+        fresh = db.session.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.id > cp.high_event_id)
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+        ).all()
+        events = late + fresh
+
+        if events:
+            try:
+                sink.deliver([e.to_dict() for e in events])
+            except Exception as e:
+                cp.attempts += 1
+                backoff = min(cfg["OUTBOX_RETRY_BASE"] * 2 ** (cp.attempts - 1), cfg["OUTBOX_RETRY_MAX"])
+                cp.next_attempt_at = now + timedelta(seconds=backoff)
+                cp.last_error = str(e)[:1000]
+                db.session.commit()
+                log.warning("outbox sink %s failed (attempt %s, retry in %ss): %s", sink.name, cp.attempts, backoff, e)
+                break
+
+        _advance(cp, gaps, late, fresh, cfg["OUTBOX_GAP_TIMEOUT"])
+        db.session.commit()
+        delivered += len(events)
+        if len(fresh) < batch_size:
+            break
+    return delivered
+
+
+def _advance(cp: OutboxCheckpoint, gaps: dict, late: list, fresh: list, gap_timeout: float):
+    """Move the checkpoint past delivered events, recording / expiring gaps."""
+    now = time.time()
+    for event in late:
+        gaps.pop(event.id)
+    previous = cp.high_event_id
+    for event in fresh:
+        if previous:  # a new checkpoint starts at the first event, not at id 1
+            for missing in range(previous + 1, event.id):
+                gaps[missing] = now
+        previous = event.id
+    for missing, seen in list(gaps.items()):
+        if now - seen > gap_timeout:
+            log.warning("outbox event %s never committed within %ss; no longer waiting for it", missing, gap_timeout)
+            del gaps[missing]
+
+    cp.high_event_id = previous
+    cp.gaps = {str(i): seen for i, seen in sorted(gaps.items())} or None
+    cp.last_event_id = min(gaps) - 1 if gaps else cp.high_event_id
+    if late or fresh:
+        cp.attempts = 0
+        cp.next_attempt_at = None
+        cp.last_error = None
+
+
+def dispatch_outbox() -> dict:
+    cfg = current_app.config
+    return {
+        sink.name: dispatch_sink(sink, cfg["OUTBOX_BATCH"], cfg["OUTBOX_MAX_BATCHES"])
+        for sink in _sinks()
+    }
+
+
+def purge_outbox() -> int:
+    """Delete events every configured sink has acknowledged and that are past retention."""
+    cfg = current_app.config
+    names = [s.name for s in _sinks()]
+    if not names:
+        return 0
+    acked = db.session.scalar(
+        select(func.min(OutboxCheckpoint.last_event_id)).where(OutboxCheckpoint.sink.in_(names))
+    )
+    known = db.session.scalar(
+        select(func.count()).select_from(OutboxCheckpoint).where(OutboxCheckpoint.sink.in_(names))
+    )
+    if not acked or known < len(names):  # a sink that never ran has acknowledged nothing
+        return 0
+    cutoff = datetime.utcnow() - timedelta(hours=cfg["OUTBOX_RETENTION_HOURS"])
+    purged = 0
+    while True:
+        ids = db.session.scalars(
+            select(OutboxEvent.id)
+            .where(OutboxEvent.id <= acked, OutboxEvent.created_at < cutoff)
+            .order_by(OutboxEvent.id)
+            .limit(cfg["OUTBOX_BATCH"])
+        ).all()
+        if not ids:
+            break
+        db.session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(ids)))
+        db.session.commit()
+        purged += len(ids)
+    return purged
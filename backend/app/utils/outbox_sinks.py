@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+
+class SinkError(Exception):
+    pass
+
+
+class HttpSink:
+    """POST {"events": [...]} as JSON; any non-2xx answer is a failed delivery."""
+
+    def __init__(self, url: str, timeout: float):
+        self.name = "http"
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, events: list[dict]):
+        body = json.dumps({"events": events}).encode()
+        req = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                if resp.status >= 300:
+                    raise SinkError(f"HTTP {resp.status}")
+        except OSError as e:  # URLError / HTTPError / timeouts
+            raise SinkError(str(e)) from e
+
+
+class FileSink:
+    """Append one JSON line per event (fsync'd before the batch is acknowledged)."""
+
+    def __init__(self, path: str):
+        self.name = "file"
+        self.path = path
+
+    def deliver(self, events: list[dict]):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class InProcessSink:
+    """
+    Calls subscribers registered in this process.
+    A subscriber that raises fails the batch, which is retried
+    (at-least-once: subscribers should tolerate duplicates by event id).
+    """
+
+    def __init__(self):
+        self.name = "memory"
+        self._lock = threading.Lock()
+        self._subscribers = []  # (fn, event_types | None)
+
+    def subscribe(self, fn, event_types=None):
+        with self._lock:
+            self._subscribers.append((fn, set(event_types) if event_types else None))
+        return fn
+
+    def unsubscribe(self, fn):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[0] is not fn]
+
+    def deliver(self, events: list[dict]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for fn, types in subscribers:
+                if types is None or event["type"] in types:
+                    fn(event)
+
+
+in_process_sink = InProcessSink()
+
+
+def build_sinks(config) -> list:
+    """OUTBOX_SINKS: comma separated, any of memory, file, http."""
+    sinks = []
+    for name in filter(None, (s.strip() for s in config["OUTBOX_SINKS"].split(","))):
+        if name == "memory":
+            sinks.append(in_process_sink)
+        elif name == "file":
+            sinks.append(FileSink(config["OUTBOX_FILE_PATH"]))
+        elif name == "http":
+            sinks.append(HttpSink(config["OUTBOX_HTTP_URL"], config["OUTBOX_HTTP_TIMEOUT"]))
+        else:
+            raise ValueError(f"Unknown outbox sink: {name}")
+    return sinks
+
+
+# --- local HTTP stub (stands in for a downstream consumer in development) ---
+def run_http_stub(host: str, port: int, echo=print):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                events = json.loads(self.rfile.read(length))["events"]
+            except (ValueError, KeyError):
+                self.send_response(400)
+                self.end_headers()
+                return
+            for event in events:
+                echo(f"#{event['id']} {event['type']} {event['aggregate_type']}:{event['aggregate_id']}")
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    echo(f"outbox stub listening on http://{host}:{port}/events")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
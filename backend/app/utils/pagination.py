@@ -0,0 +1,62 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise CursorError("Invalid cursor")
+
+
+def _after_cursor(query, created_col, id_col, cursor):
+    if not cursor:
+        return query
+    created_at, row_id = decode_cursor(cursor)
+    return query.filter(or_(
+        created_col < created_at,
+        and_(created_col == created_at, id_col < row_id),
+    ))
+
+
+def keyset_page(query, created_col, id_col, cursor: str | None, limit: int):
+    """
+    Newest-first keyset pagination on (created_at, id).
+    Fetches limit + 1 rows to know whether another page exists.
+    Returns (rows, next_cursor | None).
+    """
+    return keyset_merge([(query, created_col, id_col)], cursor, limit)
+
+
+def keyset_merge(sources, cursor: str | None, limit: int):
+    """
+    Same as keyset_page over several (query, created_col, id_col) sources
+    that share an id space (e.g. hot + archive tables): each source reads
+    at most limit + 1 rows, results are merged newest first.
+    """
+    rows = []
+    for query, created_col, id_col in sources:
+        q = _after_cursor(query, created_col, id_col, cursor)
+        rows.extend(q.order_by(created_col.desc(), id_col.desc()).limit(limit + 1).all())
+    if len(sources) > 1:
+        # a row being moved between sources may briefly exist in both
+        rows = list({r.id: r for r in rows}.values())
+        rows.sort(key=lambda r: (r.created_at, r.id), reverse=True)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
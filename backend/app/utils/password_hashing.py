@@ -0,0 +1,113 @@
+import atexit
+import logging
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import jsonify
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .process_pool import new_pool
+
+log = logging.getLogger(__name__)
+
+DEFAULT_METHOD = "scrypt:32768:8:1"  # werkzeug's default
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hash / verify calls in flight; answered with 503 + Retry-After."""
+
+
+# module level so the pool can pickle them
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    """
+    Password hashing off the request threads:
+    - scrypt / pbkdf2 run in a process pool (PASSWORD_HASH_WORKERS, 0 = inline)
+    - at most PASSWORD_HASH_MAX_PENDING calls in flight; more raise
+      PasswordHasherBusy right away instead of queueing behind a login storm
+    - PASSWORD_HASH_METHOD is the cost policy; needs_rehash() tells login
+      to upgrade hashes stored under an older policy
+    Before init_app (seeding) everything runs inline with werkzeug's default.
+    """
+
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.workers = 0
+        self.max_pending = 0
+        self.timeout = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._executor = None
+        self._prefix = None
+
+    def init_app(self, app):
+        cfg = app.config
+        self.method = cfg["PASSWORD_HASH_METHOD"]
+        self.workers = cfg["PASSWORD_HASH_WORKERS"]
+        self.max_pending = cfg["PASSWORD_HASH_MAX_PENDING"]
+        self.timeout = cfg["PASSWORD_HASH_TIMEOUT"]
+        self._prefix = None
+        app.extensions["password_hasher"] = self
+        app.register_error_handler(PasswordHasherBusy, _busy_response)
+        atexit.register(self.shutdown)
+
+    def hash(self, password: str) -> str:
+        return self._call(_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._call(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Stored with other parameters than PASSWORD_HASH_METHOD (e.g. "scrypt:32768:8:1")?"""
+        if self._prefix is None:
+            # werkzeug fills in defaults ("pbkdf2" -> "pbkdf2:sha256:<iterations>"): compare the full form
+            self._prefix = _hash("", self.method).split("$", 1)[0]
+        return password_hash.split("$", 1)[0] != self._prefix
+
+    def _call(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordHasherBusy()
+            self._pending += 1
+            if self._executor is None:
+                self._executor = new_pool(self.workers)
+            executor = self._executor
+        try:
+            return executor.submit(fn, *args).result(timeout=self.timeout)
+        except FutureTimeout:
+            raise PasswordHasherBusy()
+        except BrokenProcessPool:
+            log.exception("password hashing pool died; recreating it")
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            return fn(*args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+
+def _busy_response(error):
+    # models import this module, so no utils.api here (circular import)
+    resp = jsonify({"error": "Too many password checks in progress, retry shortly"})
+    resp.headers["Retry-After"] = "1"
+    return resp, 503
@@ -0,0 +1,199 @@
+import atexit
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from ..extensions import db
+from ..models.order import DeliveryStatus, Payment, PaymentStatus
+from .payment_providers import ProviderError, build_adapters
+from .payments import transition_payment
+
+log = logging.getLogger(__name__)
+
+
+class PaymentGateway:
+    """
+    Runs provider calls on a worker pool instead of the request thread.
+    Routes commit the payment (status created) and call submit_authorize();
+    the worker authorizes (and with PSP_AUTO_CAPTURE captures) it and
+    records the result. Clients follow the payment via GET /payments/<id>.
+    - no row lock is held during a provider call; the result is applied
+      to the re-read, locked row only if the payment is still in the status
+      the call started from (a webhook or an admin may have moved it)
+    - a retryable failure leaves the payment where it was (created or
+      authorized) with a backoff in next_attempt_at; retry_stalled_payments()
+      submits it again (provider calls carry a per-payment Idempotency-Key,
+      so a retry never charges twice)
+    - orders canceled before the capture are not captured
+    PSP_ENABLED = false keeps the manual flow (admin PUT / webhooks).
+    """
+
+    def __init__(self):
+        self.app = None
+        self.adapters = {}
+        self._executor = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["payment_gateway"] = self
+        if not app.config["PSP_ENABLED"]:
+            return
+        self.adapters = build_adapters(app.config)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config["PSP_WORKERS"], thread_name_prefix="psp-worker",
+        )
+        atexit.register(self.shutdown)
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        for adapter in self.adapters.values():
+            adapter.client.pool.close()
+
+    def submit_authorize(self, payment_id: int):
+        """Call after the payment row is committed."""
+        if self.enabled:
+            return self._executor.submit(self._run, payment_id)
+
+    def _run(self, payment_id: int):
+        try:
+            with self.app.app_context():
+                self.process(payment_id)
+        except Exception:
+            log.exception("payment %s: provider processing crashed", payment_id)
+
+    def process(self, payment_id: int):
+        payment = db.session.get(Payment, payment_id)
+        if payment is None:
+            return
+        adapter = self.adapters[payment.provider]
+        if payment.status == PaymentStatus.created:
+            payment = self._authorize(adapter, payment)
+        if payment is None or payment.status != PaymentStatus.authorized or not self.app.config["PSP_AUTO_CAPTURE"]:
+            return
+        self._capture(adapter, payment)
+
+    def _locked(self, payment_id: int) -> Payment | None:
+        # end the transaction the provider call ran in, then lock the current row
+        db.session.rollback()
+        return db.session.scalars(select(Payment).where(Payment.id == payment_id).with_for_update()).first()
+
+    def _authorize(self, adapter, payment: Payment) -> Payment | None:
+        payment_id = payment.id
+        result = error = None
+        try:
+            result = adapter.authorize(payment)
+        except ProviderError as e:
+            log.warning("payment %s: authorize failed: %s", payment_id, e)
+            error = e
+        payment = self._locked(payment_id)
+        if payment is None or payment.status != PaymentStatus.created:
+            # settled during the call (webhook / admin): that status stands
+            db.session.commit()
+            return payment
+        if error is None:
+            payment.provider_payment_id = result.provider_payment_id
+            payment.provider_attempts = 0
+            payment.next_attempt_at = None
+            if result.status == PaymentStatus.authorized and self.app.config["PSP_AUTO_CAPTURE"]:
+                # capture follows right away; should this process die first,
+                # the retry job picks the payment up once this passes
+                payment.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.app.config["PSP_RETRY_AFTER"])
+            transition_payment(payment, result.status)
+        elif error.retryable:
+            self._schedule_retry(payment)
+        else:
+            transition_payment(payment, PaymentStatus.failed)
+        db.session.commit()
+        return payment
+
+    def _capture(self, adapter, payment: Payment):
+        payment_id = payment.id
+        if payment.order.delivery_status == DeliveryStatus.canceled:
+            # the hold is left for an admin to cancel; nothing to retry
+            log.info("payment %s: order %s was canceled, not capturing", payment_id, payment.order_id)
+            payment.next_attempt_at = None
+            db.session.commit()
+            return
+        result = error = None
+        try:
+            result = adapter.capture(payment)
+        except ProviderError as e:
+            error = e
+        payment = self._locked(payment_id)
+        if payment is None or payment.status != PaymentStatus.authorized:
+            db.session.commit()
+            return
+        if result is not None and result.status == PaymentStatus.captured:
+            payment.provider_attempts = 0
+            payment.next_attempt_at = None
+            transition_payment(payment, PaymentStatus.captured)
+        else:
+            log.warning("payment %s: capture failed: %s", payment_id, error or f"provider returned {result.status.value}")
+            self._schedule_retry(payment)
+        db.session.commit()
+
+    def _schedule_retry(self, payment: Payment):
+        """Back off before the next attempt at the payment's current step. Does not commit."""
+        cfg = self.app.config
+        payment.provider_attempts += 1
+        if payment.provider_attempts >= cfg["PSP_RETRY_MAX_ATTEMPTS"]:
+            log.warning("payment %s: giving up after %s %s attempts", payment.id, payment.provider_attempts,
+                        "authorize" if payment.status == PaymentStatus.created else "capture")
+            payment.next_attempt_at = None
+            if payment.status == PaymentStatus.created:
+                transition_payment(payment, PaymentStatus.failed)
+            # an authorized payment cannot fail; it stays for an admin to capture or cancel
+            return
+        backoff = min(cfg["PSP_RETRY_BASE"] * 2 ** (payment.provider_attempts - 1), cfg["PSP_RETRY_MAX"])
+        payment.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff)
+
+
+payment_gateway = PaymentGateway()
+
+
+def retry_stalled_payments() -> int:
+    """
+    Periodic job: re-submit payments whose retry is due: created ones
+    (authorize) and authorized ones awaiting auto-capture, plus created
+    ones never attempted within PSP_RETRY_AFTER (process died before the
+    worker ran). Each is claimed for PSP_RETRY_AFTER first, so a slow
+    attempt is not submitted twice. Returns payments submitted.
+    """
+    if not payment_gateway.enabled:
+        return 0
+    cfg = payment_gateway.app.config
+    now = datetime.utcnow()
+    due = or_(
+        and_(Payment.status.in_((PaymentStatus.created, PaymentStatus.authorized)), Payment.next_attempt_at <= now),
+        and_(
+            Payment.status == PaymentStatus.created,
+            Payment.next_attempt_at.is_(None),
+            Payment.created_at < now - timedelta(seconds=cfg["PSP_RETRY_AFTER"]),
+        ),
+    )
+    ids = db.session.scalars(
+        select(Payment.id)
+        .where(due)
+        .order_by(Payment.id)
+        .limit(cfg["PSP_RETRY_BATCH"])
+    ).all()
+    submitted = 0
+    for payment_id in ids:
+        claimed = db.session.execute(
+            update(Payment)
+            .where(Payment.id == payment_id, due)
+            .values(next_attempt_at=now + timedelta(seconds=cfg["PSP_RETRY_AFTER"]))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            payment_gateway.submit_authorize(payment_id)
+            submitted += 1
+    return submitted
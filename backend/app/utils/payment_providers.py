@@ -0,0 +1,262 @@
+import http.client
+import json
+import queue
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+from ..models.order import PaymentProvider, PaymentStatus
+
+
+class ProviderError(Exception):
+    def __init__(self, message: str, retryable: bool = False, status: int | None = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+
+
+class CircuitOpenError(ProviderError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Keep-alive HTTP(S) connections to one host (stdlib http.client).
+    At most `size` idle connections are kept; a connection that failed
+    mid-request is closed instead of being returned.
+    """
+
+    def __init__(self, base_url: str, size: int, connect_timeout: float, read_timeout: float):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.size = size  # 0 = no keep-alive (new connection per call)
+        self._idle = queue.LifoQueue()
+
+    def _new_connection(self):
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        conn = cls(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        # headers and body go out in separate writes; without this, Nagle +
+        # delayed ACK adds ~40ms to every call on a reused connection
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return conn
+
+    def request(self, method: str, path: str, body: bytes | None, headers: dict) -> tuple[int, bytes]:
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._new_connection(), False
+        try:
+            conn.request(method, self.base_path + path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            conn.close()
+            if not reused:
+                raise
+            # the server dropped an idle keep-alive connection: one retry on a fresh one
+            conn = self._new_connection()
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except Exception:
+                conn.close()
+                raise
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close or self._idle.qsize() >= self.size:
+            conn.close()
+        else:
+            self._idle.put_nowait(conn)
+        return resp.status, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; open rejects
+    calls for `reset_timeout` seconds, then lets one trial call through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class ProviderClient:
+    """
+    JSON over a pooled connection with strict timeouts, retries with
+    full jitter (connection errors, timeouts, 429 and 5xx only) and a
+    circuit breaker. Every call carries an Idempotency-Key so a retry
+    never charges twice.
+    """
+
+    def __init__(self, base_url: str, api_key: str, cfg):
+        self.pool = ConnectionPool(
+            base_url, cfg["PSP_POOL_SIZE"], cfg["PSP_CONNECT_TIMEOUT"], cfg["PSP_READ_TIMEOUT"],
+        )
+        self.breaker = CircuitBreaker(cfg["PSP_BREAKER_THRESHOLD"], cfg["PSP_BREAKER_RESET"])
+        self.api_key = api_key
+        self.max_retries = cfg["PSP_MAX_RETRIES"]
+        self.backoff_base = cfg["PSP_BACKOFF_BASE"]
+        self.backoff_max = cfg["PSP_BACKOFF_MAX"]
+
+    def _once(self, method: str, path: str, payload, idempotency_key: str) -> dict:
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+            "Idempotency-Key": idempotency_key,
+        }
+        try:
+            status, data = self.pool.request(method, path, body, headers)
+        except (OSError, http.client.HTTPException) as e:  # refused, reset, timeout
+            raise ProviderError(f"{type(e).__name__}: {e}", retryable=True) from e
+        if status == 429 or status >= 500:
+            raise ProviderError(f"HTTP {status}", retryable=True, status=status)
+        try:
+            result = json.loads(data or b"{}")
+        except ValueError:
+            raise ProviderError("Invalid JSON from provider", retryable=False, status=status)
+        if status >= 400:
+            raise ProviderError(result.get("error") or f"HTTP {status}", retryable=False, status=status)
+        return result
+
+    def call(self, method: str, path: str, payload=None, idempotency_key: str = "") -> dict:
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("Provider circuit open", retryable=True)
+            try:
+                result = self._once(method, path, payload, idempotency_key)
+            except ProviderError as e:
+                if not e.retryable:
+                    self.breaker.record_success()  # the provider answered; it is up
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+                continue
+            self.breaker.record_success()
+            return result
+
+
+@dataclass
+class ProviderResult:
+    provider_payment_id: str
+    status: PaymentStatus
+
+
+class PayPalAdapter:
+    """PayPal Orders v2: create order (authorize intent) -> authorize -> capture."""
+    provider = PaymentProvider.paypal
+
+    def __init__(self, client: ProviderClient):
+        self.client = client
+
+    def authorize(self, payment) -> ProviderResult:
+        amount = {"currency_code": payment.currency, "value": f"{payment.amount / 100:.2f}"}
+        created = self.client.call("POST", "/v2/checkout/orders", {
+            "intent": "AUTHORIZE",
+            "purchase_units": [{"reference_id": str(payment.order_id), "amount": amount}],
+        }, idempotency_key=f"payment-{payment.id}-create")
+        result = self.client.call(
+            "POST", f"/v2/checkout/orders/{created['id']}/authorize", {},
+            idempotency_key=f"payment-{payment.id}-authorize",
+        )
+        ok = result.get("status") == "COMPLETED"
+        return ProviderResult(created["id"], PaymentStatus.authorized if ok else PaymentStatus.failed)
+
+    def capture(self, payment) -> ProviderResult:
+        result = self.client.call(
+            "POST", f"/v2/checkout/orders/{payment.provider_payment_id}/capture", {},
+            idempotency_key=f"payment-{payment.id}-capture",
+        )
+        ok = result.get("status") == "COMPLETED"
+        return ProviderResult(payment.provider_payment_id, PaymentStatus.captured if ok else PaymentStatus.failed)
+
+
+class CardAdapter:
+    """Card acquirer payment intents: manual capture."""
+    provider = PaymentProvider.card
+
+    def __init__(self, client: ProviderClient):
+        self.client = client
+
+    def authorize(self, payment) -> ProviderResult:
+        result = self.client.call("POST", "/v1/payment_intents", {
+            "amount": payment.amount,
+            "currency": payment.currency.lower(),
+            "capture_method": "manual",
+            "metadata": {"order_id": payment.order_id, "payment_id": payment.id},
+        }, idempotency_key=f"payment-{payment.id}-authorize")
+        ok = result.get("status") == "requires_capture"
+        return ProviderResult(result["id"], PaymentStatus.authorized if ok else PaymentStatus.failed)
+
+    def capture(self, payment) -> ProviderResult:
+        result = self.client.call(
+            "POST", f"/v1/payment_intents/{payment.provider_payment_id}/capture", {},
+            idempotency_key=f"payment-{payment.id}-capture",
+        )
+        ok = result.get("status") == "succeeded"
+        return ProviderResult(payment.provider_payment_id, PaymentStatus.captured if ok else PaymentStatus.failed)
+
+
+def build_adapters(cfg) -> dict:
+    return {
+        PaymentProvider.paypal: PayPalAdapter(ProviderClient(cfg["PSP_PAYPAL_URL"], cfg["PSP_PAYPAL_API_KEY"], cfg)),
+        PaymentProvider.card: CardAdapter(ProviderClient(cfg["PSP_CARD_URL"], cfg["PSP_CARD_API_KEY"], cfg)),
+    }
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from ..extensions import db
+from ..models.order import Order, Payment, PaymentProvider, PaymentStatus, OrderPaymentStatus
+from ..models.payment_webhook import PaymentWebhookEvent
+from ..schemas.payment_schema import PAYMENT_TRANSITIONS
+from .outbox import order_event, payment_event
+from .sales_rollup import record_capture, record_refund
+
+
+def _apply_refund(payment: Payment):
+    """Order marked refunded, sales rollups, outbox: same for admin refunds, PUT and PSP webhooks."""
+    payment.order.payment_status = OrderPaymentStatus.refunded
+    if payment.captured_at is not None:
+        # authorized -> refunded released a hold; no captured money to net out
+        record_refund(payment.order, payment.amount)
+    payment_event(payment, "payment.refunded")
+    order_event(payment.order, "order.refunded")
+
+
+def transition_payment(payment: Payment, new_status: PaymentStatus):
+    """
+    Apply an already validated status change and its side effects
+    (order paid / refunded, sales rollups, outbox). Does NOT commit.
+    """
+    previous_status = payment.status
+    payment.status = new_status
+
+    # if captured => mark order paid
+    if new_status == PaymentStatus.captured:
+        payment.captured_at = datetime.utcnow()
+        payment.order.payment_status = OrderPaymentStatus.paid
+        record_capture(payment.order, payment.amount)
+        order_event(payment.order, "order.paid")
+    elif new_status == PaymentStatus.refunded:
+        _apply_refund(payment)
+    payment_event(payment, "payment.status_changed", previous_status=previous_status)
+
+
+def apply_webhook_batch(provider: PaymentProvider, events: list[dict]) -> list[dict]:
+    """
+    Apply a batch of PSP events ({event_id, provider_payment_id, status, amount?})
+    in the caller's transaction, in the order received:
+    - payments are resolved (and locked) with one IN query on provider_payment_id
+    - already applied event ids (earlier batches or repeated in this one) -> duplicate
+    - transitions are checked against PAYMENT_TRANSITIONS; an event for the
+      status the payment already has is a duplicate, not an error
+    Returns one outcome per event: applied | duplicate | not_found | rejected.
+    Only applied events are recorded, so a rejected (e.g. out of order)
+    event can succeed when the PSP redelivers it.
+    """
+    provider_ids = {e["provider_payment_id"] for e in events}
+    payments = {
+        p.provider_payment_id: p
+        for p in db.session.scalars(
+            select(Payment)
+            .where(Payment.provider_payment_id.in_(provider_ids))
+            .options(selectinload(Payment.order).selectinload(Order.items))
+            .order_by(Payment.id)
+            .with_for_update()
+        )
+    }
+    seen = set(db.session.scalars(
+        select(PaymentWebhookEvent.event_id).where(
+            PaymentWebhookEvent.provider == provider.value,
+            PaymentWebhookEvent.event_id.in_({e["event_id"] for e in events}),
+        )
+    ))
+
+    results = []
+    for event in events:
+        result = {"event_id": event["event_id"], "payment_id": None}
+        results.append(result)
+        payment = payments.get(event["provider_payment_id"])
+        if event["event_id"] in seen:
+            result["outcome"] = "duplicate"
+            result["payment_id"] = payment.id if payment else None
+            continue
+        if not payment or payment.provider != provider:
+            result["outcome"] = "not_found"
+            continue
+        result["payment_id"] = payment.id
+
+        new_status = PaymentStatus(event["status"])
+        if new_status == payment.status:
+            result["outcome"] = "duplicate"
+        elif new_status not in PAYMENT_TRANSITIONS.get(payment.status, ()):
+            result["outcome"] = "rejected"
+            result["error"] = f"Invalid payment status transition: {payment.status.value} → {new_status.value}"
+            continue
+        elif event.get("amount") is not None and event["amount"] != payment.amount:
+            result["outcome"] = "rejected"
+            result["error"] = "Amount does not match payment"
+            continue
+        else:
+            transition_payment(payment, new_status)
+            result["outcome"] = "applied"
+
+        seen.add(event["event_id"])
+        db.session.add(PaymentWebhookEvent(
+            provider=provider.value,
+            event_id=event["event_id"],
+            payment_id=payment.id,
+            status=new_status.value,
+        ))
+    return results
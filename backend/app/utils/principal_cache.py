@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+
+from ..extensions import db
+from ..models.user import User, UserRole
+
+
+class Principal:
+    """What authorization needs about the caller: no profile fields, no ORM state."""
+    __slots__ = ("id", "role", "token_version")
+
+    def __init__(self, id: int, role: UserRole, token_version: int):
+        self.id = id
+        self.role = role
+        self.token_version = token_version
+
+    def is_admin(self) -> bool:
+        return self.role == UserRole.ADMIN
+
+    def is_delivery(self) -> bool:
+        return self.role == UserRole.DELIVERY
+
+
+class PrincipalCache:
+    """
+    user_id -> Principal, TTL + LRU. Routes that change a user's role,
+    password or existence call invalidate(user_id) after commit; the TTL
+    bounds staleness for changes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # user_id -> (expires_at monotonic, Principal)
+        self.ttl = 30.0
+        self.max_size = 10000
+
+    def init_app(self, app):
+        self.ttl = app.config["PRINCIPAL_CACHE_TTL"]
+        self.max_size = app.config["PRINCIPAL_CACHE_SIZE"]
+        app.extensions["principal_cache"] = self
+
+    def get(self, user_id: int) -> Principal | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+
+        row = db.session.execute(
+            select(User.id, User.role, User.token_version).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None  # not cached: a deleted user stays a miss
+        principal = Principal(row.id, row.role, row.token_version)
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, principal)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return principal
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def token_claims(user) -> dict:
+    """Extra JWT claims checked by get_current_user (user: User or Principal)."""
+    return {"role": user.role.value, "ver": user.token_version}
@@ -0,0 +1,20 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def pool_context():
+    """
+    Start method for worker pools: forkserver where available, else spawn
+    - never fork: pools are created lazily from a process already running
+      request threads and background jobs, and a forked child can inherit
+      a lock some other thread was holding (logging, DB pools) and hang
+    - workers import the task's module fresh; run.py builds the app only
+      under __main__, so that import stays cheap
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def new_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=pool_context())
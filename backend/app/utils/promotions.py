@@ -0,0 +1,254 @@
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import or_, select, update
+
+from ..extensions import db
+from ..models.product import product_categories
+from ..models.promotion import (
+    Promotion, PromotionTarget, PromotionCatalog, PromotionKind, PromotionScope,
+)
+
+# How promotions combine:
+# - each cart line gets its single best line rule (product rules for the
+#   product + category rules for its categories); line rules don't stack
+# - then the single best basket rule applies to the discounted subtotal
+# - the total discount never exceeds the subtotal
+
+
+@dataclass(slots=True)
+class CompiledRule:
+    id: int
+    version: int
+    kind: PromotionKind
+    percent: int
+    amount_off: int
+    buy_qty: int
+    get_qty: int
+    min_subtotal: int
+    max_discount: int | None
+    priority: int
+    starts_at: datetime | None
+    ends_at: datetime | None
+
+    def active(self, now: datetime) -> bool:
+        return (self.starts_at is None or self.starts_at <= now) and (self.ends_at is None or now < self.ends_at)
+
+    def _cap(self, discount: int) -> int:
+        if self.max_discount is not None:
+            discount = min(discount, self.max_discount)
+        return max(discount, 0)
+
+    def line_discount(self, unit_amount: int, quantity: int) -> int:
+        if self.kind == PromotionKind.percent_off:
+            return self._cap(unit_amount * quantity * self.percent // 100)
+        if self.kind == PromotionKind.fixed_off:
+            return self._cap(min(self.amount_off, unit_amount) * quantity)
+        if self.kind == PromotionKind.buy_x_get_y:
+            group = self.buy_qty + self.get_qty
+            return self._cap((quantity // group) * self.get_qty * unit_amount) if group else 0
+        return 0
+
+    def basket_discount(self, subtotal: int) -> int:
+        if subtotal < self.min_subtotal:
+            return 0
+        if self.percent:
+            return self._cap(subtotal * self.percent // 100)
+        return self._cap(min(self.amount_off, subtotal))
+
+
+def compile_rule(p) -> CompiledRule:
+    return CompiledRule(
+        id=p.id,
+        version=p.version,
+        kind=p.kind,
+        percent=p.percent or 0,
+        amount_off=p.amount_off or 0,
+        buy_qty=p.buy_qty or 0,
+        get_qty=p.get_qty or 0,
+        min_subtotal=p.min_subtotal or 0,
+        max_discount=p.max_discount,
+        priority=p.priority or 0,
+        starts_at=p.starts_at,
+        ends_at=p.ends_at,
+    )
+
+
+@dataclass
+class RuleIndex:
+    """Line rules by product id and by category id, plus basket rules."""
+    by_product: dict = field(default_factory=lambda: defaultdict(list))
+    by_category: dict = field(default_factory=lambda: defaultdict(list))
+    basket: list = field(default_factory=list)
+    size: int = 0
+
+    def add(self, rule: CompiledRule, scope: PromotionScope, product_ids=(), category_ids=()):
+        self.size += 1
+        if scope == PromotionScope.basket:
+            self.basket.append(rule)
+            return
+        for pid in product_ids:
+            self.by_product[pid].append(rule)
+        for cid in category_ids:
+            self.by_category[cid].append(rule)
+
+
+@dataclass
+class PromotionResult:
+    subtotal_amount: int = 0
+    discount_amount: int = 0
+    lines: dict = field(default_factory=dict)   # product_id -> {"promotion_id", "discount"}
+    basket: dict | None = None                  # {"promotion_id", "discount"}
+
+    def applied(self) -> list[dict]:
+        applied = [{"product_id": pid, **line} for pid, line in self.lines.items()]
+        if self.basket:
+            applied.append({"product_id": None, **self.basket})
+        return applied
+
+
+def _better(candidate: tuple, best: tuple | None) -> bool:
+    """(discount, rule) pairs: larger discount, then higher priority, then lower id."""
+    if best is None:
+        return True
+    (d1, r1), (d2, r2) = candidate, best
+    return (d1, r1.priority, -r1.id) > (d2, r2.priority, -r2.id)
+
+
+def evaluate(index: RuleIndex, lines, categories_by_product: dict, now: datetime) -> PromotionResult:
+    """
+    lines: iterable of (product_id, unit_amount, quantity).
+    Only rules indexed under the lines' products / categories are looked at.
+    """
+    result = PromotionResult()
+    for product_id, unit_amount, quantity in lines:
+        result.subtotal_amount += unit_amount * quantity
+        best = None
+        candidates = index.by_product.get(product_id, ())
+        for cid in categories_by_product.get(product_id, ()):
+            candidates = [*candidates, *index.by_category.get(cid, ())]
+        for rule in candidates:
+            if not rule.active(now):
+                continue
+            discount = rule.line_discount(unit_amount, quantity)
+            if discount and _better((discount, rule), best):
+                best = (discount, rule)
+        if best:
+            line = result.lines.setdefault(product_id, {"promotion_id": best[1].id, "discount": 0})
+            line["discount"] += best[0]
+            result.discount_amount += best[0]
+
+    remaining = result.subtotal_amount - result.discount_amount
+    best = None
+    for rule in index.basket:
+        if not rule.active(now):
+            continue
+        discount = rule.basket_discount(remaining)
+        if discount and _better((discount, rule), best):
+            best = (discount, rule)
+    if best:
+        result.basket = {"promotion_id": best[1].id, "discount": best[0]}
+        result.discount_amount += best[0]
+
+    result.discount_amount = min(result.discount_amount, result.subtotal_amount)
+    return result
+
+
+class PromotionEngine:
+    """
+    In-process rule index, rebuilt when the promotion catalog version
+    changes (checked at most every PROMOTIONS_REFRESH_INTERVAL seconds,
+    immediately after a change made by this process). Unchanged
+    promotions keep their compiled rule across rebuilds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+        self._compiled = {}  # (id, version) -> CompiledRule
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def _catalog_version(self) -> int:
+        return db.session.scalar(select(PromotionCatalog.version).where(PromotionCatalog.id == 1)) or 0
+
+    def _build(self) -> RuleIndex:
+        now = datetime.utcnow()
+        promotions = db.session.execute(
+            select(Promotion).where(
+                Promotion.is_active.is_(True),
+                or_(Promotion.ends_at.is_(None), Promotion.ends_at > now),
+            )
+        ).scalars().all()
+        targets = defaultdict(lambda: ([], []))
+        if promotions:
+            for t in db.session.execute(
+                select(PromotionTarget.promotion_id, PromotionTarget.product_id, PromotionTarget.category_id)
+                .where(PromotionTarget.promotion_id.in_([p.id for p in promotions]))
+            ):
+                if t.product_id is not None:
+                    targets[t.promotion_id][0].append(t.product_id)
+                if t.category_id is not None:
+                    targets[t.promotion_id][1].append(t.category_id)
+
+        index, compiled = RuleIndex(), {}
+        for p in promotions:
+            key = (p.id, p.version)
+            rule = self._compiled.get(key) or compile_rule(p)
+            compiled[key] = rule
+            product_ids, category_ids = targets[p.id]
+            index.add(rule, p.scope, product_ids, category_ids)
+        self._compiled = compiled
+        return index
+
+    def index(self) -> RuleIndex:
+        interval = current_app.config["PROMOTIONS_REFRESH_INTERVAL"]
+        if self._index is not None and time.monotonic() - self._checked_at < interval:
+            return self._index
+        with self._lock:
+            if self._index is None or time.monotonic() - self._checked_at >= interval:
+                version = self._catalog_version()
+                if self._index is None or version != self._version:
+                    self._index = self._build()
+                    self._version = version
+                self._checked_at = time.monotonic()
+            return self._index
+
+    def price_lines(self, lines) -> PromotionResult:
+        """lines: (product_id, unit_amount, quantity); one category lookup for all lines."""
+        lines = list(lines)
+        index = self.index()
+        categories = defaultdict(list)
+        product_ids = {pid for pid, _, _ in lines}
+        if product_ids and index.by_category:
+            for pid, cid in db.session.execute(
+                select(product_categories.c.product_id, product_categories.c.category_id)
+                .where(product_categories.c.product_id.in_(product_ids))
+            ):
+                categories[pid].append(cid)
+        return evaluate(index, lines, categories, datetime.utcnow())
+
+    def price_cart(self, cart) -> PromotionResult:
+        return self.price_lines((i.product_id, i.unit_amount, i.quantity) for i in cart.items)
+
+
+def bump_catalog_version():
+    """
+    Call in the transaction that changes a promotion;
+    call promotion_engine.invalidate() after the commit.
+    """
+    updated = db.session.execute(
+        update(PromotionCatalog).where(PromotionCatalog.id == 1).values(version=PromotionCatalog.version + 1)
+    ).rowcount
+    if not updated:
+        db.session.add(PromotionCatalog(id=1, version=1))
+
+
+promotion_engine = PromotionEngine()
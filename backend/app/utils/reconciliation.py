@@ -0,0 +1,251 @@
+import csv
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+from sqlalchemy import exists, insert, select
+
+from ..extensions import db
+from ..models.order import Payment, PaymentProvider, PaymentStatus
+from ..models.order_archive import PaymentArchive
+from ..models.reconciliation import (
+    ReconciliationRun, ReconciliationRunStatus,
+    ReconciliationItem, ReconciliationOutcome,
+)
+
+log = logging.getLogger(__name__)
+
+# settlement file columns: provider_payment_id, amount, currency, status
+# amount: minor units ("1290") or major units with a decimal point ("12.90")
+SETTLEMENT_STATUSES = {
+    "settled": PaymentStatus.captured,
+    "captured": PaymentStatus.captured,
+    "refunded": PaymentStatus.refunded,
+}
+# payments that must show up in the provider's settlement for their period
+SETTLED_STATUSES = (PaymentStatus.captured, PaymentStatus.refunded)
+
+
+class SettlementFileError(ValueError):
+    pass
+
+
+def _parse_amount(raw: str) -> int:
+    raw = raw.strip()
+    if "." in raw:
+        return int((Decimal(raw) * 100).to_integral_value())
+    return int(raw)
+
+
+def _parse_row(line_no: int, row: dict) -> dict:
+    """Settlement CSV row -> item dict (outcome filled in by _match_chunk)."""
+    item = {
+        "line_no": line_no,
+        "provider_payment_id": (row.get("provider_payment_id") or "").strip()[:128] or None,
+        "settled_currency": (row.get("currency") or "").strip().upper()[:3] or None,
+        "settled_status": (row.get("status") or "").strip().lower()[:20] or None,
+        "settled_amount": None,
+        "payment_id": None,
+        "issues": None,
+    }
+    try:
+        item["settled_amount"] = _parse_amount(row.get("amount") or "")
+    except (InvalidOperation, ValueError):
+        item["issues"] = ["amount_format"]
+    if not item["provider_payment_id"]:
+        item["issues"] = (item["issues"] or []) + ["provider_payment_id"]
+    if item["settled_status"] not in SETTLEMENT_STATUSES:
+        item["issues"] = (item["issues"] or []) + ["status_value"]
+    if item["issues"]:
+        item["outcome"] = ReconciliationOutcome.invalid
+    return item
+
+
+def _lookup(model, provider: PaymentProvider, wanted: set) -> dict:
+    return {
+        row.provider_payment_id: row
+        for row in db.session.execute(
+            select(model.id, model.provider_payment_id, model.amount, model.currency, model.status)
+            .where(model.provider == provider, model.provider_payment_id.in_(wanted))
+        )
+    }
+
+
+def _match_chunk(run: ReconciliationRun, provider: PaymentProvider, items: list[dict]):
+    """One indexed IN lookup for the chunk (plus one in the archive for the rest), then compare field by field."""
+    wanted = {i["provider_payment_id"] for i in items if "outcome" not in i}
+    payments = _lookup(Payment, provider, wanted) if wanted else {}
+    # archived orders keep their payment ids
+    rest = wanted - payments.keys()
+    if rest:
+        payments.update(_lookup(PaymentArchive, provider, rest))
+
+    for item in items:
+        if "outcome" in item:
+            continue
+        payment = payments.get(item["provider_payment_id"])
+        if payment is None:
+            item["outcome"] = ReconciliationOutcome.missing
+            continue
+        item["payment_id"] = payment.id
+        issues = []
+        if item["settled_amount"] != payment.amount:
+            issues.append("amount")
+        if item["settled_currency"] != payment.currency:
+            issues.append("currency")
+        if SETTLEMENT_STATUSES[item["settled_status"]] != payment.status:
+            issues.append("status")
+        item["issues"] = issues or None
+        item["outcome"] = ReconciliationOutcome.mismatch if issues else ReconciliationOutcome.matched
+
+    counters = {
+        ReconciliationOutcome.matched: "matched",
+        ReconciliationOutcome.mismatch: "mismatched",
+        ReconciliationOutcome.missing: "missing",
+        ReconciliationOutcome.invalid: "invalid",
+    }
+    for item in items:
+        attr = counters[item["outcome"]]
+        setattr(run, attr, getattr(run, attr) + 1)
+    run.rows_read += len(items)
+    db.session.execute(insert(ReconciliationItem), [{**i, "run_id": run.id} for i in items])
+
+
+def _record_orphans(run: ReconciliationRun, provider: PaymentProvider, chunk_size: int):
+    """Settled payments in the run's window (hot and archived) that no settlement row matched."""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(Payment.id, Payment.provider_payment_id)
+            .where(
+                Payment.provider == provider,
+                Payment.status.in_(SETTLED_STATUSES),
+                Payment.created_at >= run.date_from,
+                Payment.created_at < run.date_to,
+                Payment.id > last_id,
+                ~exists().where(
+                    ReconciliationItem.run_id == run.id,
+                    ReconciliationItem.payment_id == Payment.id,
+                ),
+            )
+            .order_by(Payment.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+        _insert_orphans(run, rows)
+        last_id = rows[-1].id
+
+    # the archive may live in another database: no NOT EXISTS join, drop
+    # the ids this run already reported with one IN lookup per chunk
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(PaymentArchive.id, PaymentArchive.provider_payment_id)
+            .where(
+                PaymentArchive.provider == provider,
+                PaymentArchive.status.in_(SETTLED_STATUSES),
+                PaymentArchive.created_at >= run.date_from,
+                PaymentArchive.created_at < run.date_to,
+                PaymentArchive.id > last_id,
+            )
+            .order_by(PaymentArchive.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        seen = set(db.session.scalars(
+            select(ReconciliationItem.payment_id).where(
+                ReconciliationItem.run_id == run.id,
+                ReconciliationItem.payment_id.in_([r.id for r in rows]),
+            )
+        ))
+        orphans = [r for r in rows if r.id not in seen]
+        if orphans:
+            _insert_orphans(run, orphans)
+        last_id = rows[-1].id
+
+
+def _insert_orphans(run: ReconciliationRun, rows):
+    db.session.execute(insert(ReconciliationItem), [
+        {
+            "run_id": run.id,
+            "outcome": ReconciliationOutcome.orphan,
+            "payment_id": r.id,
+            "provider_payment_id": r.provider_payment_id,
+        }
+        for r in rows
+    ])
+    run.orphans += len(rows)
+    db.session.commit()
+
+
+def reconcile_settlement(run: ReconciliationRun, stream, chunk_size: int) -> ReconciliationRun:
+    """
+    Stream a settlement CSV (text file object) against payments.
+    Rows are read and matched chunk_size at a time, each chunk committed
+    with its report rows, so memory depends on chunk_size, not file size.
+    """
+    provider = PaymentProvider(run.provider)
+    reader = csv.DictReader(stream)
+    missing_cols = {"provider_payment_id", "amount", "currency", "status"} - set(reader.fieldnames or ())
+    if missing_cols:
+        raise SettlementFileError(f"Missing columns: {', '.join(sorted(missing_cols))}")
+
+    rows = enumerate(reader, start=2)  # line 1 is the header
+    while True:
+        chunk = [_parse_row(n, row) for n, row in itertools.islice(rows, chunk_size)]
+        if not chunk:
+            break
+        _match_chunk(run, provider, chunk)
+        db.session.commit()
+
+    _record_orphans(run, provider, chunk_size)
+    run.status = ReconciliationRunStatus.completed
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    return run
+
+
+def run_reconciliation(run_id: int, path: str, remove_file: bool = False):
+    """Execute a queued run from a file on disk; failures are stored on the run."""
+    run = db.session.get(ReconciliationRun, run_id)
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reconcile_settlement(run, f, current_app.config["RECONCILIATION_CHUNK_SIZE"])
+    except Exception as e:
+        db.session.rollback()
+        log.exception("reconciliation run %s failed", run_id)
+        run = db.session.get(ReconciliationRun, run_id)
+        run.status = ReconciliationRunStatus.failed
+        run.error = str(e)[:1000]
+        run.finished_at = datetime.utcnow()
+        db.session.commit()
+    finally:
+        if remove_file and os.path.exists(path):
+            os.remove(path)
+    return run
+
+
+# --- background execution for uploads (one run at a time per process) ---
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit_reconciliation(run_id: int, path: str):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reconciliation")
+    app = current_app._get_current_object()
+
+    def task():
+        with app.app_context():
+            run_reconciliation(run_id, path, remove_file=True)
+
+    return _executor.submit(task)
@@ -0,0 +1,106 @@
+import csv
+import math
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# Courier route planning, no external geocoding:
+# - locality coordinates come from the bundled app/data/localities.csv
+# - orders are split into capacity sized batches with a sweep around the
+#   depot (polar angle, then distance), which keeps neighbouring
+#   localities in the same batch
+# - stops inside a batch are ordered nearest-neighbour from the depot
+#   on a vectorized distance matrix
+
+LOCALITIES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "localities.csv")
+EARTH_RADIUS_KM = 6371.0
+
+
+@lru_cache(maxsize=1)
+def locality_table() -> tuple[dict, np.ndarray]:
+    """({normalized name or alias: row}, coords[row] = (lat, lon))."""
+    names, coords = {}, []
+    with open(LOCALITIES_PATH, newline="", encoding="utf-8") as f:
+        for row_no, row in enumerate(csv.DictReader(f)):
+            coords.append((float(row["lat"]), float(row["lon"])))
+            for name in [row["locality"], *filter(None, row["aliases"].split("|"))]:
+                names[_normalize(name)] = row_no
+    return names, np.array(coords, dtype=np.float64)
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def resolve_locality(address: str) -> int | None:
+    """Row in the locality table for a free text address, else None."""
+    names, _ = locality_table()
+    parts = [_normalize(p) for p in address.split(",")]
+    for part in reversed(parts):  # "street, city" -> try the city first
+        if part in names:
+            return names[part]
+    text = f" {_normalize(address)} "
+    # longest names first so "kiryat gat" wins over "gat"
+    for name in sorted(names, key=len, reverse=True):
+        if f" {name} " in text:
+            return names[name]
+    return None
+
+
+def to_plane_km(latlon: np.ndarray, origin: tuple[float, float]) -> np.ndarray:
+    """Equirectangular projection around origin; accurate enough at city scale."""
+    lat0 = math.radians(origin[0])
+    rad = np.radians(latlon - np.asarray(origin))
+    x = rad[:, 1] * math.cos(lat0) * EARTH_RADIUS_KM
+    y = rad[:, 0] * EARTH_RADIUS_KM
+    return np.column_stack((x, y))
+
+
+def distance_matrix(points: np.ndarray) -> np.ndarray:
+    diff = points[:, None, :] - points[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def sweep_batches(points: np.ndarray, capacity: int) -> list[np.ndarray]:
+    """Split point indices into batches of at most capacity, sweeping around (0, 0)."""
+    if len(points) == 0:
+        return []
+    angle = np.arctan2(points[:, 1], points[:, 0])
+    radius = np.hypot(points[:, 0], points[:, 1])
+    # lexsort: last key is primary -> by angle, then distance from the depot
+    order = np.lexsort((radius, np.round(angle, 3)))
+    n_batches = math.ceil(len(points) / capacity)
+    return np.array_split(order, n_batches)
+
+
+def order_stops(points: np.ndarray) -> tuple[np.ndarray, float]:
+    """Nearest-neighbour tour from the depot (0, 0); returns (order, km incl. return)."""
+    n = len(points)
+    all_points = np.vstack((np.zeros((1, 2)), points))
+    dist = distance_matrix(all_points)
+    visited = np.zeros(n + 1, dtype=bool)
+    visited[0] = True
+    current, tour, total = 0, [], 0.0
+    for _ in range(n):
+        row = np.where(visited, np.inf, dist[current])
+        nxt = int(np.argmin(row))
+        total += row[nxt]
+        visited[nxt] = True
+        tour.append(nxt - 1)
+        current = nxt
+    total += dist[current, 0]
+    return np.array(tour, dtype=np.int64), float(total)
+
+
+def plan(latlon: np.ndarray, depot: tuple[float, float], capacity: int) -> list[tuple[np.ndarray, float]]:
+    """
+    latlon: (n, 2) order coordinates. Returns [(order indices in stop order, km)].
+    """
+    points = to_plane_km(latlon, depot)
+    routes = []
+    for batch in sweep_batches(points, capacity):
+        tour, km = order_stops(points[batch])
+        routes.append((batch[tour], km))
+    return routes
@@ -0,0 +1,208 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import mysql, sqlite, postgresql
+
+from ..extensions import db
+from ..models.order import Order, DeliveryStatus, PaymentStatus
+from ..models.order_archive import OrderArchive
+from ..models.product import product_categories
+from ..models.sales_rollup import SalesDailyProduct, SalesDailyCategory
+
+METRICS = ("units", "gross_amount", "captured_amount", "refunded_amount")
+
+# Every metric is bucketed by the ORDER's day, so a cancel or refund
+# nets out against the sale it belongs to and a rebuild from history
+# reproduces the incremental numbers exactly (a payment counts as
+# captured, and its refund as refunded, only once captured_at is set).
+
+
+def _upsert_add(model, key_names, rows):
+    """INSERT ... ON DUPLICATE KEY / ON CONFLICT: add deltas to existing counters."""
+    if not rows:
+        return
+    dialect = db.session.get_bind(mapper=model.__mapper__).dialect.name
+    now = datetime.utcnow()
+    rows = [{**r, "updated_at": now} for r in rows]
+    if dialect == "mysql":
+        stmt = mysql.insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            updated_at=stmt.inserted.updated_at,
+            **{m: getattr(model, m) + getattr(stmt.inserted, m) for m in METRICS},
+        )
+    else:
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key_names),
+            set_={
+                "updated_at": stmt.excluded.updated_at,
+                **{m: getattr(model, m) + getattr(stmt.excluded, m) for m in METRICS},
+            },
+        )
+    db.session.execute(stmt)
+
+
+def _allocate(amount: int, weights: dict) -> dict:
+    """Split an order-level amount over products proportionally (exact sum)."""
+    total = sum(weights.values())
+    if not total:
+        return {}
+    shares, given = {}, 0
+    keys = list(weights)
+    for k in keys[:-1]:
+        shares[k] = amount * weights[k] // total
+        given += shares[k]
+    shares[keys[-1]] = amount - given
+    return shares
+
+
+def _line_totals(order) -> dict:
+    totals = defaultdict(int)
+    for item in order.items:
+        totals[item.product_id] += item.unit_amount * item.quantity
+    return totals
+
+
+def order_deltas(order, sign: int = 1, captured: int = 0, refunded: int = 0, sale: bool = True) -> dict:
+    """
+    Per-product deltas for one order event:
+    - sale: units and gross from the order lines (times sign)
+    - captured / refunded: payment amounts split over the lines
+    """
+    deltas = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    if sale:
+        for item in order.items:
+            d = deltas[item.product_id]
+            d["units"] += sign * item.quantity
+            d["gross_amount"] += sign * item.unit_amount * item.quantity
+    weights = _line_totals(order)
+    for pid, share in _allocate(captured, weights).items():
+        deltas[pid]["captured_amount"] += share
+    for pid, share in _allocate(refunded, weights).items():
+        deltas[pid]["refunded_amount"] += share
+    return deltas
+
+
+def apply_deltas(by_day: dict):
+    """by_day: {day: {product_id: {metric: delta}}} -> product + category rollups."""
+    product_ids = {pid for per_product in by_day.values() for pid in per_product}
+    if not product_ids:
+        return
+    categories = defaultdict(list)
+    for pid, cid in db.session.execute(
+        select(product_categories.c.product_id, product_categories.c.category_id)
+        .where(product_categories.c.product_id.in_(product_ids))
+    ):
+        categories[pid].append(cid)
+
+    product_rows, category_acc = [], defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for day, per_product in by_day.items():
+        for pid, d in per_product.items():
+            if not any(d.values()):
+                continue
+            product_rows.append({"day": day, "product_id": pid, **d})
+            for cid in categories[pid]:
+                acc = category_acc[(day, cid)]
+                for m in METRICS:
+                    acc[m] += d[m]
+    category_rows = [
+        {"day": day, "category_id": cid, **acc}
+        for (day, cid), acc in category_acc.items()
+    ]
+    _upsert_add(SalesDailyProduct, ("day", "product_id"), product_rows)
+    _upsert_add(SalesDailyCategory, ("day", "category_id"), category_rows)
+
+
+def _order_day(order) -> date:
+    return (order.created_at or datetime.utcnow()).date()
+
+
+# --- incremental hooks (call inside the transaction that changes the order) ---
+def record_checkout(order):
+    apply_deltas({_order_day(order): order_deltas(order)})
+
+
+def record_cancel(order):
+    apply_deltas({_order_day(order): order_deltas(order, sign=-1)})
+
+
+def record_capture(order, amount: int):
+    apply_deltas({_order_day(order): order_deltas(order, captured=amount, sale=False)})
+
+
+def record_refund(order, amount: int):
+    apply_deltas({_order_day(order): order_deltas(order, refunded=amount, sale=False)})
+
+
+# --- backfill ---
+def _history_deltas(order) -> dict:
+    # mirrors transition_payment: a refund only nets out a captured payment
+    captured = [p for p in order.payments if p.captured_at is not None]
+    return order_deltas(
+        order,
+        captured=sum(p.amount for p in captured),
+        refunded=sum(p.amount for p in captured if p.status == PaymentStatus.refunded),
+        sale=order.delivery_status != DeliveryStatus.canceled,
+    )
+
+
+def _rebuild_day(day: date, chunk_size: int) -> int:
+    """
+    Recompute one day in a single transaction. The DELETE comes first: it
+    locks the day's rollup rows (and, on InnoDB, the gaps between them), so
+    a checkout or payment change for this day either committed before it
+    and is read below, or waits and adds its delta after the commit.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+    db.session.execute(delete(SalesDailyProduct).where(SalesDailyProduct.day == day))
+    db.session.execute(delete(SalesDailyCategory).where(SalesDailyCategory.day == day))
+
+    processed = 0
+    for model in (Order, OrderArchive):
+        last_id = 0
+        while True:
+            orders = (
+                model.query
+                .filter(model.created_at >= start, model.created_at < end, model.id > last_id)
+                .order_by(model.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not orders:
+                break
+            per_product = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+            for order in orders:
+                for pid, d in _history_deltas(order).items():
+                    for m in METRICS:
+                        per_product[pid][m] += d[m]
+            last_id = orders[-1].id
+            apply_deltas({day: per_product})
+            db.session.expunge_all()
+            processed += len(orders)
+    db.session.commit()
+    return processed
+
+
+def rebuild_rollups(date_from: date, date_to: date, chunk_size: int = 1000, echo=None) -> int:
+    """
+    Recompute rollups for [date_from, date_to) from hot + archived orders,
+    one day per transaction (see _rebuild_day), reading orders in id chunks
+    so memory is bounded by chunk_size.
+    """
+    processed = 0
+    day = date_from
+    while day < date_to:
+        n = _rebuild_day(day, chunk_size)
+        processed += n
+        if echo and n:
+            echo(f"{day.isoformat()}: {processed} orders")
+        day += timedelta(days=1)
+    return processed
+
+
+def default_backfill_range() -> tuple[date, date]:
+    today = datetime.utcnow().date()
+    return today - timedelta(days=365), today + timedelta(days=1)
@@ -0,0 +1,49 @@
+import atexit
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicJob:
+    """
+    Runs fn() inside an app context every `interval` seconds
+    on a daemon thread. interval <= 0 disables the job.
+    """
+
+    def __init__(self, app, name: str, interval: float, fn):
+        self.app = app
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self._stopped = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def trigger(self):
+        """Run as soon as possible instead of waiting for the interval."""
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                with self.app.app_context():
+                    self.fn()
+            except Exception:
+                log.exception("%s failed; will retry next interval", self.name)
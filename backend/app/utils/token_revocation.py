@@ -0,0 +1,191 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db, jwt
+from ..models.revoked_token import RevokedToken
+from .principal_cache import principal_cache
+
+# Logout / token revocation:
+# - revoked jtis are stored until the token would have expired anyway
+# - every authenticated request asks is_revoked(); the answer comes from
+#   memory: a set of recent revocations, then a Bloom filter over the
+#   whole store, so the common "not revoked" case never touches the DB
+# - a Bloom hit (revoked, or a rare false positive) is confirmed in the DB
+# - the filter is built by init_app and the refresh job, never on a request
+# - revocations made in this process apply at once; other processes pick
+#   them up on the next refresh (REVOCATION_REFRESH_INTERVAL)
+# - "log out everywhere" bumps the user's token version; the loader also
+#   rejects tokens with an old "ver" claim on routes that never call
+#   get_current_user
+
+
+class BloomFilter:
+    """Fixed-size bit array, k positions per key by double hashing one blake2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class TokenRevocations:
+    """
+    In-memory view of revoked_tokens:
+      - _bloom:  every jti in the store at the last rebuild
+      - _recent: jti -> noted_at for revocations seen since (exact)
+    refresh() pulls rows above the id watermark; a full rebuild (every
+    REVOCATION_REBUILD_INTERVAL, or when _recent grows past
+    REVOCATION_RECENT_MAX) purges expired rows and starts a fresh filter.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()          # swaps of the structures below
+        self._refresh_lock = threading.Lock()  # one rebuild / refresh at a time
+        self._bloom = None
+        self._recent = {}
+        self._watermark = 0
+        self._built_at = 0.0
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.recent_max = 10000
+        self.rebuild_interval = 600.0
+
+    def init_app(self, app):
+        cfg = app.config
+        self.capacity = cfg["REVOCATION_BLOOM_CAPACITY"]
+        self.error_rate = cfg["REVOCATION_BLOOM_ERROR_RATE"]
+        self.recent_max = cfg["REVOCATION_RECENT_MAX"]
+        self.rebuild_interval = cfg["REVOCATION_REBUILD_INTERVAL"]
+        app.extensions["token_revocations"] = self
+        jwt.token_in_blocklist_loader(_token_in_blocklist)
+        # first build here, not on a request's session (it purges and commits)
+        with app.app_context():
+            self.refresh()
+
+    # --- hot path ---
+    def is_revoked(self, claims: dict) -> bool:
+        jti = claims.get("jti")
+        if not jti:
+            return False
+        bloom = self._bloom
+        if jti in self._recent:
+            return True
+        if bloom is not None and jti not in bloom:
+            return False
+        # revoked before the last rebuild, a false positive, or no filter yet
+        # (the job builds it; requests only read): the store decides
+        revoked = db.session.execute(select(RevokedToken.id).where(RevokedToken.jti == jti)).first() is not None
+        if revoked:
+            self._note(jti)
+        return revoked
+
+    # --- logout ---
+    def revoke(self, claims: dict, user_id: int) -> bool:
+        """Store the token's jti until its expiry. Commits. False if already expired."""
+        expires_at = datetime.utcfromtimestamp(claims["exp"])
+        if expires_at <= datetime.utcnow():
+            return False
+        db.session.add(RevokedToken(
+            jti=claims["jti"],
+            token_type=claims.get("type", "access"),
+            user_id=user_id,
+            expires_at=expires_at,
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # revoked twice
+        self._note(claims["jti"])
+        return True
+
+    def _note(self, jti: str):
+        with self._lock:
+            self._recent[jti] = time.monotonic()
+
+    # --- refresh from the store ---
+    def refresh(self):
+        with self._refresh_lock:
+            if (
+                self._bloom is None
+                or time.monotonic() - self._built_at > self.rebuild_interval
+                or len(self._recent) > self.recent_max
+            ):
+                self._rebuild()
+                return
+            rows = db.session.execute(
+                select(RevokedToken.id, RevokedToken.jti)
+                .where(RevokedToken.id > self._watermark)
+                .order_by(RevokedToken.id)
+            ).all()
+            if not rows:
+                return
+            noted_at = time.monotonic()
+            with self._lock:
+                for row in rows:
+                    self._recent.setdefault(row.jti, noted_at)
+            self._watermark = rows[-1].id
+
+    def _rebuild(self):
+        started = time.monotonic()
+        db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at <= datetime.utcnow()))
+        db.session.commit()
+        rows = db.session.execute(select(RevokedToken.id, RevokedToken.jti)).all()
+
+        bloom = BloomFilter(max(self.capacity, 2 * len(rows)), self.error_rate)
+        for row in rows:
+            bloom.add(row.jti)
+        with self._lock:
+            # noted while we were reading: may be missing from the snapshot
+            recent = {jti: at for jti, at in self._recent.items() if at >= started}
+            self._bloom, self._recent = bloom, recent
+        # ids committed out of order behind the watermark are caught by the next rebuild
+        self._watermark = max(self._watermark, max((row.id for row in rows), default=0))
+        self._built_at = started
+
+    def stats(self) -> dict:
+        return {
+            "recent": len(self._recent),
+            "bloom_bits": self._bloom.size if self._bloom else 0,
+            "bloom_hashes": self._bloom.hashes if self._bloom else 0,
+            "watermark": self._watermark,
+        }
+
+
+token_revocations = TokenRevocations()
+
+
+def _token_in_blocklist(jwt_header: dict, jwt_payload: dict) -> bool:
+    if token_revocations.is_revoked(jwt_payload):
+        return True
+    version = jwt_payload.get("ver")
+    if version is None:
+        return False
+    try:
+        principal = principal_cache.get(int(jwt_payload["sub"]))
+    except (KeyError, TypeError, ValueError):
+        return False  # get_current_user answers for a bad identity
+    return principal is not None and principal.token_version != version
+
+
+def refresh_revocations():
+    """Periodic job: pick up revocations from other processes, rebuild now and then."""
+    token_revocations.refresh()
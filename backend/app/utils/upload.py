@@ -5,39 +5,41 @@ from flask import current_app
 from werkzeug.utils import secure_filename
 
 ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP"}
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
 class UploadError(Exception):
     pass
-def upload_image(file, folder: str) -> str:
+def inspect_image(file) -> tuple[str, int, int]:
     """
-    Multer-like image uploader
-    - validates image
-    - saves it
-    - returns storage_key
+    Cheap validation: reads the header only (no pixel decode)
+    - returns (format, width, height)
     """
     if not file or file.filename == "":
         raise UploadError("No file provided")
-    # 1️⃣ Validate image using Pillow
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    if size > current_app.config["IMAGE_MAX_FILE_BYTES"]:
+        raise UploadError("Image file is too large")
     try:
-        img = Image.open(file)
-        img.verify()
-        img_format = img.format
-        file.seek(0)
+        with Image.open(file) as img:
+            img_format, (width, height) = img.format, img.size
     except Exception:
         raise UploadError("Invalid image file")
+    finally:
+        file.seek(0)
     if img_format not in ALLOWED_FORMATS:
         raise UploadError("Unsupported image format")
-    # 2️⃣ Prepare filesystem
-    upload_dir = os.path.join(
-        current_app.config["UPLOAD_FOLDER"],
-        folder
-    )
+    if width * height > current_app.config["IMAGE_MAX_PIXELS"]:
+        raise UploadError("Image dimensions are too large")
+    return img_format, width, height
+def save_original(file, folder: str) -> str:
+    """
+    Validate (header only) and store the upload as-is
+    - returns storage_key; renditions are made later (utils/image_pipeline.py)
+    """
+    img_format, _, _ = inspect_image(file)
+    upload_dir = os.path.join(current_app.config["UPLOAD_FOLDER"], folder)
     os.makedirs(upload_dir, exist_ok=True)
-    # 3️⃣ Generate filename
-    filename = secure_filename(f"{uuid.uuid4()}.webp")
-    file_path = os.path.join(upload_dir, filename)
-    # 4️⃣ Convert + save (normalized)
-    img = Image.open(file).convert("RGB")
-    img.thumbnail((1200, 1200))
-    img.save(file_path, "WEBP", quality=85, optimize=True)
-    # 5️⃣ Return storage key (DB-safe)
+    filename = secure_filename(f"{uuid.uuid4()}.{EXTENSIONS[img_format]}")
+    file.save(os.path.join(upload_dir, filename))
     return f"{folder}/{filename}"
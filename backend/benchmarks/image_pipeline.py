@@ -0,0 +1,110 @@
+"""
+Image upload / rendition benchmark (files in a temp dir, no DB / HTTP).
+
+    cd backend
+    python -m benchmarks.image_pipeline --images 16 --workers 2
+
+Uses a synthetic 4000x3000 photo-like JPEG. Reports:
+  - time in the request: the synchronous upload_image (decode, one
+    1200px WebP) against the header-only check + raw save
+  - rendition cost per image: four renditions each from a full decode,
+    against one reduced-scale decode scaled down largest-first
+  - images per second through the process pool
+"""
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from flask import Flask, current_app
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.utils.image_pipeline import parse_renditions, render_renditions
+from app.utils.process_pool import new_pool
+from app.utils.upload import inspect_image, save_original
+
+SIZES = parse_renditions("thumb:160,card:480,detail:1200,zoom:2400")
+
+
+def make_jpeg(width=4000, height=3000) -> bytes:
+    r = Image.linear_gradient("L").resize((width, height))
+    g = Image.radial_gradient("L").resize((width, height))
+    b = Image.effect_noise((width, height), 40)
+    out = io.BytesIO()
+    Image.merge("RGB", (r, g, b)).save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+def upload_image(file, folder: str) -> str:
+    """The former synchronous upload: decode and write one 1200px WebP in the request."""
+    inspect_image(file)
+    upload_dir = os.path.join(current_app.config["UPLOAD_FOLDER"], folder)
+    os.makedirs(upload_dir, exist_ok=True)
+    key = f"{folder}/{uuid.uuid4()}.webp"
+    with Image.open(file) as img:
+        img.draft("RGB", (1200, 1200))
+        img = img.convert("RGB")
+    img.thumbnail((1200, 1200))
+    img.save(os.path.join(current_app.config["UPLOAD_FOLDER"], key), "WEBP", quality=85, optimize=True)
+    return key
+
+
+def naive_renditions(root, key, sizes, quality):
+    for name, px in sizes:
+        with Image.open(os.path.join(root, key)) as img:
+            img = img.convert("RGB")
+        img.thumbnail((px, px), Image.LANCZOS)
+        img.save(os.path.join(root, f"{key}-{name}-naive.webp"), "WEBP", quality=quality, method=4)
+
+
+def per_call_ms(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--quality", type=int, default=82)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    app = Flask(__name__)
+    app.config.update(UPLOAD_FOLDER=root, IMAGE_MAX_FILE_BYTES=50 * 1024 * 1024, IMAGE_MAX_PIXELS=40_000_000)
+    data = make_jpeg()
+    print(f"source: 4000x3000 JPEG, {len(data) / 1024:.0f} KiB, {args.images} images")
+
+    def upload(fn):
+        return lambda i: fn(FileStorage(io.BytesIO(data), filename=f"{i}.jpg"), "bench")
+
+    try:
+        with app.app_context():
+            old = per_call_ms(upload(upload_image), min(args.images, 4))
+            new = per_call_ms(upload(save_original), args.images)
+            keys = [save_original(FileStorage(io.BytesIO(data), filename="x.jpg"), "bench") for _ in range(args.images)]
+        print(f"in the request: upload_image {old:7.1f} ms   header check + save {new:6.1f} ms")
+
+        n = min(args.images, 4)
+        naive = per_call_ms(lambda i: naive_renditions(root, keys[i], SIZES, args.quality), n)
+        single = per_call_ms(lambda i: render_renditions(root, keys[i], SIZES, args.quality), n)
+        print(f"4 renditions:   full decode each {naive:7.1f} ms   one draft decode {single:7.1f} ms")
+
+        with new_pool(args.workers) as pool:  # same start method as the app's pool
+            list(pool.map(render_renditions, [root], [keys[0]], [SIZES], [args.quality]))  # warm up
+            start = time.perf_counter()
+            list(pool.map(render_renditions, [root] * len(keys), keys, [SIZES] * len(keys), [args.quality] * len(keys)))
+            elapsed = time.perf_counter() - start
+        print(f"pool ({args.workers} workers): {len(keys) / elapsed:.1f} images/s")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Login (password verify) throughput benchmark, no DB / HTTP.
+
+    cd backend
+    python -m benchmarks.password_hashing --workers 4 --clients 16 --seconds 5
+    python -m benchmarks.password_hashing --method pbkdf2:sha256:600000
+
+Verifies one stored hash from `clients` request threads, first inline on
+those threads, then through the password hasher's process pool, and
+reports logins per second and per core. Inline threads share the GIL
+for everything around the hash; the pool spreads the work over
+`workers` processes and keeps request threads free to serve other routes.
+"""
+import argparse
+import os
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from app.utils.password_hashing import PasswordHasher, PasswordHasherBusy
+
+
+def run(hasher, stored, clients, seconds):
+    done, busy = [0], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        n = b = 0
+        while time.perf_counter() < deadline:
+            try:
+                assert hasher.verify(stored, "correct horse")
+                n += 1
+            except PasswordHasherBusy:
+                b += 1
+                time.sleep(0.01)
+        with lock:
+            done[0] += n
+            busy[0] += b
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return done[0] / (time.perf_counter() - start), busy[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--max-pending", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    stored = generate_password_hash("correct horse", method=args.method)
+    print(f"method={args.method} cores={cores} clients={args.clients}")
+
+    inline = PasswordHasher()
+    rate, _ = run(inline, stored, args.clients, args.seconds)
+    print(f"inline:            {rate:7.1f} logins/s  ({rate / cores:.1f} per core)")
+
+    pooled = PasswordHasher()
+    pooled.workers, pooled.max_pending, pooled.timeout = args.workers, args.max_pending, 10
+    pooled.verify(stored, "correct horse")  # start the workers outside the timing
+    rate, busy = run(pooled, stored, args.clients, args.seconds)
+    pooled.shutdown()
+    print(f"pool ({args.workers} workers): {rate:7.1f} logins/s  ({rate / min(args.workers, cores):.1f} per core)"
+          f"  rejected busy: {busy}")
+
+
+if __name__ == "__main__":
+    main()
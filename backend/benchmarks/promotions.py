@@ -0,0 +1,111 @@
+"""
+Promotion evaluation benchmark: 10k active rules, 50-line carts (in memory, no DB).
+
+    cd backend
+    python -m benchmarks.promotions --rules 10000 --lines 50 --carts 2000
+
+Compares the indexed evaluation (rules looked up by the lines' products /
+categories) with scanning every rule for every line.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.models.promotion import PromotionKind, PromotionScope
+from app.utils.promotions import RuleIndex, compile_rule, evaluate
+
+
+def make_rules(n_rules, n_products, n_categories, rng):
+    rules = []
+    for i in range(1, n_rules + 1):
+        roll = rng.random()
+        if roll < 0.01:
+            scope, kind = PromotionScope.basket, PromotionKind.basket_threshold
+        elif roll < 0.2:
+            scope, kind = PromotionScope.category, PromotionKind.percent_off
+        else:
+            scope = PromotionScope.product
+            kind = rng.choice([PromotionKind.percent_off, PromotionKind.fixed_off, PromotionKind.buy_x_get_y])
+        p = SimpleNamespace(
+            id=i, version=1, kind=kind, scope=scope,
+            percent=rng.randint(5, 30) if kind != PromotionKind.fixed_off else None,
+            amount_off=rng.randint(10, 200) if kind == PromotionKind.fixed_off else None,
+            buy_qty=2, get_qty=1, min_subtotal=rng.randint(5000, 50000),
+            max_discount=None, priority=0, starts_at=None, ends_at=None,
+        )
+        if kind == PromotionKind.basket_threshold:
+            p.percent = None
+            p.amount_off = rng.randint(100, 1000)
+        products = [rng.randint(1, n_products) for _ in range(rng.randint(1, 5))] if scope == PromotionScope.product else []
+        categories = [rng.randint(1, n_categories)] if scope == PromotionScope.category else []
+        rules.append((compile_rule(p), scope, products, categories))
+    return rules
+
+
+def naive(rules, lines, categories_by_product, now):
+    """Every rule checked against every line (what an unindexed engine does)."""
+    total = 0
+    for product_id, unit, qty in lines:
+        cats = set(categories_by_product.get(product_id, ()))
+        best = 0
+        for rule, scope, products, categories in rules:
+            if scope == PromotionScope.basket or not rule.active(now):
+                continue
+            if product_id in products or cats.intersection(categories):
+                best = max(best, rule.line_discount(unit, qty))
+        total += best
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, default=10000)
+    parser.add_argument("--lines", type=int, default=50)
+    parser.add_argument("--carts", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--categories", type=int, default=300)
+    parser.add_argument("--naive-carts", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rules = make_rules(args.rules, args.products, args.categories, rng)
+    start = time.perf_counter()
+    index = RuleIndex()
+    for rule, scope, products, categories in rules:
+        index.add(rule, scope, products, categories)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    categories_by_product = {
+        pid: [rng.randint(1, args.categories) for _ in range(rng.randint(1, 2))]
+        for pid in range(1, args.products + 1)
+    }
+    carts = [
+        [(pid, rng.randint(100, 5000), rng.randint(1, 6))
+         for pid in rng.sample(range(1, args.products + 1), args.lines)]
+        for _ in range(args.carts)
+    ]
+    now = datetime.utcnow()
+
+    timings = []
+    for lines in carts:
+        start = time.perf_counter()
+        evaluate(index, lines, categories_by_product, now)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    start = time.perf_counter()
+    for lines in carts[:args.naive_carts]:
+        naive(rules, lines, categories_by_product, now)
+    naive_ms = (time.perf_counter() - start) * 1000 / args.naive_carts
+
+    print(f"rules={args.rules} lines/cart={args.lines} carts={args.carts} index build={build_ms:.1f}ms")
+    print(f"indexed: mean={statistics.mean(timings):.3f}ms p50={timings[len(timings) // 2]:.3f}ms "
+          f"p99={timings[int(len(timings) * 0.99) - 1]:.3f}ms ({1000 / statistics.mean(timings):.0f} carts/s)")
+    print(f"full scan: mean={naive_ms:.1f}ms per cart ({args.naive_carts} carts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Load benchmark for the payment provider client against the bundled fake PSP.
+
+    cd backend
+    python -m benchmarks.psp_client --calls 2000 --concurrency 32 --latency-ms 20
+    python -m benchmarks.psp_client --pool-size 0      # no keep-alive, for comparison
+    python -m benchmarks.psp_client --failure-rate 0.05 # retries + breaker under errors
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from app.models.order import PaymentStatus
+from app.utils.fake_psp import serve_in_thread
+from app.utils.payment_providers import CardAdapter, ProviderClient, ProviderError
+from config import Config
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    parser.add_argument("--pool-size", type=int, default=Config.PSP_POOL_SIZE)
+    args = parser.parse_args()
+
+    server, psp, base_url = serve_in_thread(latency_ms=args.latency_ms, failure_rate=args.failure_rate)
+    cfg = {k: getattr(Config, k) for k in dir(Config) if k.startswith("PSP_")}
+    cfg["PSP_POOL_SIZE"] = args.pool_size
+    adapter = CardAdapter(ProviderClient(base_url, "bench", cfg))
+
+    def one(i):
+        payment = SimpleNamespace(id=i, order_id=i, amount=1000 + i, currency="ILS")
+        start = time.perf_counter()
+        try:
+            ok = adapter.authorize(payment).status == PaymentStatus.authorized
+        except ProviderError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(1, args.calls + 1)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    ok = sum(1 for r in results if r[1])
+    print(f"calls={args.calls} concurrency={args.concurrency} pool_size={args.pool_size}")
+    print(f"throughput={args.calls / elapsed:.0f}/s ok={ok} failed={args.calls - ok} "
+          f"server_requests={psp.requests} breaker={adapter.client.breaker.state}")
+    print(f"latency ms: p50={statistics.median(latencies):.1f} "
+          f"p95={latencies[int(len(latencies) * 0.95) - 1]:.1f} p99={latencies[int(len(latencies) * 0.99) - 1]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Route planning benchmark: 10k pending orders (in memory, no DB).
+
+    cd backend
+    python -m benchmarks.route_planner --orders 10000 --capacity 5
+
+Orders get addresses in the bundled localities (plus a little jitter so
+stops inside a town differ). Reports address resolution and planning
+time, and the total route length against batching orders in arrival
+order (what claiming one order at a time amounts to).
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.utils.route_planner import locality_table, order_stops, plan, resolve_locality, to_plane_km
+
+DEPOT = (32.0853, 34.7818)
+
+
+def make_addresses(n_orders, rng):
+    names, coords = locality_table()
+    by_row = {}
+    for name, row in names.items():
+        by_row.setdefault(row, name.title())
+    rows = list(by_row)
+    return [f"{rng.randint(1, 200)} Herzl St, {by_row[rng.choice(rows)]}" for _ in range(n_orders)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=10000)
+    parser.add_argument("--capacity", type=int, default=5)
+    parser.add_argument("--jitter-km", type=float, default=2.0)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    addresses = make_addresses(args.orders, rng)
+    _, coords = locality_table()
+
+    start = time.perf_counter()
+    resolved, rows = {}, []
+    for address in addresses:
+        if address not in resolved:
+            resolved[address] = resolve_locality(address)
+        rows.append(resolved[address])
+    resolve_s = time.perf_counter() - start
+
+    latlon = coords[rows] + np.random.default_rng(42).normal(0, args.jitter_km / 111, (args.orders, 2))
+
+    start = time.perf_counter()
+    routes = plan(latlon, DEPOT, args.capacity)
+    plan_s = time.perf_counter() - start
+    planned_km = sum(km for _, km in routes)
+
+    points = to_plane_km(latlon, DEPOT)
+    naive_km = sum(
+        order_stops(points[i:i + args.capacity])[1]
+        for i in range(0, args.orders, args.capacity)
+    )
+
+    print(f"orders={args.orders} capacity={args.capacity} routes={len(routes)}")
+    print(f"resolve: {resolve_s * 1000:.0f} ms   plan: {plan_s * 1000:.0f} ms")
+    print(f"total km: planned {planned_km:,.0f}   arrival order {naive_km:,.0f}"
+          f"   ({naive_km / planned_km:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
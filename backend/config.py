@@ -16,6 +16,10 @@ class Config:
         "sqlite:///app.db"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # closed orders archive (separate database optional)
+    SQLALCHEMY_BINDS = {
+        "archive": os.getenv("ARCHIVE_DATABASE_URI") or SQLALCHEMY_DATABASE_URI,
+    }
 
     # --- JWT ---
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-dev-secret")
@@ -29,5 +33,215 @@ class Config:
         os.path.join(BASE_DIR, "instance", "uploads")
     )
 
-    # Limit upload size (10MB)
-    MAX_CONTENT_LENGTH = 10 * 1024 * 1024
+    # Limit request size (whole multipart batch) and each image in it
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(64 * 1024 * 1024)))
+    IMAGE_MAX_FILE_BYTES = int(os.getenv("IMAGE_MAX_FILE_BYTES", str(10 * 1024 * 1024)))
+
+    # --- Cart storage ---
+    # "sql" = commit every cart write, "memory" = write-behind from memory
+    CART_STORE_BACKEND = os.getenv("CART_STORE_BACKEND", "sql")
+    # max seconds a cart change may stay only in memory
+    CART_STORE_FLUSH_INTERVAL = float(os.getenv("CART_STORE_FLUSH_INTERVAL", "2"))
+    CART_STORE_FLUSH_BATCH = int(os.getenv("CART_STORE_FLUSH_BATCH", "200"))
+    # flush early once this many carts are dirty
+    CART_STORE_MAX_DIRTY = int(os.getenv("CART_STORE_MAX_DIRTY", "1000"))
+
+    # --- Cart lifecycle sweeper ---
+    # seconds between background sweeps (0 = only via `flask sweep-carts`)
+    CART_SWEEP_INTERVAL = float(os.getenv("CART_SWEEP_INTERVAL", "900"))
+    CART_ABANDON_AFTER_HOURS = float(os.getenv("CART_ABANDON_AFTER_HOURS", "72"))
+    CART_SWEEP_BATCH = int(os.getenv("CART_SWEEP_BATCH", "500"))
+    CART_SWEEP_MAX_BATCHES = int(os.getenv("CART_SWEEP_MAX_BATCHES", "20"))
+
+    # --- Async checkout ---
+    # True = every checkout returns 202 + order intent (else opt in per
+    # request with `Prefer: respond-async`)
+    CHECKOUT_ASYNC = os.getenv("CHECKOUT_ASYNC", "false").lower() == "true"
+    # worker threads in this process (0 = enqueue only)
+    CHECKOUT_WORKERS = int(os.getenv("CHECKOUT_WORKERS", "4"))
+    CHECKOUT_POLL_INTERVAL = float(os.getenv("CHECKOUT_POLL_INTERVAL", "1"))
+    CHECKOUT_DISPATCH_BATCH = int(os.getenv("CHECKOUT_DISPATCH_BATCH", "100"))
+    # processing intents older than this are considered crashed and requeued
+    CHECKOUT_INTENT_LEASE = float(os.getenv("CHECKOUT_INTENT_LEASE", "60"))
+    # max long-poll seconds for GET /intents/<id>?wait=
+    CHECKOUT_MAX_WAIT = float(os.getenv("CHECKOUT_MAX_WAIT", "25"))
+    # long-poll re-read interval for intents processed by another process
+    CHECKOUT_WAIT_POLL = float(os.getenv("CHECKOUT_WAIT_POLL", "0.2"))
+
+    # --- Idempotency-Key (checkout, payment creation) ---
+    IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+    # how long a duplicate waits for the first in-flight request
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+    # an in_progress key whose owner has not finished within this many
+    # seconds (crashed) can be taken over by a retry
+    IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+    IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+    IDEMPOTENCY_PURGE_BATCH = int(os.getenv("IDEMPOTENCY_PURGE_BATCH", "1000"))
+
+    # --- Order archival (hot/cold) ---
+    ORDER_ARCHIVE_AFTER_DAYS = float(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90"))
+    ORDER_ARCHIVE_INTERVAL = float(os.getenv("ORDER_ARCHIVE_INTERVAL", "3600"))
+    ORDER_ARCHIVE_BATCH = int(os.getenv("ORDER_ARCHIVE_BATCH", "500"))
+    ORDER_ARCHIVE_MAX_BATCHES = int(os.getenv("ORDER_ARCHIVE_MAX_BATCHES", "20"))
+
+    # --- CSV exports ---
+    # parent rows (orders / payments) per read transaction
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+    # --- Outbox (order / payment events for downstream systems) ---
+    # comma separated: memory (in-process subscribers), file, http
+    OUTBOX_SINKS = os.getenv("OUTBOX_SINKS", "memory")
+    OUTBOX_FILE_PATH = os.getenv("OUTBOX_FILE_PATH", "outbox_events.jsonl")
+    OUTBOX_HTTP_URL = os.getenv("OUTBOX_HTTP_URL", "http://127.0.0.1:8765/events")
+    OUTBOX_HTTP_TIMEOUT = float(os.getenv("OUTBOX_HTTP_TIMEOUT", "5"))
+    OUTBOX_DISPATCH_INTERVAL = float(os.getenv("OUTBOX_DISPATCH_INTERVAL", "2"))
+    OUTBOX_BATCH = int(os.getenv("OUTBOX_BATCH", "200"))
+    OUTBOX_MAX_BATCHES = int(os.getenv("OUTBOX_MAX_BATCHES", "10"))
+    # ids skipped by the dispatcher (allocated, not yet committed) are re-checked this
+    # long before they count as rolled back; keep it above the slowest transaction
+    OUTBOX_GAP_TIMEOUT = float(os.getenv("OUTBOX_GAP_TIMEOUT", "300"))
+    # failed batches back off RETRY_BASE * 2^n seconds, capped at RETRY_MAX
+    OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "2"))
+    OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "300"))
+    OUTBOX_RETENTION_HOURS = float(os.getenv("OUTBOX_RETENTION_HOURS", "72"))
+    OUTBOX_PURGE_INTERVAL = float(os.getenv("OUTBOX_PURGE_INTERVAL", "3600"))
+
+    # --- Payment provider webhooks ---
+    # shared secret for X-Webhook-Signature (empty = webhooks disabled)
+    PAYMENT_WEBHOOK_SECRET = os.getenv("PAYMENT_WEBHOOK_SECRET", "")
+    PAYMENT_WEBHOOK_MAX_EVENTS = int(os.getenv("PAYMENT_WEBHOOK_MAX_EVENTS", "500"))
+
+    # --- Settlement reconciliation ---
+    # settlement rows matched (and report rows written) per transaction
+    RECONCILIATION_CHUNK_SIZE = int(os.getenv("RECONCILIATION_CHUNK_SIZE", "1000"))
+    # uploaded settlement files wait here until processed (not under UPLOAD_FOLDER: that one is public)
+    RECONCILIATION_FOLDER = os.getenv(
+        "RECONCILIATION_FOLDER",
+        os.path.join(BASE_DIR, "instance", "settlements")
+    )
+
+    # --- Payment providers (outbound PSP calls) ---
+    # false = payments stay "created" until an admin PUT / webhook
+    PSP_ENABLED = os.getenv("PSP_ENABLED", "false").lower() == "true"
+    PSP_PAYPAL_URL = os.getenv("PSP_PAYPAL_URL", "http://127.0.0.1:8766")
+    PSP_PAYPAL_API_KEY = os.getenv("PSP_PAYPAL_API_KEY", "")
+    PSP_CARD_URL = os.getenv("PSP_CARD_URL", "http://127.0.0.1:8766")
+    PSP_CARD_API_KEY = os.getenv("PSP_CARD_API_KEY", "")
+    PSP_AUTO_CAPTURE = os.getenv("PSP_AUTO_CAPTURE", "true").lower() == "true"
+    # worker threads making provider calls (off the request thread)
+    PSP_WORKERS = int(os.getenv("PSP_WORKERS", "8"))
+    # idle keep-alive connections kept per provider
+    PSP_POOL_SIZE = int(os.getenv("PSP_POOL_SIZE", "10"))
+    PSP_CONNECT_TIMEOUT = float(os.getenv("PSP_CONNECT_TIMEOUT", "2"))
+    PSP_READ_TIMEOUT = float(os.getenv("PSP_READ_TIMEOUT", "5"))
+    # retries (timeouts, connection errors, 429, 5xx) with full-jitter backoff
+    PSP_MAX_RETRIES = int(os.getenv("PSP_MAX_RETRIES", "2"))
+    PSP_BACKOFF_BASE = float(os.getenv("PSP_BACKOFF_BASE", "0.2"))
+    PSP_BACKOFF_MAX = float(os.getenv("PSP_BACKOFF_MAX", "2"))
+    # consecutive failures that open the circuit, seconds before a trial call
+    PSP_BREAKER_THRESHOLD = int(os.getenv("PSP_BREAKER_THRESHOLD", "5"))
+    PSP_BREAKER_RESET = float(os.getenv("PSP_BREAKER_RESET", "30"))
+    # payments left "created" (authorize) or "authorized" (auto-capture) by a retryable
+    # failure are re-submitted by the psp-retry job: after PSP_RETRY_BASE * 2^n seconds
+    # (capped at PSP_RETRY_MAX), given up after PSP_RETRY_MAX_ATTEMPTS; ones never
+    # attempted (process died) after PSP_RETRY_AFTER
+    PSP_RETRY_INTERVAL = float(os.getenv("PSP_RETRY_INTERVAL", "15"))
+    PSP_RETRY_AFTER = float(os.getenv("PSP_RETRY_AFTER", "60"))
+    PSP_RETRY_BASE = float(os.getenv("PSP_RETRY_BASE", "30"))
+    PSP_RETRY_MAX = float(os.getenv("PSP_RETRY_MAX", "900"))
+    PSP_RETRY_MAX_ATTEMPTS = int(os.getenv("PSP_RETRY_MAX_ATTEMPTS", "8"))
+    PSP_RETRY_BATCH = int(os.getenv("PSP_RETRY_BATCH", "100"))
+
+    # --- Promotions ---
+    # seconds between checks of the promotion catalog version (other processes' changes)
+    PROMOTIONS_REFRESH_INTERVAL = float(os.getenv("PROMOTIONS_REFRESH_INTERVAL", "5"))
+
+    # --- Delivery ---
+    # assigned + on_the_way orders a courier may hold before claiming more
+    DELIVERY_MAX_ACTIVE_PER_COURIER = int(os.getenv("DELIVERY_MAX_ACTIVE_PER_COURIER", "5"))
+    # orders per POST /delivery/orders/status
+    DELIVERY_BULK_STATUS_MAX = int(os.getenv("DELIVERY_BULK_STATUS_MAX", "50"))
+    # route planning: unassigned pending / processing orders batched by locality
+    # (bundled app/data/localities.csv) and claimed by a courier as a unit
+    DELIVERY_ROUTE_CAPACITY = int(os.getenv("DELIVERY_ROUTE_CAPACITY", "5"))
+    DELIVERY_DEPOT_LAT = float(os.getenv("DELIVERY_DEPOT_LAT", "32.0853"))
+    DELIVERY_DEPOT_LON = float(os.getenv("DELIVERY_DEPOT_LON", "34.7818"))
+    DELIVERY_PLAN_MAX_ORDERS = int(os.getenv("DELIVERY_PLAN_MAX_ORDERS", "20000"))
+    # seconds between planning runs (open routes are replaced each run), 0 = CLI only
+    DELIVERY_PLAN_INTERVAL = float(os.getenv("DELIVERY_PLAN_INTERVAL", "300"))
+
+    # --- Live events (SSE) ---
+    # order / delivery status streams on their own port (asyncio, no thread per client); 0 = off
+    LIVE_EVENTS_HOST = os.getenv("LIVE_EVENTS_HOST", "0.0.0.0")
+    LIVE_EVENTS_PORT = int(os.getenv("LIVE_EVENTS_PORT", "0"))
+    LIVE_EVENTS_HEARTBEAT = float(os.getenv("LIVE_EVENTS_HEARTBEAT", "15"))
+    LIVE_EVENTS_MAX_CONNECTIONS = int(os.getenv("LIVE_EVENTS_MAX_CONNECTIONS", "10000"))
+    # undelivered events per client before it is cut off (it resumes with Last-Event-ID)
+    LIVE_EVENTS_QUEUE_SIZE = int(os.getenv("LIVE_EVENTS_QUEUE_SIZE", "100"))
+    # events replayed on resume (outbox rows, kept OUTBOX_RETENTION_HOURS)
+    LIVE_EVENTS_REPLAY_LIMIT = int(os.getenv("LIVE_EVENTS_REPLAY_LIMIT", "500"))
+
+    # --- Courier locations ---
+    # recent pings kept in memory per courier (ring buffer)
+    LOCATION_RING_SIZE = int(os.getenv("LOCATION_RING_SIZE", "120"))
+    LOCATION_MAX_PINGS_PER_BATCH = int(os.getenv("LOCATION_MAX_PINGS_PER_BATCH", "100"))
+    # a ping joins the stored track after this many seconds or metres since the last stored one
+    LOCATION_TRACK_SECONDS = float(os.getenv("LOCATION_TRACK_SECONDS", "30"))
+    LOCATION_TRACK_METERS = float(os.getenv("LOCATION_TRACK_METERS", "200"))
+    LOCATION_FLUSH_INTERVAL = float(os.getenv("LOCATION_FLUSH_INTERVAL", "10"))
+    LOCATION_FLUSH_BATCH = int(os.getenv("LOCATION_FLUSH_BATCH", "1000"))
+    # track points buffered while the database is unavailable (oldest dropped first)
+    LOCATION_MAX_PENDING = int(os.getenv("LOCATION_MAX_PENDING", "100000"))
+    # positions older than this are reported as stale
+    LOCATION_STALE_SECONDS = float(os.getenv("LOCATION_STALE_SECONDS", "120"))
+
+    # --- Delivery slots ---
+    # daily windows (UTC start times), created on demand for the booking horizon
+    DELIVERY_SLOT_STARTS = os.getenv("DELIVERY_SLOT_STARTS", "09:00,12:00,15:00,18:00")
+    DELIVERY_SLOT_MINUTES = int(os.getenv("DELIVERY_SLOT_MINUTES", "180"))
+    DELIVERY_SLOT_CAPACITY = int(os.getenv("DELIVERY_SLOT_CAPACITY", "50"))
+    DELIVERY_SLOT_DAYS = int(os.getenv("DELIVERY_SLOT_DAYS", "7"))
+    # booking closes this long before the slot starts
+    DELIVERY_SLOT_CUTOFF_MINUTES = int(os.getenv("DELIVERY_SLOT_CUTOFF_MINUTES", "60"))
+    # availability grid cache (also dropped on every booking / cancel in this process)
+    DELIVERY_SLOT_CACHE_TTL = float(os.getenv("DELIVERY_SLOT_CACHE_TTL", "5"))
+
+    # --- Principal cache (JWT identity -> role / token version) ---
+    # seconds a cached principal is trusted; changes in this process invalidate immediately
+    PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+    # --- Password hashing ---
+    # werkzeug method string = cost policy; older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # worker processes for hash / verify (0 = on the request thread)
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(os.cpu_count() or 1, 4))))
+    # calls in flight before new ones get 503 + Retry-After
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+    # --- Token revocation (logout) ---
+    # seconds before a logout in another process is seen here (same process: immediately)
+    REVOCATION_REFRESH_INTERVAL = float(os.getenv("REVOCATION_REFRESH_INTERVAL", "5"))
+    # full reload of the filter, dropping tokens past their expiry
+    REVOCATION_REBUILD_INTERVAL = float(os.getenv("REVOCATION_REBUILD_INTERVAL", "600"))
+    # Bloom filter sizing (grows with the store); false positives cost one DB lookup
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+    # exact revocations kept beside the filter before an early rebuild
+    REVOCATION_RECENT_MAX = int(os.getenv("REVOCATION_RECENT_MAX", "10000"))
+
+    # --- Image renditions ---
+    # name:longest edge in px; every upload gets all of them as WebP
+    IMAGE_RENDITIONS = os.getenv("IMAGE_RENDITIONS", "thumb:160,card:480,detail:1200,zoom:2400")
+    IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "82"))
+    # worker processes (0 = in the request, for local runs)
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(os.cpu_count() or 1, 2))))
+    # images waiting for renditions before uploads get 503 + Retry-After
+    IMAGE_MAX_PENDING = int(os.getenv("IMAGE_MAX_PENDING", "200"))
+    IMAGE_MAX_FILES_PER_REQUEST = int(os.getenv("IMAGE_MAX_FILES_PER_REQUEST", "20"))
+    # decoded size guard (width * height), checked from the header
+    IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "40000000"))
+    # still "processing" after this long (restart, dead worker): queued again
+    IMAGE_STALE_SECONDS = float(os.getenv("IMAGE_STALE_SECONDS", "600"))
+    IMAGE_RESUME_INTERVAL = float(os.getenv("IMAGE_RESUME_INTERVAL", "120"))
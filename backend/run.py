@@ -15,25 +15,27 @@ from app.models.product import Product
 from app.models.category import Category
 import app.models.image  # safe module import
 
-app = create_app()
+# process pool workers (password hashing, images) re-import this file:
+# build and serve the app only when it is run directly
+if __name__ == "__main__":
+    app = create_app()
 
-with app.app_context():
-    # 🔹 Make sure DB directory exists (inside mounted volume)
-    db_path = os.getenv("SQLITE_PATH", "instance")
-    os.makedirs(db_path, exist_ok=True)
+    with app.app_context():
+        # 🔹 Make sure DB directory exists (inside mounted volume)
+        db_path = os.getenv("SQLITE_PATH", "instance")
+        os.makedirs(db_path, exist_ok=True)
 
-    print("DB URL:", db.engine.url)
+        print("DB URL:", db.engine.url)
 
-    inspector = inspect(db.engine)
-    tables = inspector.get_table_names()
+        inspector = inspect(db.engine)
+        tables = inspector.get_table_names()
 
-    if not tables:
-        print("No tables found. Creating database tables...")
-        db.create_all()
-    else:
-        print("Database already exists. Skipping table creation.")
-        for table in tables:
-            print("-", table)
+        if not tables:
+            print("No tables found. Creating database tables...")
+            db.create_all()
+        else:
+            print("Database already exists. Skipping table creation.")
+            for table in tables:
+                print("-", table)
 
-if __name__ == "__main__":
-   app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)
+    app.run(host="0.0.0.0", port=5000, debug=False, use_reloader=False)